@@ -0,0 +1,329 @@
+"""
+IoT Smart System - Alarm Rules
+==============================
+
+موتور قوانین alarm قابل پیکربندی:
+- قوانین از config/فایل JSON یک بار کامپایل می‌شوند
+- ارزیابی دسته‌ای خوانش‌ها با hysteresis، حداقل مدت و cooldown هر دستگاه
+- جلوگیری از alert تکراری تا وقتی شرط پاک نشده
+- یک dispatcher با محدودیت نرخ به جای یک thread برای هر alert
+"""
+
+import json
+import logging
+import operator
+import queue
+import time
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('IoTGateway.alarms')
+
+# قوانین پیش‌فرض معادل آستانه‌های قبلی check_alarms
+DEFAULT_RULES = [
+    {'name': 'temperature_high', 'metric': 'temperature', 'op': '>', 'threshold': 35, 'clear': 34,
+     'message': 'Temperature alert: {value}°C'},
+    {'name': 'temperature_low', 'metric': 'temperature', 'op': '<', 'threshold': -5, 'clear': -4,
+     'message': 'Temperature alert: {value}°C'},
+    {'name': 'humidity_high', 'metric': 'humidity', 'op': '>', 'threshold': 80, 'clear': 78,
+     'message': 'Humidity alert: {value}%'},
+    {'name': 'humidity_low', 'metric': 'humidity', 'op': '<', 'threshold': 20, 'clear': 22,
+     'message': 'Humidity alert: {value}%'},
+    {'name': 'motion', 'metric': 'motion', 'op': 'truthy', 'cooldown': 60,
+     'message': 'Motion detected'},
+    {'name': 'battery_low', 'metric': 'battery', 'op': '<', 'threshold': 20, 'clear': 25,
+     'cooldown': 3600, 'message': 'Low battery: {value}%'},
+]
+
+_OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# برای hysteresis، شرط پاک شدن عکس شرط فعال شدن است
+_CLEAR_OPERATORS = {
+    '>': operator.le,
+    '>=': operator.lt,
+    '<': operator.ge,
+    '<=': operator.gt,
+    '==': operator.ne,
+    '!=': operator.eq,
+}
+
+Reading = Tuple[str, Dict[str, Any]]
+
+
+class AlarmRule:
+    """یک قانون کامپایل شده"""
+
+    __slots__ = ('name', 'metric', 'op', 'threshold', 'clear_threshold', 'min_duration',
+                 'cooldown', 'level', 'message', 'trips', 'clears')
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec['name']
+        self.metric = spec['metric']
+        self.op = spec.get('op', '>')
+        self.threshold = spec.get('threshold')
+        self.clear_threshold = spec.get('clear', self.threshold)
+        self.min_duration = float(spec.get('min_duration', 0))
+        self.cooldown = float(spec.get('cooldown', 300))
+        self.level = spec.get('level', 'warning')
+        self.message = spec.get('message', f"{self.name}: {{value}}")
+
+        if self.op == 'truthy':
+            self.trips = bool
+            self.clears = operator.not_
+        elif self.op in _OPERATORS:
+            if self.threshold is None:
+                raise ValueError(f"Alarm rule {self.name} needs a threshold")
+            trip_op, clear_op = _OPERATORS[self.op], _CLEAR_OPERATORS[self.op]
+            threshold, clear_threshold = self.threshold, self.clear_threshold
+            self.trips = lambda v: trip_op(v, threshold)
+            self.clears = lambda v: clear_op(v, clear_threshold)
+        else:
+            raise ValueError(f"Unknown operator {self.op!r} in alarm rule {self.name}")
+
+
+class _RuleState:
+    """وضعیت یک قانون برای یک دستگاه"""
+
+    __slots__ = ('active', 'pending_since', 'last_fired')
+
+    def __init__(self):
+        self.active = False
+        self.pending_since = None
+        self.last_fired = float('-inf')
+
+
+def load_rules(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """خواندن قوانین از فایل JSON در صورت وجود، در غیر این صورت از config"""
+    rules_file = config.get('rules_file')
+    if rules_file and Path(rules_file).exists():
+        with open(rules_file) as f:
+            rules = json.load(f)
+        logger.info(f"Loaded {len(rules)} alarm rules from {rules_file}")
+        return rules
+    return config.get('rules') or DEFAULT_RULES
+
+
+class AlarmEngine:
+    """ارزیابی دسته‌ای قوانین با hysteresis، حداقل مدت، cooldown و dedup"""
+
+    def __init__(self, rules: Iterable[Dict[str, Any]]):
+        self.rules = [AlarmRule(spec) for spec in rules]
+        self._rules_by_metric: Dict[str, List[AlarmRule]] = {}
+        for rule in self.rules:
+            self._rules_by_metric.setdefault(rule.metric, []).append(rule)
+
+        self._state: Dict[Tuple[str, str], _RuleState] = {}
+        self._lock = Lock()
+        self.evaluated = 0
+        self.fired = 0
+
+    def evaluate(self, readings: Sequence[Reading], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """ارزیابی یک دسته (device_id, data) و برگرداندن alert های جدید"""
+        now = time.time() if now is None else now
+        alerts = []
+
+        with self._lock:
+            for device_id, data in readings:
+                self.evaluated += 1
+                for metric, rules in self._rules_by_metric.items():
+                    value = data.get(metric)
+                    if value is None:
+                        continue
+                    for rule in rules:
+                        alert = self._step(rule, device_id, value, now)
+                        if alert:
+                            alerts.append(alert)
+
+        self.fired += len(alerts)
+        return alerts
+
+    def _step(self, rule: AlarmRule, device_id: str, value, now: float) -> Optional[Dict[str, Any]]:
+        """ماشین حالت یک قانون برای یک خوانش"""
+        key = (device_id, rule.name)
+        state = self._state.get(key)
+
+        try:
+            if state is None:
+                if not rule.trips(value):
+                    return None
+                state = self._state[key] = _RuleState()
+
+            if state.active:
+                if rule.clears(value):
+                    state.active = False
+                    state.pending_since = None
+                return None
+
+            if not rule.trips(value):
+                state.pending_since = None
+                return None
+        except TypeError:
+            # مقدار غیرعددی در payload
+            return None
+
+        if state.pending_since is None:
+            state.pending_since = now
+        if now - state.pending_since < rule.min_duration:
+            return None
+        if now - state.last_fired < rule.cooldown:
+            return None
+
+        state.active = True
+        state.last_fired = now
+        return {
+            'device_id': device_id,
+            'rule': rule.name,
+            'message': rule.message.format(value=value),
+            'timestamp': now,
+            'level': rule.level
+        }
+
+    def forget(self, device_id: str):
+        """حذف وضعیت قوانین یک دستگاه"""
+        with self._lock:
+            for key in [k for k in self._state if k[0] == device_id]:
+                del self._state[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rules': len(self.rules),
+            'tracked_states': len(self._state),
+            'evaluated': self.evaluated,
+            'fired': self.fired
+        }
+
+
+class AlertDispatcher:
+    """یک worker برای ذخیره دسته‌ای، ارسال با محدودیت نرخ و کنترل buzzer"""
+
+    def __init__(self, store: Callable[[List[Dict[str, Any]]], None],
+                 emit: Callable[[Dict[str, Any]], None],
+                 buzzer: Callable[[bool], None],
+                 rate_limit: float = 5.0, burst: int = 20,
+                 buzzer_duration: float = 1.0, queue_size: int = 1000):
+        self.store = store
+        self.emit = emit
+        self.buzzer = buzzer
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.buzzer_duration = buzzer_duration
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = Event()
+        self._thread = None
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._buzzer_until = 0.0
+
+        self.dispatched = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.store_failures = 0
+
+    def start(self):
+        """شروع thread dispatcher"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='alert-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """توقف dispatcher پس از ارسال alert های باقی‌مانده"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, alert: Dict[str, Any]):
+        """قرار دادن یک alert در صف بدون بلاک کردن فراخواننده"""
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+
+    def buzz(self, duration: Optional[float] = None):
+        """روشن کردن buzzer (درخواست‌های هم‌زمان با هم ادغام می‌شوند)"""
+        self.submit({'buzz': duration or self.buzzer_duration})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self._queue.qsize(),
+            'dispatched': self.dispatched,
+            'suppressed': self.suppressed,
+            'dropped': self.dropped,
+            'store_failures': self.store_failures
+        }
+
+    def _run(self):
+        """حلقه dispatcher"""
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            timeout = 0.5
+            if self._buzzer_until:
+                timeout = max(0.0, min(timeout, self._buzzer_until - time.monotonic()))
+
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                while len(batch) < 100:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                logger.error(f"Alert dispatch error: {e}")
+
+            if self._buzzer_until and time.monotonic() >= self._buzzer_until:
+                self._buzzer_until = 0.0
+                self.buzzer(False)
+
+        if self._buzzer_until:
+            self.buzzer(False)
+
+    def _dispatch(self, batch: List[Dict[str, Any]]):
+        """ذخیره همه alert ها و ارسال آن‌هایی که در سقف نرخ جا می‌شوند"""
+        alerts = [a for a in batch if 'buzz' not in a]
+        buzz = max((a['buzz'] for a in batch if 'buzz' in a), default=0)
+
+        if alerts:
+            # خطای ذخیره (مثلاً قفل SQLite) نباید ارسال و buzzer این دسته را از بین ببرد
+            try:
+                self.store(alerts)
+            except Exception as e:
+                self.store_failures += 1
+                logger.error(f"Alert store error ({len(alerts)} alerts): {e}")
+
+        for alert in alerts:
+            if self._take_token():
+                self.emit(alert)
+                self.dispatched += 1
+                if alert.get('level') != 'info':
+                    buzz = max(buzz, self.buzzer_duration)
+                logger.warning(f"Alert: {alert['device_id']} - {alert['message']}")
+            else:
+                self.suppressed += 1
+
+        if buzz:
+            if not self._buzzer_until:
+                self.buzzer(True)
+            self._buzzer_until = max(self._buzzer_until, time.monotonic() + buzz)
+
+    def _take_token(self) -> bool:
+        """token bucket برای محدود کردن نرخ ارسال"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_limit)
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
@@ -0,0 +1,248 @@
+"""
+IoT Smart System - Streaming Anomaly Detection
+==============================================
+
+تشخیص ناهنجاری جریانی برای هر دستگاه و هر متریک، مکمل آستانه‌های ثابت alarms:
+- میانگین و واریانس EWMA و z-score هر خوانش نسبت به آن (جهش یا سنسور خراب)
+- نرخ تغییر از اختلاف دو EWMA زمانی سریع و کند (drift آرام، مثل گرم شدن تدریجی فریزر در محدوده مجاز)؛
+  برای یک شیب ثابت s اختلاف به s × (tau_slow - tau_fast) می‌رسد و مستقل از فاصله نمونه‌هاست
+- وضعیت کل ناوگان در یک آرایه NumPy (دستگاه × فیلد × متریک)؛ هر دسته خوانش با یک gather،
+  یک گام برداری و یک scatter به‌روز می‌شود (خوانش‌های تکراری یک دستگاه در دسته در گام بعد)
+- hysteresis و cooldown جدا برای z و نرخ تغییر؛ خروجی alert هم‌قالب AlarmEngine
+"""
+
+import logging
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('IoTGateway.anomaly')
+
+Reading = Tuple[str, Dict[str, Any]]
+
+# کف انحراف معیار هر متریک (دقت سنسور)؛ سنسور ثابت با یک تغییر کوچک z بزرگ نمی‌گیرد
+DEFAULT_MIN_STD = {'temperature': 0.2, 'humidity': 1.0, 'pressure': 0.5, 'light_level': 20.0, 'battery': 1.0}
+
+# سقف نرخ تغییر (واحد در ساعت)
+DEFAULT_RATE_LIMITS = {'temperature': 3.0, 'humidity': 15.0, 'pressure': 5.0, 'battery': 10.0}
+
+# فیلدهای وضعیت هر (دستگاه، متریک)
+LEVEL, VAR, FAST, SLOW, LAST_TIME, COUNT, Z_ACTIVE, TREND_ACTIVE, Z_FIRED, TREND_FIRED = range(10)
+FIELDS = 10
+
+
+_PLAIN_NUMBERS = {int, float}
+
+
+def _number(value: Any) -> float:
+    """عدد int/float (نه bool و نه رشته عددی) یا NaN"""
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+def _matrix(data: Sequence[Dict[str, Any]], metrics: Sequence[str]) -> np.ndarray:
+    """ماتریس (خوانش × متریک) از payload ها، ستون به ستون؛ مقدار نبود یا غیرعددی = NaN"""
+    nan = np.nan
+    out = np.empty((len(data), len(metrics)))
+    for j, m in enumerate(metrics):
+        column = [d.get(m, nan) for d in data]
+        # مسیر سریع فقط وقتی همه مقدارها دقیقاً int/float هستند؛ در غیر این صورت همان فیلتر برای هر مقدار
+        if not set(map(type, column)) <= _PLAIN_NUMBERS:
+            column = [_number(v) for v in column]
+        out[:, j] = column
+    return out
+
+
+class AnomalyDetector:
+    """EWMA، z-score و نرخ تغییر برای همه دستگاه‌ها در یک آرایه مشترک"""
+
+    def __init__(self, metrics: Sequence[str] = ('temperature', 'humidity', 'pressure', 'battery'),
+                 alpha: float = 0.05, z_threshold: float = 5.0, warmup: int = 30,
+                 tau_fast: float = 120.0, tau_slow: float = 900.0,
+                 min_std: Optional[Dict[str, float]] = None, rate_limits: Optional[Dict[str, float]] = None,
+                 cooldown: float = 600.0, alert_level: str = 'warning', capacity: int = 1024):
+        self.metrics = list(metrics)
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.tau_fast = tau_fast
+        self.tau_slow = tau_slow
+        self.cooldown = cooldown
+        self.alert_level = alert_level
+        min_std = dict(DEFAULT_MIN_STD, **(min_std or {}))
+        rate_limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.min_std = np.array([min_std.get(m, 1e-3) for m in self.metrics])
+        # نرخ بر ثانیه محاسبه می‌شود؛ سقف‌ها در ساعت تعریف شده‌اند (inf = بدون بررسی نرخ)
+        self.rate_limits = np.array([rate_limits.get(m, np.inf) / 3600.0 for m in self.metrics])
+
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._lock = Lock()
+        self.capacity = 0
+        self._state = np.zeros((0, FIELDS, len(self.metrics)))
+        self._grow(capacity)
+
+        self.evaluated = 0
+        self.batches = 0
+        self.fired = 0
+
+    def _grow(self, capacity: int):
+        state = np.zeros((capacity, FIELDS, len(self.metrics)))
+        state[:, Z_FIRED:] = -np.inf
+        state[:self.capacity] = self._state
+        self._state = state
+        self.capacity = capacity
+
+    def _row_indices(self, device_ids: Sequence[str]) -> np.ndarray:
+        rows = self._rows
+        indices = np.fromiter((rows.get(d, -1) for d in device_ids), dtype=np.int64, count=len(device_ids))
+        for i in np.flatnonzero(indices < 0):
+            device_id = device_ids[i]
+            row = rows.get(device_id)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    row = len(rows)
+                    if row >= self.capacity:
+                        self._grow(self.capacity * 2)
+                rows[device_id] = row
+            indices[i] = row
+        return indices
+
+    def evaluate(self, readings: Sequence[Reading], times: Optional[Sequence[float]] = None,
+                 now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """به‌روزرسانی دسته‌ای و برگرداندن alert های ناهنجاری جدید"""
+        if not readings:
+            return []
+        now = time.time() if now is None else now
+        device_ids = [device_id for device_id, _ in readings]
+        values = _matrix([d for _, d in readings], self.metrics)
+        stamps = np.full(len(readings), now) if times is None else np.asarray(times, dtype=np.float64)
+
+        alerts = []
+        with self._lock:
+            rows = self._row_indices(device_ids)
+            pending = np.arange(len(readings))
+            while pending.size:
+                # هر گام حداکثر یک خوانش از هر دستگاه (به ترتیب ورود)
+                unique, first = np.unique(rows[pending], return_index=True)
+                take = pending if unique.size == pending.size else pending[np.sort(first)]
+                alerts.extend(self._step(rows[take], values[take], stamps[take], take, device_ids, now))
+                if take is pending:
+                    break
+                pending = pending[~np.isin(pending, take)]
+            self.evaluated += len(readings)
+            self.batches += 1
+        self.fired += len(alerts)
+        return alerts
+
+    def _step(self, rows: np.ndarray, x: np.ndarray, t: np.ndarray, positions: np.ndarray,
+              device_ids: Sequence[str], now: float) -> List[Dict[str, Any]]:
+        """یک گام برداری برای ردیف‌های یکتا"""
+        s = self._state[rows]
+        # کپی: ستون‌های s در ادامه بازنویسی می‌شوند
+        level, var, fast, slow, count = (s[:, f].copy() for f in (LEVEL, VAR, FAST, SLOW, COUNT))
+        valid = ~np.isnan(x)
+        first = valid & (count == 0)
+        seen = valid & (count > 0)
+        warm = seen & (count >= self.warmup)
+
+        std = np.maximum(np.sqrt(var), self.min_std)
+        residual = np.where(seen, x - level, 0.0)
+        z = residual / std
+
+        # جهش‌ها میانگین و واریانس را آلوده نمی‌کنند؛ تغییر پایدار تدریجی جذب می‌شود
+        limit = self.z_threshold * std
+        bounded = np.where(warm, np.clip(residual, -limit, limit), residual)
+        clean = level + bounded
+        s[:, LEVEL] = np.where(first, x, level + self.alpha * bounded)
+        s[:, VAR] = np.where(seen, (1 - self.alpha) * (var + self.alpha * bounded ** 2), var)
+
+        # EWMA های زمانی: وزن به فاصله واقعی نمونه‌ها بستگی دارد
+        dt = np.maximum(t[:, None] - s[:, LAST_TIME], 0.0)
+        w_fast = np.where(seen, -np.expm1(-dt / self.tau_fast), 0.0)
+        w_slow = np.where(seen, -np.expm1(-dt / self.tau_slow), 0.0)
+        s[:, FAST] = np.where(first, x, fast + w_fast * (clean - fast))
+        s[:, SLOW] = np.where(first, x, slow + w_slow * (clean - slow))
+        rate = (s[:, FAST] - s[:, SLOW]) / (self.tau_slow - self.tau_fast)
+        s[:, LAST_TIME] = np.where(valid, t[:, None], s[:, LAST_TIME])
+        s[:, COUNT] = count + valid
+
+        # hysteresis: شرط با نصف آستانه پاک می‌شود
+        z_on = warm & (np.abs(z) > self.z_threshold)
+        trend_on = warm & (np.abs(rate) > self.rate_limits)
+        fire_z = z_on & (s[:, Z_ACTIVE] == 0) & (now - s[:, Z_FIRED] >= self.cooldown)
+        fire_trend = trend_on & (s[:, TREND_ACTIVE] == 0) & (now - s[:, TREND_FIRED] >= self.cooldown)
+        s[:, Z_ACTIVE] = np.where(warm, z_on | ((s[:, Z_ACTIVE] > 0) & (np.abs(z) > self.z_threshold / 2)),
+                                  s[:, Z_ACTIVE])
+        s[:, TREND_ACTIVE] = np.where(warm, trend_on | ((s[:, TREND_ACTIVE] > 0) &
+                                                        (np.abs(rate) > self.rate_limits / 2)),
+                                      s[:, TREND_ACTIVE])
+        s[:, Z_FIRED] = np.where(fire_z, now, s[:, Z_FIRED])
+        s[:, TREND_FIRED] = np.where(fire_trend, now, s[:, TREND_FIRED])
+        self._state[rows] = s
+
+        alerts = []
+        for i, j in zip(*np.nonzero(fire_z)):
+            metric = self.metrics[j]
+            alerts.append({
+                'device_id': device_ids[positions[i]],
+                'rule': f'anomaly_{metric}',
+                'message': f"Anomalous {metric}: {x[i, j]:g} (expected {level[i, j]:.1f} "
+                           f"± {std[i, j]:.1f}, z={z[i, j]:+.1f})",
+                'timestamp': now,
+                'level': self.alert_level,
+                'metric': metric,
+                'value': float(x[i, j]),
+                'expected': round(float(level[i, j]), 3),
+                'zscore': round(float(z[i, j]), 2)
+            })
+        for i, j in zip(*np.nonzero(fire_trend)):
+            metric = self.metrics[j]
+            per_hour = float(rate[i, j]) * 3600
+            alerts.append({
+                'device_id': device_ids[positions[i]],
+                'rule': f'trend_{metric}',
+                'message': f"{metric} drifting {per_hour:+.1f}/h (now {x[i, j]:g})",
+                'timestamp': now,
+                'level': self.alert_level,
+                'metric': metric,
+                'value': float(x[i, j]),
+                'rate_per_hour': round(per_hour, 3)
+            })
+        return alerts
+
+    def forget(self, device_id: str):
+        """آزاد کردن ردیف یک دستگاه"""
+        with self._lock:
+            row = self._rows.pop(device_id, None)
+            if row is None:
+                return
+            self._state[row] = 0
+            self._state[row, Z_FIRED:] = -np.inf
+            self._free.append(row)
+
+    def state(self, device_id: str) -> Optional[Dict[str, Dict[str, float]]]:
+        """میانگین، انحراف معیار و نرخ تغییر (در ساعت) فعلی هر متریک یک دستگاه"""
+        with self._lock:
+            row = self._rows.get(device_id)
+            if row is None:
+                return None
+            s = self._state[row].copy()
+        rate = (s[FAST] - s[SLOW]) / (self.tau_slow - self.tau_fast) * 3600
+        return {m: {'mean': float(s[LEVEL, j]), 'std': float(np.sqrt(s[VAR, j])),
+                    'rate_per_hour': float(rate[j]), 'samples': int(s[COUNT, j])}
+                for j, m in enumerate(self.metrics)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'devices': len(self._rows),
+            'capacity': self.capacity,
+            'metrics': self.metrics,
+            'evaluated': self.evaluated,
+            'batches': self.batches,
+            'fired': self.fired,
+            'state_bytes': self._state.nbytes
+        }
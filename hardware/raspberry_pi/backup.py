@@ -0,0 +1,355 @@
+"""
+IoT Smart System - Backup & Export
+==================================
+
+پشتیبان‌گیری بدون توقف ingest و خروجی ستونی برای تحلیل خارج از دستگاه:
+- online backup API در گام‌های چند صفحه‌ای روی یک snapshot ثابت WAL (بدون restart و بدون قفل writer)
+- فشرده‌سازی gzip و checksum SHA-256 با manifest برای هر پشتیبان
+- حالت افزایشی: فقط ردیف‌های جدید هر partition از آخرین پشتیبان (بر اساس rowid)
+- خروجی تاریخچه سنسور به NumPy .npz فشرده (یا Parquet در صورت نصب pyarrow) برای هر روز
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from startup import lazy_import
+from storage import PartitionedTable
+
+logger = logging.getLogger('IoTGateway.backup')
+
+pyarrow_parquet = lazy_import('pyarrow.parquet')
+pyarrow = lazy_import('pyarrow')
+
+STATE_FILE = 'backup_state.json'
+
+# ستون‌های خروجی ستونی و نوع NumPy آن‌ها (NULL → NaN، motion بدون مقدار → -1)
+EXPORT_COLUMNS = (
+    ('timestamp', np.int64),
+    ('temperature', np.float32),
+    ('humidity', np.float32),
+    ('pressure', np.float32),
+    ('light_level', np.float32),
+    ('motion', np.int8)
+)
+
+
+def compress_file(source: Path, target: Path, level: int = 6, chunk: int = 1 << 20) -> Dict[str, Any]:
+    """gzip یک فایل به صورت جریانی با محاسبه SHA-256 خروجی"""
+    digest = hashlib.sha256()
+    with open(source, 'rb') as src, open(target, 'wb') as raw:
+        with gzip.GzipFile(fileobj=_HashingWriter(raw, digest), mode='wb', compresslevel=level, mtime=0) as out:
+            shutil.copyfileobj(src, out, chunk)
+    return {'file': target.name, 'bytes': target.stat().st_size,
+            'source_bytes': source.stat().st_size, 'sha256': digest.hexdigest()}
+
+
+def file_sha256(path: Path, chunk: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify(manifest_path: str) -> bool:
+    """بررسی checksum پشتیبان با manifest آن"""
+    manifest_path = Path(manifest_path)
+    manifest = json.loads(manifest_path.read_text())
+    return file_sha256(manifest_path.parent / manifest['file']) == manifest['sha256']
+
+
+class _HashingWriter:
+    """file-like که هنگام نوشتن hash را هم به‌روز می‌کند"""
+
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+class BackupManager:
+    """پشتیبان کامل/افزایشی و خروجی ستونی دیتابیس محلی در یک thread پس‌زمینه"""
+
+    def __init__(self, db_path: str, backup_path: str, export_path: str,
+                 tables: Sequence[PartitionedTable] = (), rollup_tables: Sequence[tuple] = (),
+                 step_pages: int = 256, step_sleep: float = 0.005, compress_level: int = 6,
+                 keep: int = 7, export_format: str = 'npz', export_chunk_rows: int = 200000):
+        self.db_path = db_path
+        self.backup_path = Path(backup_path)
+        self.export_path = Path(export_path)
+        self.tables = list(tables)
+        self.rollup_tables = list(rollup_tables)   # (نام جدول، طول bucket)
+        self.step_pages = step_pages
+        self.step_sleep = step_sleep
+        self.compress_level = compress_level
+        self.keep = keep
+        self.export_format = export_format
+        self.export_chunk_rows = export_chunk_rows
+
+        self._lock = Lock()
+        self._thread = None
+        self.last_result: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.running: Optional[str] = None
+
+    def run_async(self, job: str, **kwargs) -> bool:
+        """اجرای backup/export در thread جداگانه؛ False اگر کار دیگری در حال اجرا باشد"""
+        jobs: Dict[str, Callable[..., Dict[str, Any]]] = {
+            'full': self.backup, 'incremental': self.backup_incremental, 'export': self.export_columnar
+        }
+        if job not in jobs:
+            raise ValueError(f"Unknown backup job {job!r}")
+        if not self._lock.acquire(blocking=False):
+            return False
+
+        def run():
+            self.running = job
+            try:
+                self.last_result = jobs[job](**kwargs)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{job}: {e}"
+                logger.error(f"Backup job {job} failed: {e}")
+            finally:
+                self.running = None
+                self._lock.release()
+
+        self._thread = Thread(target=run, name=f'backup-{job}', daemon=True)
+        self._thread.start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _snapshot(self, attach: Optional[Path] = None) -> sqlite3.Connection:
+        """اتصال منبع با تراکنش خواندن باز: همه گام‌ها یک snapshot ثابت WAL را می‌بینند
+
+        بدون این تراکنش، هر commit writer بین گام‌ها backup را از ابتدا شروع می‌کند
+        """
+        src = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        if attach is not None:
+            # ATTACH داخل تراکنش مجاز نیست
+            src.execute('ATTACH DATABASE ? AS delta', (str(attach),))
+        src.execute('BEGIN')
+        src.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        return src
+
+    def backup(self) -> Dict[str, Any]:
+        """پشتیبان کامل با online backup API → .db.gz + manifest"""
+        self.backup_path.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        temp = self.backup_path / f'.backup_{stamp}.db'
+        target = self.backup_path / f'backup_{stamp}.db.gz'
+
+        started = time.monotonic()
+        src = self._snapshot()
+        steps = [0]
+        try:
+            watermarks = self._watermarks(src)
+            dst = sqlite3.connect(str(temp))
+            try:
+                src.backup(dst, pages=self.step_pages, sleep=self.step_sleep,
+                           progress=lambda status, remaining, total: steps.__setitem__(0, steps[0] + 1))
+            finally:
+                dst.close()
+        finally:
+            src.close()
+        copied = time.monotonic() - started
+
+        try:
+            manifest = compress_file(temp, target, self.compress_level)
+        finally:
+            temp.unlink(missing_ok=True)
+
+        manifest.update({'mode': 'full', 'created': time.time(), 'steps': steps[0],
+                         'copy_seconds': round(copied, 3),
+                         'total_seconds': round(time.monotonic() - started, 3)})
+        self._write_manifest(target, manifest)
+        self._save_state({'watermarks': watermarks, 'time': manifest['created']})
+        self._prune()
+        logger.info(f"Data backup created: {target} ({manifest['bytes'] / 1e6:.1f} MB, "
+                    f"{steps[0]} steps, sha256 {manifest['sha256'][:12]})")
+        return manifest
+
+    def backup_incremental(self) -> Dict[str, Any]:
+        """فقط ردیف‌های جدید هر partition (و bucket های rollup اخیر) از آخرین پشتیبان → .db.gz"""
+        state = self._load_state()
+        if not state:
+            logger.info("No previous backup, running full backup")
+            return self.backup()
+
+        self.backup_path.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        temp = self.backup_path / f'.incremental_{stamp}.db'
+        target = self.backup_path / f'incremental_{stamp}.db.gz'
+        previous = state.get('watermarks', {})
+
+        started = time.monotonic()
+        src = self._snapshot(attach=temp)
+        rows = {}
+        try:
+            watermarks = self._watermarks(src)
+            for table, last_id in watermarks.items():
+                since = previous.get(table, 0)
+                if last_id <= since:
+                    continue
+                src.execute(f'CREATE TABLE delta.{table} AS SELECT * FROM main.{table} '
+                            f'WHERE rowid > ? AND rowid <= ?', (since, last_id))
+                rows[table] = last_id - since
+            # rollup ها upsert می‌شوند؛ bucket های باز از زمان آخرین پشتیبان دوباره صادر می‌شوند
+            for table, seconds in self.rollup_tables:
+                since = int(state.get('time', 0)) // seconds * seconds
+                src.execute(f'CREATE TABLE delta.{table} AS SELECT * FROM main.{table} '
+                            f'WHERE bucket >= ?', (since,))
+                rows[table] = src.execute(f'SELECT count(*) FROM delta.{table}').fetchone()[0]
+            src.execute('COMMIT')
+            src.execute('DETACH DATABASE delta')
+        finally:
+            src.close()
+
+        try:
+            manifest = compress_file(temp, target, self.compress_level)
+        finally:
+            temp.unlink(missing_ok=True)
+
+        manifest.update({'mode': 'incremental', 'created': time.time(), 'since': state.get('time'),
+                         'rows': rows, 'total_seconds': round(time.monotonic() - started, 3)})
+        self._write_manifest(target, manifest)
+        self._save_state({'watermarks': dict(previous, **watermarks), 'time': manifest['created']})
+        logger.info(f"Incremental backup created: {target} ({sum(rows.values())} rows)")
+        return manifest
+
+    def _watermarks(self, db: sqlite3.Connection) -> Dict[str, int]:
+        """بیشترین rowid هر partition (و جدول legacy) در snapshot جاری"""
+        watermarks = {}
+        for table in self.tables:
+            names = table.partitions(db)
+            if table._object_type(db, table.legacy) == 'table':
+                names.insert(0, table.legacy)
+            for name in names:
+                row = db.execute(f'SELECT max(rowid) FROM {name}').fetchone()
+                watermarks[name] = row[0] or 0
+        return watermarks
+
+    def export_columnar(self, table: str = 'sensor_data', include_today: bool = False) -> Dict[str, Any]:
+        """خروجی partition های روزانه به فایل‌های ستونی فشرده؛ روزهای قبلاً صادر شده تکرار نمی‌شوند"""
+        partitioned = next((t for t in self.tables if t.name == table), None)
+        if partitioned is None:
+            raise ValueError(f"{table} is not a partitioned table")
+        fmt = self.export_format
+        if fmt == 'parquet' and not pyarrow.available:
+            logger.warning("pyarrow not installed, exporting npz instead")
+            fmt = 'npz'
+
+        today = partitioned.partition_for(time.time())
+        exported = []
+        src = self._snapshot()
+        try:
+            for partition in partitioned.partitions(src):
+                if partition == today and not include_today:
+                    continue
+                day = partition.rsplit('_p', 1)[1]
+                directory = self.export_path / table / day
+                manifest_path = directory / 'manifest.json'
+                if manifest_path.exists() and partition != today:
+                    continue
+                exported.append(self._export_partition(src, partition, directory, fmt))
+        finally:
+            src.close()
+
+        logger.info(f"Columnar export: {len(exported)} partitions of {table} ({fmt})")
+        return {'table': table, 'format': fmt, 'partitions': exported}
+
+    def _export_partition(self, db: sqlite3.Connection, partition: str, directory: Path, fmt: str) -> Dict[str, Any]:
+        """یک partition در chunk های export_chunk_rows ردیفی، مرتب بر اساس (device_id, timestamp)"""
+        directory.mkdir(parents=True, exist_ok=True)
+        columns = ', '.join(name for name, _ in EXPORT_COLUMNS)
+        cursor = db.execute(f'SELECT device_id, {columns} FROM {partition} ORDER BY device_id, timestamp')
+
+        files = []
+        total = 0
+        while True:
+            rows = cursor.fetchmany(self.export_chunk_rows)
+            if not rows:
+                break
+            arrays = self._columns(rows)
+            path = directory / f'part-{len(files):03d}.{fmt}'
+            if fmt == 'parquet':
+                pyarrow_parquet.write_table(pyarrow.table(arrays), str(path), compression='zstd')
+            else:
+                np.savez_compressed(path, **arrays)
+            files.append({'file': path.name, 'rows': len(rows), 'bytes': path.stat().st_size,
+                          'sha256': file_sha256(path)})
+            total += len(rows)
+
+        manifest = {'partition': partition, 'rows': total, 'format': fmt, 'files': files,
+                    'columns': ['device_id'] + [name for name, _ in EXPORT_COLUMNS],
+                    'created': time.time()}
+        (directory / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+        return manifest
+
+    @staticmethod
+    def _columns(rows: List[tuple]) -> Dict[str, np.ndarray]:
+        """تبدیل ردیف‌ها به آرایه‌های ستونی؛ device_id به صورت dictionary (کد + جدول نام‌ها)"""
+        columns = list(zip(*rows))
+        devices, codes = np.unique(np.array(columns[0], dtype=object).astype(str), return_inverse=True)
+        arrays = {'device_id': devices, 'device_code': codes.astype(np.int32)}
+        for (name, dtype), values in zip(EXPORT_COLUMNS, columns[1:]):
+            if dtype == np.int8:
+                values = [-1 if v is None else v for v in values]
+            arrays[name] = np.array(values, dtype)
+        return arrays
+
+    def _write_manifest(self, target: Path, manifest: Dict[str, Any]):
+        (target.parent / (target.name + '.json')).write_text(json.dumps(manifest, indent=2))
+        (target.parent / (target.name + '.sha256')).write_text(f"{manifest['sha256']}  {target.name}\n")
+
+    def _prune(self):
+        """نگهداری keep پشتیبان کامل آخر (و پشتیبان‌های افزایشی بعد از قدیمی‌ترین آن‌ها)"""
+        if not self.keep:
+            return
+        fulls = sorted(self.backup_path.glob('backup_*.db.gz'))
+        if len(fulls) <= self.keep:
+            return
+        oldest_kept = fulls[-self.keep].name[len('backup_'):]
+        for path in self.backup_path.glob('*.db.gz*'):
+            stamp = path.name.split('_', 1)[1]
+            if stamp < oldest_kept:
+                path.unlink(missing_ok=True)
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            return json.loads((self.backup_path / STATE_FILE).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Any]):
+        path = self.backup_path / STATE_FILE
+        temp = path.with_suffix('.tmp')
+        temp.write_text(json.dumps(state))
+        os.replace(temp, path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'last_result': {k: v for k, v in (self.last_result or {}).items() if k != 'partitions'},
+            'last_error': self.last_error
+        }
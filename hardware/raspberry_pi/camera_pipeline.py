@@ -0,0 +1,443 @@
+"""
+IoT Smart System - Camera Pipeline
+==================================
+
+pipeline چندپردازه‌ای دوربین‌ها: capture → پیش‌پردازش → استنتاج
+- یک پردازه capture برای هر دوربین (RTSP، شماره دستگاه یا فایل ویدیو)
+- frame ها در ring buffer های multiprocessing.shared_memory نوشته می‌شوند (بدون pickle و کپی)
+- پردازه‌های استنتاج روی هسته‌های مشخص pin می‌شوند و هر کدام چند دوربین را سرویس می‌دهند
+- فقط نتیجه‌های کوچک (detection ها) از طریق صف به gateway برمی‌گردند
+- ضبط رویدادمحور در پردازه capture (recording.py)؛ رویدادها با مُهر زمانی در header ring اعلام می‌شوند
+"""
+
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+from threading import Event, Thread
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recording import DEFAULT_RECORDING, RecordingIndex, SegmentRecorder, SegmentStore
+
+logger = logging.getLogger('IoTGateway.camera')
+
+_STATS = '__stats__'
+
+
+class FrameRing:
+    """ring buffer frame ها در shared memory با seqlock برای هر slot
+
+    چیدمان: [head: int64] [record_until: float64] [meta: slots × (seq, timestamp) float64]
+            [frames: slots × H × W × C uint8]
+    """
+
+    HEADER_BYTES = 64
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, int, int], slots: int, owner: bool):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = owner
+
+        buffer = shm.buf
+        meta_bytes = slots * 2 * 8
+        self._head = np.ndarray((1,), np.int64, buffer, 0)
+        self._record_until = np.ndarray((1,), np.float64, buffer, 8)
+        self._meta = np.ndarray((slots, 2), np.float64, buffer, self.HEADER_BYTES)
+        self._frames = np.ndarray((slots,) + self.shape, np.uint8, buffer, self.HEADER_BYTES + meta_bytes)
+
+    @classmethod
+    def size(cls, shape: Sequence[int], slots: int) -> int:
+        return cls.HEADER_BYTES + slots * 2 * 8 + slots * int(np.prod(shape))
+
+    @classmethod
+    def create(cls, shape: Sequence[int], slots: int = 4) -> 'FrameRing':
+        shm = shared_memory.SharedMemory(create=True, size=cls.size(shape, slots))
+        ring = cls(shm, tuple(shape), slots, owner=True)
+        ring._head[0] = 0
+        ring._record_until[0] = 0.0
+        ring._meta[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, shape: Sequence[int], slots: int) -> 'FrameRing':
+        # پردازه‌های فرزند resource tracker سازنده را به ارث می‌برند؛ unlink فقط توسط سازنده
+        return cls(shared_memory.SharedMemory(name=name), tuple(shape), slots, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def latest(self) -> int:
+        """شماره آخرین frame کامل شده (0 = هنوز هیچ)"""
+        return int(self._head[0])
+
+    def record_until(self) -> float:
+        """پایان post-roll آخرین رویداد ضبط (زمان wall-clock)"""
+        return float(self._record_until[0])
+
+    def trigger(self, until: float):
+        """درخواست ضبط تا زمان until (از gateway یا پردازه استنتاج)"""
+        if until > self._record_until[0]:
+            self._record_until[0] = until
+
+    def begin_write(self) -> Tuple[int, np.ndarray]:
+        """slot بعدی برای نوشتن؛ تا commit برای خواننده‌ها نامعتبر است"""
+        seq = self.latest() + 1
+        slot = seq % self.slots
+        self._meta[slot, 0] = -1
+        return seq, self._frames[slot]
+
+    def commit(self, seq: int, timestamp: float):
+        slot = seq % self.slots
+        self._meta[slot, 1] = timestamp
+        self._meta[slot, 0] = seq
+        self._head[0] = seq
+
+    def read(self, seq: int) -> Tuple[Optional[np.ndarray], float]:
+        """view مستقیم روی frame (بدون کپی)؛ پس از استفاده با valid بررسی شود"""
+        slot = seq % self.slots
+        if self._meta[slot, 0] != seq:
+            return None, 0.0
+        return self._frames[slot], float(self._meta[slot, 1])
+
+    def valid(self, seq: int) -> bool:
+        """frame در حین خواندن بازنویسی نشده است"""
+        return self._meta[seq % self.slots, 0] == seq
+
+    def copy(self, seq: Optional[int] = None) -> Optional[np.ndarray]:
+        """کپی یک frame برای استفاده خارج از pipeline (مثلاً snapshot)"""
+        seq = self.latest() if seq is None else seq
+        frame, _ = self.read(seq)
+        if frame is None:
+            return None
+        frame = frame.copy()
+        return frame if self.valid(seq) else None
+
+    def close(self):
+        # view های numpy باید قبل از بستن shared memory آزاد شوند
+        self._head = self._record_until = self._meta = self._frames = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _open_source(source: Any):
+    import cv2
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source)
+
+
+def capture_worker(camera_id: str, source: Any, ring_name: str, shape: Tuple[int, int, int],
+                   slots: int, max_fps: float, loop_files: bool, stop,
+                   recording: Optional[Dict[str, Any]] = None):
+    """پردازه capture: decode مستقیم در slot ring در صورت یکسان بودن اندازه"""
+    import cv2
+
+    ring = FrameRing.attach(ring_name, shape, slots)
+    recorder = None
+    if recording:
+        store = SegmentStore(str(Path(recording['path']) / camera_id), recording['file_bytes'])
+        recorder = SegmentRecorder(store, fps=recording['fps'], quality=recording['quality'],
+                                   segment_seconds=recording['segment_seconds'],
+                                   pre_roll=recording['pre_roll'])
+    capture = _open_source(source)
+    is_file = isinstance(source, str) and Path(source).is_file()
+    fps = capture.get(cv2.CAP_PROP_FPS) if is_file else 0
+    interval = 1.0 / min(fps or max_fps, max_fps) if max_fps else 0.0
+    height, width = shape[:2]
+    next_frame = time.monotonic()
+
+    try:
+        while not stop.is_set():
+            seq, target = ring.begin_write()
+            ok, frame = capture.read(target)
+            if not ok:
+                if is_file and loop_files:
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                if is_file:
+                    break
+                logger.warning(f"Camera {camera_id}: read failed, reconnecting")
+                capture.release()
+                stop.wait(1.0)
+                capture = _open_source(source)
+                continue
+
+            if not np.shares_memory(frame, target):
+                # اندازه یا فرمت متفاوت: یک resize به داخل slot
+                cv2.resize(frame, (width, height), dst=target, interpolation=cv2.INTER_AREA)
+            timestamp = time.time()
+            ring.commit(seq, timestamp)
+            if recorder:
+                try:
+                    recorder.add(target, timestamp, ring.record_until())
+                except OSError as e:
+                    logger.error(f"Camera {camera_id}: recording failed: {e}")
+
+            # فایل‌ها با نرخ خودشان پخش می‌شوند؛ دوربین‌ها حداکثر با max_fps
+            if interval:
+                next_frame = max(next_frame + interval, time.monotonic() - interval)
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    stop.wait(delay)
+    finally:
+        capture.release()
+        if recorder:
+            recorder.close()
+        ring.close()
+
+
+def load_detector(config: Dict[str, Any]) -> Callable[[np.ndarray], List[Dict]]:
+    """ساخت تابع تشخیص در پردازه استنتاج ('factory' = 'module:function' برای آزمون)"""
+    factory = config.get('factory')
+    if factory:
+        module, name = factory.split(':')
+        return getattr(importlib.import_module(module), name)(config)
+
+    from inference import AIProcessor
+    processor = AIProcessor(config['model_path'],
+                            confidence_threshold=config.get('confidence_threshold', 0.7),
+                            num_threads=config.get('num_threads', 1),
+                            input_range=config.get('input_range', (0.0, 1.0)),
+                            nms_threshold=config.get('nms_threshold', 0.5))
+    return processor.detect_objects
+
+
+def inference_worker(worker_id: int, cameras: List[Tuple[str, str]], shape: Tuple[int, int, int],
+                     slots: int, core: Optional[int], detector_config: Dict[str, Any],
+                     results, stop, motion_record: float = 0.0, stats_interval: float = 5.0):
+    """پردازه استنتاج: آخرین frame هر دوربین → motion gate → مدل → صف نتایج
+
+    motion_record > 0: حرکت تشخیص داده شده ضبط دوربین را تا این تعداد ثانیه فعال می‌کند
+    """
+    from motion import GatedDetector
+
+    if core is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {core})
+
+    rings = {camera_id: FrameRing.attach(name, shape, slots) for camera_id, name in cameras}
+    detector = GatedDetector(load_detector(detector_config), detector_config.get('motion'))
+    last_seq = {camera_id: 0 for camera_id in rings}
+    next_stats = time.monotonic() + stats_interval
+
+    try:
+        while not stop.is_set():
+            idle = True
+            for camera_id, ring in rings.items():
+                seq = ring.latest()
+                if seq <= last_seq[camera_id]:
+                    continue
+                last_seq[camera_id] = seq
+                idle = False
+
+                frame, timestamp = ring.read(seq)
+                if frame is None:
+                    continue
+                # اعتبار slot پس از بارگذاری ورودی مدل و پیش از invoke بررسی می‌شود (torn در آمار detector)
+                detections = detector.process(camera_id, frame, valid=lambda: ring.valid(seq))
+                del frame
+                if motion_record and detector.enabled:
+                    gate = detector.gate(camera_id)
+                    if gate.motion_level >= gate.min_area:
+                        ring.trigger(time.time() + motion_record)
+                if detections is None:
+                    continue
+                results.put((camera_id, seq, timestamp, detections))
+
+            now = time.monotonic()
+            if now >= next_stats:
+                next_stats = now + stats_interval
+                results.put((_STATS, worker_id, detector.stats(), None))
+            if idle:
+                stop.wait(0.005)
+    finally:
+        results.put((_STATS, worker_id, detector.stats(), None))
+        for ring in rings.values():
+            ring.close()
+
+
+class CameraPipeline:
+    """مدیریت پردازه‌های capture و استنتاج و تحویل detection ها به gateway"""
+
+    def __init__(self, cameras: Dict[str, Any],
+                 on_detections: Callable[[str, int, float, List[Dict]], None],
+                 detector: Dict[str, Any], width: int = 1280, height: int = 720,
+                 ring_slots: int = 4, inference_workers: int = 1,
+                 cpu_cores: Optional[Sequence[int]] = None, max_fps: float = 15.0,
+                 loop_files: bool = True, start_method: str = 'spawn',
+                 recording: Optional[Dict[str, Any]] = None):
+        self.cameras = dict(cameras)
+        self.on_detections = on_detections
+        self.detector = detector
+        self.shape = (height, width, 3)
+        self.ring_slots = ring_slots
+        self.inference_workers = max(1, min(inference_workers, len(self.cameras) or 1))
+        self.max_fps = max_fps
+        self.loop_files = loop_files
+
+        # recording باید 'path' داشته باشد؛ بقیه کلیدها از DEFAULT_RECORDING
+        self.recording = None
+        self.recordings = None
+        if recording and recording.get('enabled', True):
+            self.recording = dict(DEFAULT_RECORDING, **recording)
+            self.recordings = RecordingIndex(self.recording['path'])
+        self._retention = None
+        self._retention_stop = Event()
+        self.retention_stats: Dict[str, int] = {}
+
+        if cpu_cores is None and hasattr(os, 'sched_getaffinity'):
+            # هسته اول برای gateway و پردازه‌های capture می‌ماند
+            available = sorted(os.sched_getaffinity(0))
+            cpu_cores = available[1:] or available
+        self.cpu_cores = list(cpu_cores or [])
+
+        self._context = multiprocessing.get_context(start_method)
+        self._stop = None
+        self._results = None
+        self._rings: Dict[str, FrameRing] = {}
+        self._processes: List[multiprocessing.process.BaseProcess] = []
+        self._collector = None
+        self._worker_stats: Dict[int, Dict[str, Any]] = {}
+        self._captured: Dict[str, int] = {}
+        self.delivered = 0
+
+    def start(self):
+        """ساخت ring ها و شروع پردازه‌ها"""
+        if not self.cameras:
+            return
+        self._stop = self._context.Event()
+        self._results = self._context.Queue(maxsize=1000)
+
+        for camera_id, source in self.cameras.items():
+            ring = self._rings[camera_id] = FrameRing.create(self.shape, self.ring_slots)
+            self._spawn(f'capture-{camera_id}', capture_worker,
+                        (camera_id, source, ring.name, self.shape, self.ring_slots,
+                         self.max_fps, self.loop_files, self._stop, self.recording))
+
+        # تقسیم دوربین‌ها بین worker های استنتاج به صورت چرخشی
+        assignments = [[] for _ in range(self.inference_workers)]
+        for i, (camera_id, ring) in enumerate(self._rings.items()):
+            assignments[i % self.inference_workers].append((camera_id, ring.name))
+        motion_record = self.recording['post_roll'] if self._records_on('motion') else 0.0
+        for worker_id, cameras in enumerate(assignments):
+            core = self.cpu_cores[worker_id % len(self.cpu_cores)] if self.cpu_cores else None
+            self._spawn(f'inference-{worker_id}', inference_worker,
+                        (worker_id, cameras, self.shape, self.ring_slots, core,
+                         self.detector, self._results, self._stop, motion_record))
+
+        if self.recording:
+            self._retention_stop.clear()
+            self._retention = Thread(target=self._retention_loop, name='recording-retention', daemon=True)
+            self._retention.start()
+
+        self._collector = Thread(target=self._collect, name='camera-results', daemon=True)
+        self._collector.start()
+        logger.info(f"Camera pipeline started: {len(self.cameras)} cameras, "
+                    f"{self.inference_workers} inference workers on cores {self.cpu_cores}")
+
+    def stop(self, timeout: float = 5.0):
+        """توقف پردازه‌ها و آزاد کردن shared memory"""
+        if self._stop is None:
+            return
+        self._stop.set()
+        self._retention_stop.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+        if self._collector:
+            self._results.put(None)
+            self._collector.join(timeout)
+        for camera_id, ring in self._rings.items():
+            self._captured[camera_id] = ring.latest()
+            ring.close()
+        self._rings.clear()
+        self._processes.clear()
+        self._stop = None
+        logger.info("Camera pipeline stopped")
+
+    def trigger_recording(self, camera_id: Optional[str] = None, event: str = 'detection',
+                          seconds: Optional[float] = None):
+        """شروع/تمدید ضبط یک دوربین (یا همه) اگر نوع رویداد در record_on باشد"""
+        if not self._records_on(event):
+            return
+        until = time.time() + (self.recording['post_roll'] if seconds is None else seconds)
+        rings = dict(self._rings)
+        for ring_id in ([camera_id] if camera_id else rings):
+            ring = rings.get(ring_id)
+            if ring:
+                ring.trigger(until)
+
+    def _records_on(self, event: str) -> bool:
+        return bool(self.recording) and event in self.recording['record_on']
+
+    def _retention_loop(self):
+        """اعمال دوره‌ای سقف حجم و عمر ضبط‌ها"""
+        while not self._retention_stop.is_set():
+            try:
+                self.retention_stats = self.recordings.enforce_retention(
+                    self.recording['quota_bytes'], self.recording['max_age'])
+            except OSError as e:
+                logger.error(f"Recording retention failed: {e}")
+            self._retention_stop.wait(self.recording['retention_interval'])
+
+    def latest_frame(self, camera_id: str) -> Optional[np.ndarray]:
+        """کپی آخرین frame یک دوربین"""
+        ring = self._rings.get(camera_id)
+        return ring.copy() if ring else None
+
+    def stats(self) -> Dict[str, Any]:
+        cameras = {}
+        for worker in list(self._worker_stats.values()):
+            cameras.update(worker.get('cameras', {}))
+        rings = dict(self._rings)
+        return {
+            'cameras': {camera_id: dict(cameras.get(camera_id, {}),
+                                        captured=rings[camera_id].latest() if camera_id in rings
+                                        else self._captured.get(camera_id, 0))
+                        for camera_id in self.cameras},
+            'processes': {p.name: p.is_alive() for p in self._processes},
+            'torn_frames': sum(w.get('torn_frames', 0) for w in self._worker_stats.values()),
+            'delivered': self.delivered,
+            'recording': self.retention_stats if self.recording else None
+        }
+
+    def _spawn(self, name: str, target, args):
+        process = self._context.Process(target=target, args=args, name=name, daemon=True)
+        process.start()
+        self._processes.append(process)
+
+    def _collect(self):
+        """thread دریافت نتایج از پردازه‌های استنتاج"""
+        while True:
+            try:
+                item = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if self._stop is None or self._stop.is_set():
+                    return
+                continue
+            if item is None:
+                return
+            if item[0] == _STATS:
+                _, worker_id, stats, _ = item
+                self._worker_stats[worker_id] = stats
+                continue
+
+            camera_id, seq, timestamp, detections = item
+            self.delivered += 1
+            try:
+                self.on_detections(camera_id, seq, timestamp, detections)
+            except Exception as e:
+                logger.error(f"Detection handler error for {camera_id}: {e}")
@@ -0,0 +1,154 @@
+"""
+IoT Smart System - Payload Codecs
+=================================
+
+لایه codec برای payload های MQTT:
+- JSON، CBOR و MessagePack (دو مورد آخر در صورت نصب بودن کتابخانه)
+- تشخیص codec از content-type، پسوند topic یا بایت اول payload
+- router کامپایل شده topic ها با پشتیبانی + و # و cache نتیجه
+- Reading: payload یک بار decode می‌شود و همان dict بین مراحل pipeline مشترک است
+"""
+
+import functools
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger('IoTGateway.codec')
+
+# کتابخانه‌های اختیاری
+try:
+    import cbor2
+    CBOR_AVAILABLE = True
+except ImportError:
+    CBOR_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+
+class Codec:
+    """یک فرمت payload"""
+
+    __slots__ = ('name', 'content_types', 'decode', 'encode')
+
+    def __init__(self, name: str, content_types: Tuple[str, ...],
+                 decode: Callable[[bytes], Any], encode: Callable[[Any], bytes]):
+        self.name = name
+        self.content_types = content_types
+        self.decode = decode
+        self.encode = encode
+
+
+CODECS: Dict[str, Codec] = {
+    'json': Codec('json', ('application/json',), json.loads,
+                  lambda obj: json.dumps(obj).encode())
+}
+
+if CBOR_AVAILABLE:
+    CODECS['cbor'] = Codec('cbor', ('application/cbor',), cbor2.loads, cbor2.dumps)
+
+if MSGPACK_AVAILABLE:
+    CODECS['msgpack'] = Codec('msgpack', ('application/msgpack', 'application/x-msgpack'),
+                              functools.partial(msgpack.unpackb, raw=False), msgpack.packb)
+
+_BY_CONTENT_TYPE = {ct: codec for codec in CODECS.values() for ct in codec.content_types}
+
+
+def sniff_codec(payload: bytes) -> Codec:
+    """تشخیص codec از بایت اول (map در CBOR: 0xa0-0xbf، در MessagePack: 0x80-0x8f/0xde/0xdf)"""
+    if payload:
+        first = payload[0]
+        if 0xa0 <= first <= 0xbf and 'cbor' in CODECS:
+            return CODECS['cbor']
+        if (0x80 <= first <= 0x8f or first in (0xde, 0xdf)) and 'msgpack' in CODECS:
+            return CODECS['msgpack']
+    return CODECS['json']
+
+
+def select_codec(payload: bytes, content_type: Optional[str] = None,
+                 suffix: Optional[str] = None) -> Optional[Codec]:
+    """انتخاب codec: content-type، سپس پسوند topic، سپس بایت اول payload"""
+    if content_type:
+        codec = _BY_CONTENT_TYPE.get(content_type.split(';')[0].strip().lower())
+        if codec:
+            return codec
+    if suffix:
+        # پسوند ناشناخته (یا codec نصب نشده) = پیام قابل پردازش نیست
+        return CODECS.get(suffix.lower())
+    return sniff_codec(payload)
+
+
+class Reading:
+    """یک پیام سنسور که فقط یک بار decode شده است"""
+
+    __slots__ = ('device_id', 'data', 'received', 'codec')
+
+    def __init__(self, device_id: str, data: Dict[str, Any], received: float, codec: str = 'json'):
+        self.device_id = device_id
+        self.data = data
+        self.received = received
+        self.codec = codec
+
+
+def decode_reading(device_id: str, codec: Codec, payload: bytes,
+                   received: Optional[float] = None) -> Reading:
+    """decode یک payload سنسور؛ ValueError اگر payload یک object نباشد"""
+    data = codec.decode(payload)
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected an object payload, got {type(data).__name__}")
+    return Reading(device_id, data, time.time() if received is None else received, codec.name)
+
+
+_ROUTE = None  # کلید route در گره‌های trie (سطح topic هیچ‌وقت None نیست)
+
+
+class TopicRouter:
+    """مسیریابی topic با trie سطح‌ها و cache نتیجه برای topic های تکراری"""
+
+    def __init__(self, cache_size: int = 65536):
+        self._root: Dict[Any, Any] = {}
+        self.match = functools.lru_cache(maxsize=cache_size)(self._match)
+
+    def add(self, pattern: str, name: str):
+        """ثبت الگوی MQTT (با + و #) برای یک route"""
+        node = self._root
+        for level in pattern.split('/'):
+            node = node.setdefault(level, {})
+        node[_ROUTE] = name
+        self.match.cache_clear()
+
+    def _match(self, topic: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        """(route، مقادیر + و #) یا None"""
+        return self._walk(self._root, topic.split('/'), 0, ())
+
+    def _walk(self, node, levels, i, params):
+        if i == len(levels):
+            if _ROUTE in node:
+                return node[_ROUTE], params
+            wildcard = node.get('#')
+            if wildcard and _ROUTE in wildcard:
+                return wildcard[_ROUTE], params + ('',)
+            return None
+
+        level = levels[i]
+        child = node.get(level)
+        if child is not None:
+            found = self._walk(child, levels, i + 1, params)
+            if found:
+                return found
+
+        child = node.get('+')
+        if child is not None:
+            found = self._walk(child, levels, i + 1, params + (level,))
+            if found:
+                return found
+
+        child = node.get('#')
+        if child is not None and _ROUTE in child:
+            return child[_ROUTE], params + ('/'.join(levels[i:]),)
+        return None
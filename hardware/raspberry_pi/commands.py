@@ -0,0 +1,254 @@
+"""
+IoT Smart System - Command Dispatch
+===================================
+
+ارسال دستور به گروهی از دستگاه‌ها با پیگیری تایید:
+- یک job برای لیست دستگاه‌ها؛ ارسال با محدودیت نرخ (token bucket) و MQTT QoS 1
+- correlation_id برای هر دستگاه در payload؛ دستگاه روی devices/<id>/ack پاسخ می‌دهد
+- یک Future برای هر دستگاه؛ مهلت ack با timer wheel (liveness.TimerWheel) و تکرار تا retries بار
+- نتیجه تجمیعی job (ok / error / timeout / pending) و جزئیات هر دستگاه
+"""
+
+import json
+import logging
+import queue
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, wait
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from liveness import TimerWheel
+
+logger = logging.getLogger('IoTGateway.commands')
+
+COMMAND_TOPIC = 'devices/{}/commands'
+
+# وضعیت‌های نهایی نتیجه هر دستگاه
+FINAL_STATUSES = ('ok', 'error', 'timeout')
+
+
+class DeviceCommand:
+    """ارسال یک دستور به یک دستگاه؛ future با نتیجه نهایی کامل می‌شود"""
+
+    __slots__ = ('job', 'device_id', 'correlation_id', 'attempts', 'sent_at', 'future')
+
+    def __init__(self, job: 'CommandJob', device_id: str, correlation_id: str):
+        self.job = job
+        self.device_id = device_id
+        self.correlation_id = correlation_id
+        self.attempts = 0
+        self.sent_at = 0.0
+        self.future: Future = Future()
+
+
+class CommandJob:
+    """یک دستور برای چند دستگاه با نتیجه تجمیعی"""
+
+    def __init__(self, job_id: str, command: Dict[str, Any], device_ids: List[str],
+                 timeout: float, retries: int):
+        self.job_id = job_id
+        self.command = command
+        self.timeout = timeout
+        self.retries = retries
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.targets = OrderedDict(
+            (device_id, DeviceCommand(self, device_id, f'{job_id}.{i}'))
+            for i, device_id in enumerate(device_ids))
+
+    @property
+    def done(self) -> bool:
+        return all(t.future.done() for t in self.targets.values())
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """انتظار تا نهایی شدن نتیجه همه دستگاه‌ها"""
+        _, pending = wait([t.future for t in self.targets.values()], timeout)
+        return not pending
+
+    def summary(self, details: bool = True) -> Dict[str, Any]:
+        results = {}
+        counts = Counter()
+        for device_id, target in self.targets.items():
+            if target.future.done():
+                result = dict(target.future.result(), attempts=target.attempts)
+            else:
+                result = {'status': 'pending', 'attempts': target.attempts}
+            counts[result['status']] += 1
+            results[device_id] = result
+        summary = {
+            'job_id': self.job_id,
+            'command': self.command,
+            'created': self.created,
+            'finished': self.finished,
+            'devices': len(self.targets),
+            'counts': dict(counts)
+        }
+        if details:
+            summary['results'] = results
+        return summary
+
+
+class CommandDispatcher:
+    """صف ارسال با محدودیت نرخ و پیگیری ack بر اساس correlation_id"""
+
+    def __init__(self, publish: Callable[[str, str, int], Any], rate_limit: float = 200.0,
+                 burst: int = 50, timeout: float = 10.0, retries: int = 2, qos: int = 1,
+                 max_jobs: int = 100, tick: float = 0.1):
+        self.publish = publish
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.timeout = timeout
+        self.retries = retries
+        self.qos = qos
+        self.max_jobs = max_jobs
+
+        self.jobs: 'OrderedDict[str, CommandJob]' = OrderedDict()
+        self._inflight: Dict[str, DeviceCommand] = {}
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self.timer = TimerWheel(on_expire=self._expire, tick=tick, slots=1024)
+
+        self.sent = 0
+        self.retried = 0
+        self.acked = 0
+        self.timed_out = 0
+        self.unknown_acks = 0
+        self.publish_errors = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self.timer.start()
+        self._thread = Thread(target=self._run, name='command-dispatch', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._queue.put(None)
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+        self.timer.stop()
+
+    def dispatch(self, command: Dict[str, Any], device_ids: Iterable[str],
+                 timeout: Optional[float] = None, retries: Optional[int] = None) -> CommandJob:
+        """ثبت job و قرار دادن ارسال هر دستگاه در صف (بدون انتظار)"""
+        device_ids = list(dict.fromkeys(device_ids))
+        job = CommandJob(uuid.uuid4().hex[:12], command, device_ids,
+                         self.timeout if timeout is None else timeout,
+                         self.retries if retries is None else retries)
+        with self._lock:
+            self.jobs[job.job_id] = job
+            # job های قدیمی و تمام شده حذف می‌شوند
+            while len(self.jobs) > self.max_jobs:
+                oldest = next(iter(self.jobs.values()))
+                if not oldest.done:
+                    break
+                self.jobs.popitem(last=False)
+            for target in job.targets.values():
+                self._inflight[target.correlation_id] = target
+        for target in job.targets.values():
+            self._queue.put(target)
+        logger.info(f"Command job {job.job_id}: {command.get('command', command)} to {len(device_ids)} devices")
+        return job
+
+    def get(self, job_id: str) -> Optional[CommandJob]:
+        return self.jobs.get(job_id)
+
+    def handle_ack(self, device_id: str, payload: Dict[str, Any]):
+        """پاسخ دستگاه از devices/<id>/ack"""
+        correlation_id = payload.get('correlation_id')
+        with self._lock:
+            target = self._inflight.get(correlation_id)
+            if target is None or target.device_id != device_id:
+                self.unknown_acks += 1
+                return
+            del self._inflight[correlation_id]
+        self.timer.cancel(correlation_id)
+        status = 'ok' if payload.get('status', 'ok') in ('ok', 'success', True) else 'error'
+        result = {'status': status, 'latency': round(time.monotonic() - target.sent_at, 4)}
+        for key in ('result', 'error'):
+            if key in payload:
+                result[key] = payload[key]
+        self.acked += 1
+        self._finish(target, result)
+
+    def _run(self):
+        """ارسال به ترتیب صف با رعایت سقف نرخ"""
+        while not self._stop_event.is_set():
+            target = self._queue.get()
+            if target is None:
+                continue
+            if target.future.done():
+                continue
+            # توقف در حین انتظار برای token: ارسال نمی‌شود
+            if not self._wait_token():
+                return
+            self._send(target)
+
+    def _send(self, target: DeviceCommand):
+        payload = dict(target.job.command, correlation_id=target.correlation_id)
+        target.attempts += 1
+        target.sent_at = time.monotonic()
+        # مهلت قبل از publish؛ ack سریع ممکن است پیش از بازگشت publish برسد
+        self.timer.arm(target.correlation_id, target.job.timeout)
+        try:
+            self.publish(COMMAND_TOPIC.format(target.device_id), json.dumps(payload), self.qos)
+        except Exception as e:
+            # مثل عدم دریافت ack: پس از مهلت دوباره تلاش می‌شود
+            self.publish_errors += 1
+            logger.debug(f"Command publish to {target.device_id} failed: {e}")
+        self.sent += 1
+
+    def _expire(self, correlation_id: str):
+        """مهلت ack تمام شد: تکرار یا نتیجه timeout"""
+        with self._lock:
+            target = self._inflight.get(correlation_id)
+            if target is None:
+                return
+            if target.attempts <= target.job.retries:
+                self.retried += 1
+                self._queue.put(target)
+                return
+            del self._inflight[correlation_id]
+        self.timed_out += 1
+        self._finish(target, {'status': 'timeout'})
+
+    def _finish(self, target: DeviceCommand, result: Dict[str, Any]):
+        if target.future.done():
+            return
+        target.future.set_result(result)
+        job = target.job
+        if job.finished is None and job.done:
+            job.finished = time.time()
+            logger.info(f"Command job {job.job_id} finished: {job.summary(details=False)['counts']}")
+
+    def _wait_token(self) -> bool:
+        """token bucket ارسال؛ در صورت نبود token تا رسیدن آن صبر می‌کند (False اگر در این مدت stop شود)"""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            if self._stop_event.wait((1 - self._tokens) / self.rate_limit):
+                return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'jobs': len(self.jobs),
+            'inflight': len(self._inflight),
+            'queued': self._queue.qsize(),
+            'sent': self.sent,
+            'retried': self.retried,
+            'acked': self.acked,
+            'timed_out': self.timed_out,
+            'unknown_acks': self.unknown_acks,
+            'publish_errors': self.publish_errors
+        }
@@ -0,0 +1,263 @@
+"""
+IoT Smart System - Device State
+===============================
+
+وضعیت درون‌حافظه‌ای دستگاه‌ها:
+- شیء DeviceState با __slots__ به جای dict های موقت
+- ring buffer با ظرفیت ثابت NumPy برای خوانش‌های اخیر هر دستگاه
+- پرس‌وجوی پنجره‌ای (mean/min/max/last-N) به صورت برداری
+- ایندکس افزایشی دستگاه‌های آنلاین و آمار O(1)
+"""
+
+from collections import Counter
+from threading import Lock
+from typing import Any, Dict, List, Sequence, Set
+
+import numpy as np
+
+RING_METRICS = ('temperature', 'humidity', 'pressure', 'light_level', 'battery')
+
+# فیلدهای payload که یک سنسور محسوب می‌شوند (وقتی دستگاه لیست sensors نمی‌فرستد)
+SENSOR_FIELDS = ('temperature', 'humidity', 'pressure', 'light_level', 'motion')
+
+
+def _as_float(value) -> float:
+    """تبدیل مقدار payload به float (مقدار نامعتبر = NaN)"""
+    if value is None or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ReadingRing:
+    """ring buffer با ظرفیت ثابت: یک ستون float32 برای هر متریک و یک آرایه زمان مشترک"""
+
+    __slots__ = ('capacity', 'times', 'values', 'head', 'size')
+
+    def __init__(self, capacity: int, metrics: int = len(RING_METRICS)):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, metrics), np.nan, dtype=np.float32)
+        self.head = 0
+        self.size = 0
+
+    def append(self, timestamp: float, values: Sequence[float]):
+        """نوشتن یک نمونه روی قدیمی‌ترین خانه"""
+        i = self.head
+        self.times[i] = timestamp
+        self.values[i] = values
+        self.head = (i + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def window(self, since: float) -> np.ndarray:
+        """مقادیر نمونه‌های جدیدتر از since (ترتیب زمانی مهم نیست)"""
+        mask = self.times[:self.size] >= since
+        return self.values[:self.size][mask]
+
+    def last(self, n: int):
+        """n نمونه آخر به ترتیب زمانی (times, values)"""
+        n = min(n, self.size)
+        idx = (self.head - n + np.arange(n)) % self.capacity
+        return self.times[idx], self.values[idx]
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+
+class DeviceState:
+    """وضعیت یک دستگاه متصل"""
+
+    __slots__ = ('id', 'first_seen', 'last_seen', 'last_data', 'sensors', 'device_type',
+                 'temperature', 'humidity', 'motion', 'battery', 'ring')
+
+    def __init__(self, device_id: str, first_seen: float, capacity: int):
+        self.id = device_id
+        self.first_seen = first_seen
+        self.last_seen = 0.0
+        self.last_data: Dict[str, Any] = {}
+        self.sensors: List[str] = []
+        self.device_type = 'unknown'
+        self.temperature = None
+        self.humidity = None
+        self.motion = None
+        self.battery = None
+        self.ring = ReadingRing(capacity)
+
+    def update(self, data: Dict, now: float):
+        """اعمال یک پیام سنسور جدید"""
+        self.last_seen = now
+        self.last_data = data
+        self.temperature = data.get('temperature')
+        self.humidity = data.get('humidity')
+        self.motion = data.get('motion')
+        self.battery = data.get('battery')
+        self.device_type = data.get('type', self.device_type)
+
+        sensors = data.get('sensors')
+        if not isinstance(sensors, list):
+            sensors = [f for f in SENSOR_FIELDS if f in data]
+        if sensors != self.sensors:
+            self.sensors = sensors
+
+        self.ring.append(now, [_as_float(data.get(m)) for m in RING_METRICS])
+
+    def window_stats(self, seconds: float, now: float,
+                     metrics: Sequence[str] = RING_METRICS) -> Dict[str, Dict[str, Any]]:
+        """آمار mean/min/max/count هر متریک در پنجره زمانی اخیر"""
+        values = self.ring.window(now - seconds)
+        stats = {}
+
+        if len(values):
+            valid = ~np.isnan(values)
+            counts = valid.sum(axis=0)
+            sums = np.where(valid, values, 0).sum(axis=0, dtype=np.float64)
+            mins = np.fmin.reduce(values, axis=0)
+            maxs = np.fmax.reduce(values, axis=0)
+
+        for metric in metrics:
+            if metric not in RING_METRICS:
+                continue
+            col = RING_METRICS.index(metric)
+            count = int(counts[col]) if len(values) else 0
+            stats[metric] = {
+                'count': count,
+                'mean': float(sums[col] / count) if count else None,
+                'min': float(mins[col]) if count else None,
+                'max': float(maxs[col]) if count else None
+            }
+        return stats
+
+    def last_readings(self, n: int, metrics: Sequence[str] = RING_METRICS) -> Dict[str, Any]:
+        """n خوانش آخر هر متریک به ترتیب زمانی"""
+        times, values = self.ring.last(n)
+        result: Dict[str, Any] = {'t': times.tolist()}
+        for metric in metrics:
+            if metric in RING_METRICS:
+                column = values[:, RING_METRICS.index(metric)]
+                result[metric] = [None if np.isnan(v) else float(v) for v in column]
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """نمایش JSON سازگار با API قبلی"""
+        return {
+            'id': self.id,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'sensors': self.sensors,
+            'type': self.device_type,
+            'last_data': self.last_data,
+            'temperature': self.temperature,
+            'humidity': self.humidity,
+            'motion': self.motion,
+            'battery': self.battery
+        }
+
+
+class DeviceIndex:
+    """شمارنده‌های افزایشی دستگاه‌ها، سنسورها و دستگاه‌های آنلاین
+
+    گذار به offline از بیرون (timer wheel ماژول liveness) اعلام می‌شود،
+    پس هم به‌روزرسانی و هم آمار O(1) هستند.
+    """
+
+    def __init__(self):
+        self._online: Set[str] = set()
+        self._sensor_counts: Dict[str, int] = {}
+        self._types: Dict[str, str] = {}
+        self._ring_bytes: Dict[str, int] = {}
+        self.type_counts: Counter = Counter()
+        self.online_type_counts: Counter = Counter()
+        self.total_devices = 0
+        self.total_sensors = 0
+        self.ring_bytes = 0
+        self._lock = Lock()
+
+    def touch(self, device: DeviceState) -> bool:
+        """ثبت پیام دستگاه؛ True اگر دستگاه تازه آنلاین شده باشد"""
+        device_id = device.id
+        with self._lock:
+            sensors = len(device.sensors)
+            previous = self._sensor_counts.get(device_id)
+            if previous is None:
+                self.total_devices += 1
+                self._ring_bytes[device_id] = device.ring.nbytes
+                self.ring_bytes += device.ring.nbytes
+                self.total_sensors += sensors
+                self._types[device_id] = device.device_type
+                self.type_counts[device.device_type] += 1
+            else:
+                self.total_sensors += sensors - previous
+                old_type = self._types[device_id]
+                if old_type != device.device_type:
+                    self._retype(device_id, old_type, device.device_type)
+            self._sensor_counts[device_id] = sensors
+
+            came_online = device_id not in self._online
+            if came_online:
+                self._online.add(device_id)
+                self.online_type_counts[device.device_type] += 1
+            return came_online
+
+    def set_offline(self, device_id: str) -> bool:
+        """ثبت گذار به offline؛ False اگر دستگاه از قبل offline بوده"""
+        with self._lock:
+            if device_id not in self._online:
+                return False
+            self._online.discard(device_id)
+            self.online_type_counts[self._types[device_id]] -= 1
+            return True
+
+    def remove(self, device_id: str):
+        """حذف کامل دستگاه از ایندکس"""
+        with self._lock:
+            sensors = self._sensor_counts.pop(device_id, None)
+            if sensors is None:
+                return
+            device_type = self._types.pop(device_id)
+            self.ring_bytes -= self._ring_bytes.pop(device_id)
+            self.total_devices -= 1
+            self.total_sensors -= sensors
+            self.type_counts[device_type] -= 1
+            if device_id in self._online:
+                self._online.discard(device_id)
+                self.online_type_counts[device_type] -= 1
+
+    def is_online(self, device_id: str) -> bool:
+        return device_id in self._online
+
+    @property
+    def online_devices(self) -> int:
+        return len(self._online)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'total_devices': self.total_devices,
+                'online_devices': len(self._online),
+                'offline_devices': self.total_devices - len(self._online),
+                'total_sensors': self.total_sensors,
+                'device_types': {t: {'total': n, 'online': self.online_type_counts[t]}
+                                 for t, n in self.type_counts.items() if n},
+                'memory': {
+                    'ring_bytes': self.ring_bytes,
+                    'ring_megabytes': round(self.ring_bytes / (1024 * 1024), 2)
+                }
+            }
+
+    def _retype(self, device_id: str, old_type: str, new_type: str):
+        self._types[device_id] = new_type
+        self.type_counts[old_type] -= 1
+        self.type_counts[new_type] += 1
+        if device_id in self._online:
+            self.online_type_counts[old_type] -= 1
+            self.online_type_counts[new_type] += 1
+
+
+def estimate_memory(devices: int, capacity: int) -> int:
+    """برآورد حجم ring buffer ها برای برنامه‌ریزی ظرفیت (بایت)"""
+    per_sample = np.dtype(np.float64).itemsize + len(RING_METRICS) * np.dtype(np.float32).itemsize
+    return devices * capacity * per_sample
@@ -0,0 +1,257 @@
+"""
+IoT Smart System - Socket.IO Fan-out
+====================================
+
+ارسال بلادرنگ داده‌ها به داشبوردها و اپ موبایل:
+- room برای هر دستگاه و مجموعه subscription برای هر client
+- هر client حداکثر نرخ به‌روزرسانی خودش را تعیین می‌کند
+- فقط فیلدهای تغییر کرده (delta) ارسال می‌شوند
+- به‌روزرسانی‌ها داخل پنجره frame هر client ادغام می‌شوند
+- شمارنده تعداد emit و حجم ارسالی برای هر client
+"""
+
+import json
+import logging
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from metrics import Histogram
+
+logger = logging.getLogger('IoTGateway.fanout')
+
+WILDCARD = '*'
+
+_MISSING = object()
+
+
+def device_room(device_id: str) -> str:
+    """نام room مخصوص یک دستگاه"""
+    return f'device:{device_id}'
+
+
+class ClientState:
+    """وضعیت subscription یک client متصل"""
+
+    __slots__ = ('sid', 'devices', 'interval', 'next_frame', 'pending',
+                 'frames', 'updates', 'bytes_sent', 'connected_at')
+
+    def __init__(self, sid: str, interval: float):
+        self.sid = sid
+        self.devices: Set[str] = set()
+        self.interval = interval
+        self.next_frame = 0.0
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.frames = 0
+        self.updates = 0
+        self.bytes_sent = 0
+        self.connected_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'devices': len(self.devices),
+            'max_rate': round(1.0 / self.interval, 3) if self.interval else None,
+            'frames': self.frames,
+            'updates': self.updates,
+            'bytes_sent': self.bytes_sent,
+            'pending_devices': len(self.pending)
+        }
+
+
+class FanoutHub:
+    """مدیریت subscription ها و ارسال delta های ادغام شده در frame هر client"""
+
+    def __init__(self, emit: Callable[[str, Any, Any], None], default_rate: float = 2.0,
+                 max_rate: float = 20.0, tick: float = 0.05):
+        self.emit = emit
+        self.default_rate = default_rate
+        self.max_rate = max_rate
+        self.tick = tick
+
+        self._clients: Dict[str, ClientState] = {}
+        self._subscribers: Dict[str, Set[str]] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+
+        self.published = 0
+        self.unchanged = 0
+        self.frames = 0
+        self.bytes_sent = 0
+        self.emit_seconds = Histogram()   # serialize + emit هر frame
+
+    def start(self):
+        """شروع thread ارسال frame ها"""
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='socketio-fanout', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(self.tick + 1)
+            self._thread = None
+
+    def add_client(self, sid: str):
+        with self._lock:
+            self._clients[sid] = ClientState(sid, self._interval(self.default_rate))
+
+    def remove_client(self, sid: str):
+        """حذف client و همه subscription هایش"""
+        with self._lock:
+            client = self._clients.pop(sid, None)
+            if client is None:
+                return
+            for device_id in client.devices:
+                subscribers = self._subscribers.get(device_id)
+                if subscribers is not None:
+                    subscribers.discard(sid)
+                    if not subscribers:
+                        del self._subscribers[device_id]
+            self._dirty.discard(sid)
+
+    def subscribe(self, sid: str, device_ids: Iterable[str],
+                  max_rate: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """subscribe به دستگاه‌ها ('*' = همه)؛ آخرین وضعیت کامل آن‌ها برگردانده می‌شود"""
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                client = self._clients[sid] = ClientState(sid, self._interval(self.default_rate))
+            if max_rate is not None:
+                client.interval = self._interval(max_rate)
+
+            snapshot = {}
+            for device_id in device_ids:
+                client.devices.add(device_id)
+                self._subscribers.setdefault(device_id, set()).add(sid)
+                if device_id == WILDCARD:
+                    snapshot.update({k: dict(v) for k, v in self._latest.items()})
+                elif device_id in self._latest:
+                    snapshot[device_id] = dict(self._latest[device_id])
+            return snapshot
+
+    def unsubscribe(self, sid: str, device_ids: Iterable[str]):
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                return
+            for device_id in device_ids:
+                client.devices.discard(device_id)
+                client.pending.pop(device_id, None)
+                subscribers = self._subscribers.get(device_id)
+                if subscribers is not None:
+                    subscribers.discard(sid)
+                    if not subscribers:
+                        del self._subscribers[device_id]
+
+    def set_rate(self, sid: str, max_rate: float):
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is not None:
+                client.interval = self._interval(max_rate)
+
+    def publish(self, device_id: str, data: Dict[str, Any]):
+        """ثبت پیام جدید دستگاه؛ فقط فیلدهای تغییر کرده به pending subscriber ها اضافه می‌شوند"""
+        with self._lock:
+            self.published += 1
+            previous = self._latest.get(device_id)
+            if previous is None:
+                delta = dict(data)
+                self._latest[device_id] = dict(data)
+            else:
+                delta = {k: v for k, v in data.items() if previous.get(k, _MISSING) != v}
+                previous.update(delta)
+
+            if not delta:
+                self.unchanged += 1
+                return
+
+            targets = self._subscribers.get(device_id, set())
+            everyone = self._subscribers.get(WILDCARD)
+            if everyone:
+                targets = targets | everyone
+
+            for sid in targets:
+                client = self._clients[sid]
+                pending = client.pending.get(device_id)
+                if pending is None:
+                    client.pending[device_id] = dict(delta)
+                else:
+                    pending.update(delta)
+                client.updates += 1
+                self._dirty.add(sid)
+
+    def forget(self, device_id: str):
+        """حذف آخرین وضعیت دستگاه (مثلاً بعد از حذف دستگاه)"""
+        with self._lock:
+            self._latest.pop(device_id, None)
+
+    def flush(self, now: Optional[float] = None) -> int:
+        """ارسال frame های clients که پنجره زمانی‌شان رسیده؛ تعداد frame ها"""
+        now = time.monotonic() if now is None else now
+        due = []
+        with self._lock:
+            for sid in list(self._dirty):
+                client = self._clients.get(sid)
+                if client is None:
+                    self._dirty.discard(sid)
+                    continue
+                if now < client.next_frame:
+                    continue
+                if client.pending:
+                    due.append((client, client.pending))
+                    client.pending = {}
+                client.next_frame = now + client.interval
+                self._dirty.discard(sid)
+
+        for client, frame in due:
+            # payload رویداد sensor_delta شیء {device_id: {field: value}} است؛ حجم از serialize فشرده
+            started = time.perf_counter()
+            body = json.dumps(frame, separators=(',', ':'), default=str)
+            try:
+                self.emit('sensor_delta', frame, client.sid)
+            except Exception as e:
+                logger.error(f"Fan-out emit error for {client.sid}: {e}")
+                continue
+            self.emit_seconds.observe(time.perf_counter() - started)
+            client.frames += 1
+            client.bytes_sent += len(body)
+            self.frames += 1
+            self.bytes_sent += len(body)
+        return len(due)
+
+    def rooms_for(self, device_id: str) -> List[str]:
+        """room هایی که رویدادهای یک دستگاه (مثل alert) باید به آن‌ها برود"""
+        return [device_room(device_id), device_room(WILDCARD)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'subscribed_devices': len(self._subscribers),
+                'published': self.published,
+                'unchanged': self.unchanged,
+                'frames': self.frames,
+                'bytes_sent': self.bytes_sent
+            }
+
+    def client_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {sid: client.stats() for sid, client in self._clients.items()}
+
+    def _interval(self, rate) -> float:
+        """فاصله frame ها برای نرخ درخواستی client (مقدار نامعتبر، NaN یا ≤ 0 = نرخ پیش‌فرض)"""
+        try:
+            rate = min(float(rate), self.max_rate)
+        except (TypeError, ValueError):
+            rate = 0.0
+        return 1.0 / rate if rate > 0 else 1.0 / self.default_rate
+
+    def _run(self):
+        while not self._stop_event.wait(self.tick):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Fan-out flush error: {e}")
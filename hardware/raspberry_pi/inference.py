@@ -0,0 +1,171 @@
+"""
+IoT Smart System - AI Inference
+===============================
+
+تشخیص اشیاء با TFLite روی frame های دوربین:
+- resize و نرمال‌سازی درجا در tensor ورودی interpreter (بدون تخصیص حافظه برای هر frame)
+- مسیر uint8 بومی برای مدل‌های quantized
+- تعداد thread هر interpreter قابل تنظیم و pool از interpreter ها برای اجرای هم‌زمان چند دوربین
+- فیلتر برداری score ها و non-max suppression با NumPy
+"""
+
+import logging
+import queue
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import Histogram
+from startup import lazy_import
+from tracking import nms
+
+logger = logging.getLogger('IoTGateway.ai')
+
+cv2 = lazy_import('cv2')
+tflite_runtime = lazy_import('tflite_runtime.interpreter')
+tf = lazy_import('tensorflow')
+
+# tflite_runtime روی Raspberry Pi بسیار سبک‌تر از TensorFlow کامل است
+AI_AVAILABLE = tflite_runtime.available or tf.available
+
+
+def load_interpreter(model_path: str, num_threads: int):
+    """ساخت interpreter با tflite_runtime در صورت نصب بودن، در غیر این صورت tf.lite"""
+    if tflite_runtime.available:
+        return tflite_runtime.Interpreter(model_path=model_path, num_threads=num_threads)
+    return tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+
+
+def input_lut(dtype, quantization: Tuple[float, int], input_range: Sequence[float]) -> np.ndarray:
+    """جدول تبدیل پیکسل 0..255 به مقدار ورودی مدل (نرمال‌سازی و quantization در یک مرحله)"""
+    low, high = input_range
+    values = low + np.arange(256, dtype=np.float64) * (high - low) / 255.0
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu':
+        scale, zero_point = quantization
+        if scale:
+            values = np.round(values / scale + zero_point)
+        info = np.iinfo(dtype)
+        values = np.clip(values, info.min, info.max)
+    return values.astype(dtype)
+
+
+class _InterpreterSlot:
+    """یک interpreter با بافرهای از قبل تخصیص یافته"""
+
+    def __init__(self, interpreter, input_range: Sequence[float]):
+        self.interpreter = interpreter
+        self.interpreter.allocate_tensors()
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+
+        details = self.input_details[0]
+        _, height, width, channels = (int(d) for d in details['shape'])
+        self.size = (width, height)
+        self.lut = input_lut(details['dtype'], details['quantization'], input_range)
+
+        # مدل uint8 که پیکسل خام می‌خواهد: resize مستقیم در tensor ورودی
+        self.direct = self.lut.dtype == np.uint8 and np.array_equal(self.lut, np.arange(256))
+        self.resized = None if self.direct else np.empty((height, width, channels), np.uint8)
+
+        # interpreter.tensor فقط تابع view را نگه می‌دارد؛ view ها نباید تا invoke بعدی زنده بمانند
+        self._input = interpreter.tensor(details['index'])
+        self._outputs = [(interpreter.tensor(d['index']), d['quantization'])
+                         for d in self.output_details[:3]]
+
+    def load(self, frame: np.ndarray):
+        """resize و تبدیل frame مستقیماً در tensor ورودی"""
+        target = self._input()[0]
+        if self.direct:
+            cv2.resize(frame, self.size, dst=target, interpolation=cv2.INTER_LINEAR)
+        else:
+            cv2.resize(frame, self.size, dst=self.resized, interpolation=cv2.INTER_LINEAR)
+            np.take(self.lut, self.resized, out=target)
+
+    def output(self, i: int) -> np.ndarray:
+        tensor, (scale, zero_point) = self._outputs[i]
+        values = tensor()[0]
+        if scale and values.dtype != np.float32:
+            return (values.astype(np.float32) - zero_point) * scale
+        return values
+
+    def run(self, frame: np.ndarray, threshold: float, nms_threshold: Optional[float],
+            loaded: Optional[Callable[[], bool]] = None) -> Optional[List[Dict[str, Any]]]:
+        self.load(frame)
+        if loaded is not None and not loaded():
+            return None   # frame هنگام بارگذاری بازنویسی شده است؛ invoke بی‌فایده است
+        self.interpreter.invoke()
+
+        scores = self.output(2)
+        keep = np.flatnonzero(scores > threshold)
+        if not keep.size:
+            return []
+
+        # ایندکس‌گذاری برداری یک کپی می‌سازد؛ view های interpreter همین‌جا آزاد می‌شوند
+        scores = scores[keep]
+        classes = self.output(1)[keep].astype(np.int64)
+        boxes = self.output(0)[keep]
+        if nms_threshold is not None and keep.size > 1:
+            keep = nms(boxes, scores, nms_threshold, classes)
+            scores, classes, boxes = scores[keep], classes[keep], boxes[keep]
+        return [{'class': c, 'confidence': s, 'bbox': b}
+                for c, s, b in zip(classes.tolist(), scores.tolist(), boxes.tolist())]
+
+
+class AIProcessor:
+    """پردازشگر AI برای تشخیص اشیاء در ویدیو (ایمن برای فراخوانی از چند thread دوربین)"""
+
+    def __init__(self, model_path: str, confidence_threshold: float = 0.7, num_threads: int = 2,
+                 pool_size: int = 1, input_range: Sequence[float] = (0.0, 1.0),
+                 nms_threshold: Optional[float] = 0.5,
+                 interpreter_factory: Optional[Callable[[str, int], Any]] = None):
+        self.confidence_threshold = confidence_threshold
+        self.nms_threshold = nms_threshold
+        factory = interpreter_factory or load_interpreter
+
+        self._slots = [_InterpreterSlot(factory(model_path, num_threads), input_range)
+                       for _ in range(max(1, pool_size))]
+        self._free: queue.Queue = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+
+        self.input_details = self._slots[0].input_details
+        self.output_details = self._slots[0].output_details
+        self.inference_seconds = Histogram()
+        self.frames = 0
+        self.pool_waits = 0
+
+        logger.info(f"AI model loaded successfully ({len(self._slots)} interpreters x "
+                    f"{num_threads} threads, input {self.input_details[0]['dtype'].__name__})")
+
+    def detect_objects(self, frame: np.ndarray, threshold: Optional[float] = None,
+                       loaded: Optional[Callable[[], bool]] = None) -> Optional[List[Dict]]:
+        """تشخیص اشیاء در frame با اولین interpreter آزاد
+
+        loaded پس از کپی frame در tensor ورودی و پیش از invoke فراخوانی می‌شود؛ False یعنی None
+        """
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            self.pool_waits += 1
+            slot = self._free.get()
+
+        started = time.perf_counter()
+        try:
+            return slot.run(frame, self.confidence_threshold if threshold is None else threshold,
+                            self.nms_threshold, loaded)
+        finally:
+            self.inference_seconds.observe(time.perf_counter() - started)
+            self.frames += 1
+            self._free.put(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'interpreters': len(self._slots),
+            'idle_interpreters': self._free.qsize(),
+            'frames': self.frames,
+            'pool_waits': self.pool_waits,
+            'p50_seconds': self.inference_seconds.quantile(0.5),
+            'p99_seconds': self.inference_seconds.quantile(0.99)
+        }
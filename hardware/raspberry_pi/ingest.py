@@ -0,0 +1,236 @@
+"""
+IoT Smart System - Sensor Ingest Writer
+=======================================
+
+ذخیره‌سازی write-behind داده‌های سنسور در SQLite:
+- صف محدود بین thread شبکه MQTT و writer
+- یک writer اختصاصی با اتصال مستقل در حالت WAL
+- group commit با executemany بر اساس تعداد ردیف و زمان
+- شمارنده‌های عمق صف و ردیف‌های دور ریخته شده
+- درج در partition روزانه هر ردیف (storage.PartitionedTable) در صورت تنظیم
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import Histogram
+from storage import PartitionedTable
+
+logger = logging.getLogger('IoTGateway.ingest')
+
+SENSOR_COLUMNS = (
+    'device_id', 'timestamp', 'temperature', 'humidity',
+    'pressure', 'light_level', 'motion', 'data_json'
+)
+
+INSERT_SENSOR_SQL = 'INSERT INTO sensor_data ({}) VALUES ({})'.format(
+    ', '.join(SENSOR_COLUMNS), ', '.join('?' * len(SENSOR_COLUMNS))
+)
+
+# فیلدهای payload که ستون جداگانه دارند و در data_json تکرار نمی‌شوند
+COLUMN_FIELDS = frozenset(SENSOR_COLUMNS) - {'device_id', 'data_json'}
+
+# نشانگر توقف writer
+_STOP = object()
+
+SensorRow = Tuple[Any, ...]
+
+
+def extra_json(data: Dict, columns=COLUMN_FIELDS) -> Optional[str]:
+    """JSON فقط فیلدهایی که ستون ندارند (None اگر چیزی باقی نماند)"""
+    extra = {k: v for k, v in data.items() if k not in columns}
+    return json.dumps(extra, default=str) if extra else None
+
+
+def sensor_row(device_id: str, data: Dict) -> SensorRow:
+    """ساخت یک ردیف sensor_data از payload دستگاه"""
+    return (
+        device_id,
+        data.get('timestamp', int(time.time())),
+        data.get('temperature'),
+        data.get('humidity'),
+        data.get('pressure'),
+        data.get('light_level'),
+        data.get('motion'),
+        extra_json(data)
+    )
+
+
+def configure_connection(db: sqlite3.Connection):
+    """فعال‌سازی WAL و تنظیمات commit سبک برای کارت SD"""
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+
+
+class SensorIngestWriter:
+    """writer اختصاصی که ردیف‌های سنسور را دسته‌ای در SQLite می‌نویسد"""
+
+    def __init__(self, db_path: str, queue_size: int = 20000,
+                 batch_size: int = 500, flush_interval: float = 1.0,
+                 table: Optional[PartitionedTable] = None):
+        self.db_path = db_path
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = Event()
+        self._thread = None
+        self._batch_hooks: List[Callable[[sqlite3.Connection, Sequence[SensorRow]], None]] = []
+
+        self._stats_lock = Lock()
+        self.submitted_rows = 0
+        self.dropped_rows = 0
+        self.written_rows = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_batch_size = 0
+        self.last_commit_seconds = 0.0
+        self.commit_seconds = Histogram()   # executemany + hook ها + commit هر دسته
+
+    def start(self):
+        """شروع thread writer"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='sensor-ingest', daemon=True)
+        self._thread.start()
+        logger.info("Sensor ingest writer started")
+
+    def add_batch_hook(self, hook: Callable[[sqlite3.Connection, Sequence[SensorRow]], None]):
+        """ثبت callback که داخل همان تراکنش هر دسته با اتصال writer صدا زده می‌شود"""
+        self._batch_hooks.append(hook)
+
+    def submit(self, row: SensorRow) -> bool:
+        """قرار دادن یک ردیف در صف بدون بلاک کردن thread فراخواننده"""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped_rows += 1
+            return False
+
+        with self._stats_lock:
+            self.submitted_rows += 1
+        return True
+
+    def flush(self):
+        """انتظار تا نوشته شدن تمام ردیف‌های داخل صف"""
+        self._queue.join()
+
+    def stop(self, timeout: Optional[float] = None):
+        """توقف writer پس از نوشتن کامل صف"""
+        if not self._thread:
+            return
+        self._stop_event.set()
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("Sensor ingest writer stopped")
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """شمارنده‌های writer برای مانیتورینگ"""
+        with self._stats_lock:
+            return {
+                'queue_depth': self.queue_depth,
+                'queue_capacity': self._queue.maxsize,
+                'submitted_rows': self.submitted_rows,
+                'dropped_rows': self.dropped_rows,
+                'written_rows': self.written_rows,
+                'batches': self.batches,
+                'failed_batches': self.failed_batches,
+                'last_batch_size': self.last_batch_size,
+                'last_commit_seconds': self.last_commit_seconds
+            }
+
+    def _run(self):
+        """حلقه writer: جمع‌آوری دسته و commit بر اساس اندازه یا زمان"""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        configure_connection(db)
+
+        batch: List[SensorRow] = []
+        deadline = None
+        stopping = False
+
+        try:
+            while True:
+                timeout = None
+                if batch:
+                    timeout = max(0.0, deadline - time.monotonic())
+
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                elif item is not None:
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval
+                    batch.append(item)
+
+                # وقتی در حال توقف هستیم کل صف باقی‌مانده را هم برمی‌داریم
+                if stopping:
+                    batch.extend(self._drain())
+
+                if batch and (stopping or item is None
+                              or len(batch) >= self.batch_size
+                              or time.monotonic() >= deadline):
+                    self._write_batch(db, batch)
+                    batch = []
+
+                if stopping and self._stop_event.is_set() and self._queue.empty():
+                    break
+        finally:
+            db.close()
+
+    def _drain(self) -> List[SensorRow]:
+        """برداشتن بدون انتظار همه ردیف‌های موجود در صف"""
+        rows = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows
+            if item is _STOP:
+                self._queue.task_done()
+                continue
+            rows.append(item)
+
+    def _write_batch(self, db: sqlite3.Connection, batch: List[SensorRow]):
+        """نوشتن یک دسته با executemany و یک commit (خطای hook کل دسته را rollback می‌کند)"""
+        started = time.monotonic()
+        try:
+            with db:
+                if self.table:
+                    self.table.insert_many(db, SENSOR_COLUMNS, batch)
+                else:
+                    db.executemany(INSERT_SENSOR_SQL, batch)
+                for hook in self._batch_hooks:
+                    hook(db, batch)
+        except Exception as e:
+            logger.error(f"Database batch save error ({len(batch)} rows): {e}")
+            with self._stats_lock:
+                self.failed_batches += 1
+        else:
+            elapsed = time.monotonic() - started
+            self.commit_seconds.observe(elapsed)
+            with self._stats_lock:
+                self.written_rows += len(batch)
+                self.batches += 1
+                self.last_batch_size = len(batch)
+                self.last_commit_seconds = elapsed
+        finally:
+            for _ in batch:
+                self._queue.task_done()
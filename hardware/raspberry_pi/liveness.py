@@ -0,0 +1,119 @@
+"""
+IoT Smart System - Device Liveness
+==================================
+
+تشخیص رویدادمحور offline شدن دستگاه‌ها با hashed timer wheel:
+- هر پیام فقط مهلت دستگاه را به‌روز می‌کند (O(1))
+- هر دستگاه حداکثر یک ورودی در wheel دارد؛ مهلت‌های جابه‌جا شده هنگام رسیدن
+  به slot دوباره زمان‌بندی می‌شوند (lazy re-arm)
+- دقت تشخیص برابر با طول tick (پیش‌فرض ۰.۲۵ ثانیه)
+"""
+
+import logging
+import math
+import time
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+logger = logging.getLogger('IoTGateway.liveness')
+
+
+class TimerWheel:
+    """hashed timer wheel برای مهلت‌هایی که مدام تمدید می‌شوند"""
+
+    def __init__(self, on_expire: Callable[[Hashable], None], tick: float = 0.25,
+                 slots: int = 4096, clock: Callable[[], float] = time.monotonic):
+        self.on_expire = on_expire
+        self.tick = tick
+        self.clock = clock
+
+        self._slots: List[Set[Hashable]] = [set() for _ in range(slots)]
+        self._deadlines: Dict[Hashable, float] = {}
+        self._scheduled: Dict[Hashable, int] = {}
+        self._cursor = int(clock() / tick)
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+
+        self.armed = 0
+        self.expired = 0
+
+    def start(self):
+        """شروع thread پیشروی wheel"""
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='liveness-wheel', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(self.tick + 1)
+            self._thread = None
+
+    def arm(self, key: Hashable, timeout: float):
+        """تنظیم (یا تمدید) مهلت یک کلید"""
+        deadline = self.clock() + timeout
+        with self._lock:
+            self.armed += 1
+            self._deadlines[key] = deadline
+            if key not in self._scheduled:
+                self._place(key, deadline)
+
+    def cancel(self, key: Hashable):
+        """لغو مهلت؛ ورودی wheel هنگام رسیدن به slot پاک می‌شود"""
+        with self._lock:
+            self._deadlines.pop(key, None)
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        return self._deadlines.get(key)
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """پیشروی تا زمان now و برگرداندن کلیدهای منقضی شده"""
+        now = self.clock() if now is None else now
+        target = int(now / self.tick)
+        expired = []
+
+        with self._lock:
+            while self._cursor < target:
+                self._cursor += 1
+                slot = self._slots[self._cursor % len(self._slots)]
+                if not slot:
+                    continue
+
+                # ورودی‌های دورهای بعدی wheel در slot باقی می‌مانند
+                due = [k for k in slot if self._scheduled.get(k) == self._cursor]
+                for key in due:
+                    slot.discard(key)
+                    del self._scheduled[key]
+                    deadline = self._deadlines.get(key)
+                    if deadline is None:
+                        continue
+                    if deadline <= now:
+                        del self._deadlines[key]
+                        expired.append(key)
+                    else:
+                        self._place(key, deadline)
+
+            self.expired += len(expired)
+        return expired
+
+    def stats(self):
+        return {
+            'tracked': len(self._deadlines),
+            'tick': self.tick,
+            'armed': self.armed,
+            'expired': self.expired
+        }
+
+    def _place(self, key: Hashable, deadline: float):
+        t = max(math.ceil(deadline / self.tick), self._cursor + 1)
+        self._slots[t % len(self._slots)].add(key)
+        self._scheduled[key] = t
+
+    def _run(self):
+        while not self._stop_event.wait(self.tick):
+            for key in self.advance():
+                try:
+                    self.on_expire(key)
+                except Exception as e:
+                    logger.error(f"Liveness expiry handler error for {key}: {e}")
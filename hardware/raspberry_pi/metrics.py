@@ -0,0 +1,213 @@
+"""
+IoT Smart System - Metrics
+==========================
+
+اندازه‌گیری سبک مسیر داغ gateway:
+- histogram با bucket های ثابت و ساعت یکنوا (perf_counter) برای هر مرحله
+- lock با ثبت زمان انتظار فقط در حالت رقابت (مسیر بدون رقابت فقط یک شمارنده است)
+- counter و gauge های callback که از stats() اجزا خوانده می‌شوند
+- خروجی متنی Prometheus برای /api/metrics
+"""
+
+import bisect
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# از ۱۰ میکروثانیه تا ۵ ثانیه
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """histogram با bucket های ثابت (تعداد هر bucket غیرتجمعی نگه داشته می‌شود)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # آخری = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> '_Timer':
+        """context manager برای اندازه‌گیری یک بلوک"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """تخمین quantile از روی مرز بالای bucket ها"""
+        counts, _, count = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Counter:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class TimedLock:
+    """جایگزین threading.Lock که زمان انتظار در حالت رقابت را در histogram ثبت می‌کند"""
+
+    def __init__(self, wait_histogram: Histogram):
+        self._lock = Lock()
+        self.wait = wait_histogram
+        self.acquisitions = 0
+        self.contended = 0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return True
+        if not blocking:
+            return False
+
+        started = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        if acquired:
+            # شمارنده‌ها فقط با lock گرفته شده تغییر می‌کنند
+            self.acquisitions += 1
+            self.contended += 1
+            self.wait.observe(time.perf_counter() - started)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """ثبت metric ها و تولید خروجی متنی Prometheus"""
+
+    def __init__(self, prefix: str = 'iot_gateway'):
+        self.prefix = prefix
+        # name -> (type, help, [(labels, source)])
+        self._families: Dict[str, Tuple[str, str, List[Tuple[Labels, Any]]]] = {}
+        self._lock = Lock()
+
+    def _register(self, kind: str, name: str, help_text: str, labels: Dict[str, str], source: Any):
+        name = f"{self.prefix}_{name}"
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, []))
+            if family[0] != kind:
+                raise ValueError(f"Metric {name} already registered as {family[0]}")
+            family[2].append((tuple(sorted(labels.items())), source))
+        return source
+
+    def histogram(self, name: str, help_text: str, histogram: Optional[Histogram] = None,
+                  **labels) -> Histogram:
+        """ثبت histogram (جدید یا متعلق به یک جزء)"""
+        return self._register('histogram', name, help_text, labels, histogram or Histogram())
+
+    def counter(self, name: str, help_text: str, **labels) -> Counter:
+        return self._register('counter', name, help_text, labels, Counter())
+
+    def counter_func(self, name: str, help_text: str, fn: Callable[[], float], **labels):
+        """counter که مقدارش هنگام scrape از fn خوانده می‌شود"""
+        self._register('counter', name, help_text, labels, fn)
+
+    def gauge_func(self, name: str, help_text: str, fn: Callable[[], float], **labels):
+        """gauge که مقدارش هنگام scrape از fn خوانده می‌شود"""
+        self._register('gauge', name, help_text, labels, fn)
+
+    def render(self) -> str:
+        """خروجی text exposition format نسخه 0.0.4"""
+        with self._lock:
+            families = sorted((name, kind, help_text, list(series))
+                              for name, (kind, help_text, series) in self._families.items())
+
+        lines = []
+        for name, kind, help_text, series in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, source in series:
+                if kind == 'histogram':
+                    lines.extend(self._render_histogram(name, labels, source))
+                    continue
+                value = source.value if isinstance(source, Counter) else source()
+                if value is None:
+                    continue
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(name: str, labels: Labels, histogram: Histogram) -> Iterable[str]:
+        counts, total, count = histogram.snapshot()
+        cumulative = 0
+        for bound, n in zip(histogram.buckets, counts):
+            cumulative += n
+            yield f"{name}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}"
+        yield f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}"
+        yield f"{name}_sum{_format_labels(labels)} {repr(total)}"
+        yield f"{name}_count{_format_labels(labels)} {count}"
@@ -0,0 +1,232 @@
+"""
+IoT Smart System - Motion Gate
+==============================
+
+فیلتر ارزان قبل از مدل تشخیص برای هر دوربین:
+- تفاضل frame کوچک شده با پس‌زمینه میانگین متحرک، یا background subtraction (MOG2)
+- مدل فقط وقتی اجرا می‌شود که صحنه تغییر کرده باشد
+- frame-skip قابل تنظیم، سقف نرخ در حالت حرکت و حداقل نرخ برای اجسام ثابت
+- آمار frame های بدون استنتاج و تخمین CPU صرفه‌جویی شده
+"""
+
+import inspect
+import logging
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from metrics import Histogram
+from startup import lazy_import
+
+logger = logging.getLogger('IoTGateway.motion')
+
+cv2 = lazy_import('cv2')
+
+MOTION_METHODS = ('diff', 'mog2')
+
+DEFAULT_MOTION = {
+    'method': 'diff',
+    'width': 160,              # عرض frame کوچک شده برای مقایسه
+    'pixel_threshold': 25,     # حداقل تغییر روشنایی یک پیکسل (0-255)
+    'min_area': 0.005,         # حداقل کسر پیکسل‌های تغییر کرده برای «حرکت»
+    'learning_rate': 0.05,     # سرعت به‌روزرسانی پس‌زمینه
+    'frame_skip': 0,           # از هر frame_skip+1 فریم فقط یکی بررسی می‌شود
+    'max_rate': 5.0,           # حداکثر استنتاج در ثانیه هنگام حرکت
+    'min_rate': 0.2,           # حداقل استنتاج در ثانیه بدون حرکت (0 = هرگز)
+    'hold': 2.0                # ادامه استنتاج تا این مدت بعد از توقف حرکت (ثانیه)
+}
+
+
+class MotionGate:
+    """تصمیم اجرای مدل برای frame های یک دوربین"""
+
+    def __init__(self, camera_id: str, method: str = 'diff', width: int = 160,
+                 pixel_threshold: int = 25, min_area: float = 0.005, learning_rate: float = 0.05,
+                 frame_skip: int = 0, max_rate: float = 5.0, min_rate: float = 0.2, hold: float = 2.0):
+        if method not in MOTION_METHODS:
+            raise ValueError(f"Unknown motion method {method!r}")
+        self.camera_id = camera_id
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.learning_rate = learning_rate
+        self.frame_skip = frame_skip
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.idle_interval = 1.0 / min_rate if min_rate > 0 else float('inf')
+        self.hold = hold
+
+        # بافرهای frame کوچک شده یک بار با اولین frame ساخته می‌شوند
+        self._size = None
+        self._small = None
+        self._gray = None
+        self._diff = None
+        self._background = None
+        self._reference = None
+        self._subtractor = None
+
+        self._counter = 0
+        self._last_inference = float('-inf')
+        self._last_motion = float('-inf')
+        self.motion_level = 0.0
+
+        self.frames = 0
+        self.skipped_frames = 0     # frame-skip
+        self.skipped_static = 0     # بدون حرکت
+        self.skipped_rate = 0       # سقف نرخ
+        self.inferences = 0
+        self.forced = 0             # به خاطر حداقل نرخ
+        self.gate_seconds = Histogram()
+
+    def should_infer(self, frame: np.ndarray, now: Optional[float] = None) -> bool:
+        """آیا مدل باید روی این frame اجرا شود"""
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+
+        self._counter += 1
+        if self.frame_skip and self._counter % (self.frame_skip + 1) != 1:
+            self.skipped_frames += 1
+            return False
+
+        started = time.perf_counter()
+        self.motion_level = self._measure(frame)
+        self.gate_seconds.observe(time.perf_counter() - started)
+
+        if self.motion_level >= self.min_area:
+            self._last_motion = now
+
+        since_inference = now - self._last_inference
+        if now - self._last_motion <= self.hold:
+            if since_inference < self.min_interval:
+                self.skipped_rate += 1
+                return False
+        elif since_inference >= self.idle_interval:
+            self.forced += 1
+        else:
+            self.skipped_static += 1
+            return False
+
+        self._last_inference = now
+        self.inferences += 1
+        return True
+
+    def _measure(self, frame: np.ndarray) -> float:
+        """کسر پیکسل‌های تغییر کرده در frame کوچک شده"""
+        if self._size is None:
+            height, width = frame.shape[:2]
+            self._size = (self.width, max(1, round(height * self.width / width)))
+        small = cv2.resize(frame, self._size, dst=self._small, interpolation=cv2.INTER_AREA)
+        self._small = small
+
+        if self.method == 'mog2':
+            if self._subtractor is None:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                    history=500, varThreshold=self.pixel_threshold, detectShadows=False)
+            mask = self._subtractor.apply(small, learningRate=self.learning_rate)
+            return cv2.countNonZero(mask) / mask.size
+
+        gray = small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        self._gray = gray
+        if self._background is None:
+            self._background = gray.astype(np.float32)
+            self._reference = np.empty_like(gray)
+            self._diff = np.empty_like(gray)
+            return 1.0   # اولین frame: بدون پس‌زمینه، مدل اجرا شود
+
+        cv2.convertScaleAbs(self._background, dst=self._reference)
+        cv2.absdiff(gray, self._reference, dst=self._diff)
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        changed = cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)[1]
+        return cv2.countNonZero(changed) / changed.size
+
+    def stats(self, inference_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """آمار دوربین؛ با زمان میانگین استنتاج، CPU صرفه‌جویی شده هم تخمین زده می‌شود"""
+        skipped = self.frames - self.inferences
+        _, gate_total, _ = self.gate_seconds.snapshot()
+        stats = {
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'forced_min_rate': self.forced,
+            'skipped_frame_skip': self.skipped_frames,
+            'skipped_static': self.skipped_static,
+            'skipped_rate_limit': self.skipped_rate,
+            'skip_fraction': round(skipped / self.frames, 4) if self.frames else 0.0,
+            'motion_level': round(self.motion_level, 5),
+            'gate_seconds': round(gate_total, 4)
+        }
+        if inference_seconds is not None:
+            stats['cpu_saved_seconds'] = round(skipped * inference_seconds - gate_total, 4)
+        return stats
+
+
+class GatedDetector:
+    """اجرای AIProcessor فقط روی frame هایی که MotionGate دوربین اجازه می‌دهد"""
+
+    def __init__(self, detect: Callable[[np.ndarray], List[Dict]], config: Optional[Dict[str, Any]] = None):
+        self.detect = detect
+        self.config = dict(DEFAULT_MOTION)
+        self.config.update({k: v for k, v in (config or {}).items() if k not in ('enabled', 'cameras')})
+        self.enabled = (config or {}).get('enabled', True)
+        self.camera_config = (config or {}).get('cameras') or {}
+
+        self._gates: Dict[str, MotionGate] = {}
+        self._lock = Lock()
+        self.inference_seconds = Histogram()
+        self.torn_frames = 0
+        try:
+            self._takes_loaded = 'loaded' in inspect.signature(detect).parameters
+        except (TypeError, ValueError):
+            self._takes_loaded = False
+
+    def gate(self, camera_id: str) -> MotionGate:
+        """MotionGate دوربین با override های مخصوص آن"""
+        gate = self._gates.get(camera_id)
+        if gate is None:
+            with self._lock:
+                gate = self._gates.get(camera_id)
+                if gate is None:
+                    options = dict(self.config)
+                    options.update(self.camera_config.get(camera_id, {}))
+                    gate = self._gates[camera_id] = MotionGate(camera_id, **options)
+        return gate
+
+    def process(self, camera_id: str, frame: np.ndarray, now: Optional[float] = None,
+                valid: Optional[Callable[[], bool]] = None) -> Optional[List[Dict]]:
+        """detection ها یا None اگر مدل روی این frame اجرا نشده باشد
+
+        valid برای frame های بدون کپی (view روی ring): پیش از invoke بررسی می‌شود تا مدل روی
+        frame بازنویسی شده اجرا نشود
+        """
+        if self.enabled and not self.gate(camera_id).should_infer(frame, now):
+            return None
+
+        if valid is not None and not self._takes_loaded:
+            # تابع تشخیص hook پس از بارگذاری ندارد: کپی و بررسی پیش از اجرا
+            frame = frame.copy()
+            if not valid():
+                self.torn_frames += 1
+                return None
+            valid = None
+
+        started = time.perf_counter()
+        if valid is None:
+            detections = self.detect(frame)
+        else:
+            detections = self.detect(frame, loaded=valid)
+            if detections is None:
+                self.torn_frames += 1
+                return None
+        self.inference_seconds.observe(time.perf_counter() - started)
+        return detections
+
+    def stats(self) -> Dict[str, Any]:
+        _, total, count = self.inference_seconds.snapshot()
+        mean = total / count if count else None
+        return {
+            'enabled': self.enabled,
+            'torn_frames': self.torn_frames,
+            'mean_inference_seconds': round(mean, 5) if mean is not None else None,
+            'cameras': {camera_id: gate.stats(mean) for camera_id, gate in list(self._gates.items())}
+        }
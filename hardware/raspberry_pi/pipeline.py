@@ -0,0 +1,247 @@
+"""
+IoT Smart System - Ingest Pipeline
+==================================
+
+pipeline چند مرحله‌ای asyncio برای پیام‌های MQTT:
+- callback شبکه paho فقط پیام را در صف ورودی قرار می‌دهد
+- هر مرحله صف محدود، تعداد worker و اندازه دسته قابل تنظیم دارد
+- backpressure بین مراحل با صف‌های محدود
+- سیاست load-shedding در ورودی: drop_newest / drop_oldest / block
+- مرحله چند worker با key: هر worker صف خودش را دارد و آیتم‌های یک key (مثلاً device_id) همیشه
+  به همان worker می‌روند تا ترتیب خوانش‌های هر دستگاه در مراحل بعد حفظ شود
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import time
+from threading import Event, Thread
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from metrics import Histogram
+
+logger = logging.getLogger('IoTGateway.pipeline')
+
+OVERFLOW_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+
+class Stage:
+    """یک مرحله pipeline: handler روی دسته‌ای از آیتم‌ها اجرا می‌شود و خروجی به مراحل بعد می‌رود"""
+
+    def __init__(self, name: str, handler: Callable[[List[Any]], Optional[Sequence[Any]]],
+                 workers: int = 1, queue_size: int = 1000, batch_size: int = 100,
+                 key: Optional[Callable[[Any], Any]] = None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.key = key
+        self.downstream: List['Stage'] = []
+
+        self.queues: List[asyncio.Queue] = []
+        self.executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+        self.batch_seconds = Histogram()   # زمان اجرای handler برای هر دسته
+
+    def then(self, *stages: 'Stage') -> 'Stage':
+        """اتصال خروجی این مرحله به یک یا چند مرحله بعدی"""
+        self.downstream.extend(stages)
+        return self
+
+    def open_queues(self):
+        """ساخت صف‌ها داخل loop: یک صف مشترک، یا با key یک صف برای هر worker (ظرفیت تقسیم می‌شود)"""
+        if self.key is not None and self.workers > 1:
+            size = max(1, self.queue_size // self.workers)
+            self.queues = [asyncio.Queue(maxsize=size) for _ in range(self.workers)]
+        else:
+            self.queues = [asyncio.Queue(maxsize=self.queue_size)]
+
+    def queue_for(self, item: Any) -> asyncio.Queue:
+        """صف مقصد آیتم؛ آیتم‌های یک key همیشه به یک صف می‌روند"""
+        queues = self.queues
+        if len(queues) == 1:
+            return queues[0]
+        return queues[hash(self.key(item)) % len(queues)]
+
+    def depth(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    def run(self, batch: List[Any]) -> Optional[Sequence[Any]]:
+        """اجرای handler در thread executor با ثبت زمان"""
+        started = time.perf_counter()
+        try:
+            return self.handler(batch)
+        finally:
+            self.batch_seconds.observe(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'queue_depth': self.depth(),
+            'queue_capacity': self.queue_size,
+            'processed': self.processed,
+            'batches': self.batches,
+            'errors': self.errors
+        }
+
+
+class Pipeline:
+    """اجرای مراحل در یک event loop جداگانه (stages به ترتیب جریان داده، اولی صف ورودی است)"""
+
+    def __init__(self, stages: Sequence[Stage], overflow: str = 'drop_oldest',
+                 block_timeout: float = 1.0, name: str = 'ingest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+
+        self.stages = list(stages)
+        self.inbox = self.stages[0]
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.name = name
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = None
+        self._ready = Event()
+        self._tasks: List[asyncio.Task] = []
+
+        self.accepted = 0
+        self.dropped = 0
+
+    def start(self):
+        """شروع event loop و worker های همه مراحل"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._ready.clear()
+        self._thread = Thread(target=self._run_loop, name=f'{self.name}-pipeline', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        logger.info(f"Pipeline '{self.name}' started with stages: "
+                    + ', '.join(f"{s.name}x{s.workers}" for s in self.stages))
+
+    def submit(self, item: Any) -> bool:
+        """قرار دادن آیتم در صف ورودی از هر thread (مثلاً callback شبکه paho)"""
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            self.dropped += 1
+            return False
+
+        queue = self.inbox.queue_for(item)
+        if self.overflow == 'block' and queue.full():
+            # بلاک کردن thread فراخواننده = backpressure روی اتصال broker
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            try:
+                future.result(self.block_timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                self.dropped += 1
+                return False
+            self.accepted += 1
+            return True
+
+        loop.call_soon_threadsafe(self._offer, item)
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        """خالی کردن صف‌ها به ترتیب مراحل و توقف loop"""
+        loop = self._loop
+        if loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), loop)
+        try:
+            future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            logger.warning(f"Pipeline '{self.name}' did not drain within {timeout}s")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout)
+        self._loop = None
+        logger.info(f"Pipeline '{self.name}' stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'overflow': self.overflow,
+            'accepted': self.accepted,
+            'dropped': self.dropped,
+            'stages': {stage.name: stage.stats() for stage in self.stages}
+        }
+
+    def _offer(self, item: Any):
+        """اعمال سیاست load-shedding داخل loop"""
+        queue = self.inbox.queue_for(item)
+        if not queue.full():
+            self.accepted += 1
+        elif self.overflow == 'block':
+            # صف بین بررسی و زمان‌بندی پر شده است؛ منتظر جا می‌مانیم
+            self.accepted += 1
+            self._loop.create_task(queue.put(item))
+            return
+        else:
+            self.dropped += 1
+            if self.overflow == 'drop_newest':
+                return
+            queue.get_nowait()
+            queue.task_done()
+        queue.put_nowait(item)
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+
+        for stage in self.stages:
+            stage.open_queues()
+            stage.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=stage.workers, thread_name_prefix=f'{self.name}-{stage.name}')
+            for i in range(stage.workers):
+                queue = stage.queues[i % len(stage.queues)]
+                self._tasks.append(loop.create_task(self._worker(stage, queue)))
+
+        loop.call_soon(self._ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            for stage in self.stages:
+                stage.executor.shutdown(wait=True)
+            loop.close()
+
+    async def _worker(self, stage: Stage, queue: asyncio.Queue):
+        """دریافت دسته از صف، اجرای handler در executor مرحله و ارسال خروجی"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < stage.batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                outputs = await loop.run_in_executor(stage.executor, stage.run, batch)
+                stage.processed += len(batch)
+                stage.batches += 1
+
+                if outputs:
+                    for downstream in stage.downstream:
+                        for output in outputs:
+                            # صف پر مرحله بعد این worker را متوقف می‌کند (backpressure)
+                            await downstream.queue_for(output).put(output)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stage.errors += 1
+                logger.error(f"Pipeline stage '{stage.name}' error: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _shutdown(self):
+        """انتظار برای خالی شدن هر مرحله و لغو worker ها"""
+        for stage in self.stages:
+            for queue in stage.queues:
+                await queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,257 @@
+"""
+IoT Smart System - Event Recording
+==================================
+
+ضبط ویدیو فقط هنگام رویداد (حرکت، detection یا alarm) به جای ضبط پیوسته:
+- ring در حافظه از segment های encode شده (JPEG) برای pre-roll هر دوربین
+- با رسیدن رویداد، pre-roll و سپس frame ها تا پایان post-roll در فایل‌های segment با اندازه ثابت نوشته می‌شوند
+- index فشرده کنار هر فایل (زمان شروع/پایان → offset و طول) برای پیدا کردن و پخش سریع clip ها
+- retention: حذف قدیمی‌ترین فایل‌ها با رسیدن به سقف حجم یا عمر
+
+چیدمان هر دوربین: <root>/<camera_id>/<شروع به ms>.seg و .idx
+segment: پشت سر هم [timestamp: float64][length: uint32][JPEG] برای هر frame
+index: رکوردهای RECORD_DTYPE (start, end, offset, length) برای هر segment
+"""
+
+import logging
+import os
+import struct
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from startup import lazy_import
+
+logger = logging.getLogger('IoTGateway.recording')
+
+cv2 = lazy_import('cv2')
+
+RECORD_DTYPE = np.dtype([('start', '<f8'), ('end', '<f8'), ('offset', '<u4'), ('length', '<u4')])
+FRAME_HEADER = struct.Struct('<dI')
+
+DEFAULT_RECORDING = {
+    'enabled': True,
+    'fps': 5.0,                      # نرخ frame ضبط شده (کمتر از نرخ capture)
+    'quality': 70,                   # کیفیت JPEG
+    'segment_seconds': 2.0,          # طول هر segment در حافظه و index
+    'pre_roll': 6.0,                 # ثانیه قبل از رویداد
+    'post_roll': 10.0,               # ثانیه بعد از آخرین رویداد
+    'file_bytes': 32 * 1024 * 1024,  # اندازه ثابت هر فایل segment
+    'quota_bytes': 4 * 1024 ** 3,    # سقف حجم همه دوربین‌ها
+    'max_age': 7 * 86400,            # حداکثر عمر فایل‌ها (ثانیه)
+    'retention_interval': 60.0,
+    'record_on': ('motion', 'detection', 'alarm')
+}
+
+
+class SegmentStore:
+    """فایل‌های segment با اندازه ثابت و index یک دوربین (فقط یک نویسنده: پردازه capture)"""
+
+    def __init__(self, path: str, file_bytes: int = DEFAULT_RECORDING['file_bytes']):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.file_bytes = file_bytes
+        self._data = None
+        self._index = None
+        self._offset = 0
+        self.segments_written = 0
+        self.bytes_written = 0
+
+    def append(self, start: float, end: float, data: bytes):
+        """نوشتن یک segment؛ اگر در فایل جاری جا نشود فایل جدید باز می‌شود"""
+        if self._data is None or self._offset + len(data) > self.file_bytes:
+            self._open(start)
+
+        self._data.seek(self._offset)
+        self._data.write(data)
+        self._data.flush()
+        # رکورد index بعد از داده نوشته می‌شود تا خواننده هرگز به داده ناقص اشاره نکند
+        record = np.array([(start, end, self._offset, len(data))], RECORD_DTYPE)
+        self._index.write(record.tobytes())
+        self._index.flush()
+
+        self._offset += len(data)
+        self.segments_written += 1
+        self.bytes_written += len(data)
+
+    def _open(self, start: float):
+        self.close()
+        base = self.path / f'{int(start * 1000):013d}'
+        self._data = open(base.with_suffix('.seg'), 'w+b')
+        try:
+            # فضای کامل فایل یک‌جا رزرو می‌شود (کاهش fragmentation روی کارت SD)
+            os.posix_fallocate(self._data.fileno(), 0, self.file_bytes)
+        except (AttributeError, OSError):
+            self._data.truncate(self.file_bytes)
+        self._index = open(base.with_suffix('.idx'), 'ab')
+        self._offset = 0
+
+    def close(self):
+        for f in (self._data, self._index):
+            if f:
+                f.close()
+        self._data = self._index = None
+
+
+def encode_segment(frames: List[Tuple[float, bytes]]) -> bytes:
+    return b''.join(FRAME_HEADER.pack(ts, len(jpeg)) + jpeg for ts, jpeg in frames)
+
+
+def decode_segment(data: bytes) -> Iterator[Tuple[float, bytes]]:
+    position = 0
+    while position + FRAME_HEADER.size <= len(data):
+        ts, length = FRAME_HEADER.unpack_from(data, position)
+        position += FRAME_HEADER.size
+        yield ts, data[position:position + length]
+        position += length
+
+
+class SegmentRecorder:
+    """encode frame های یک دوربین در segment ها؛ pre-roll در حافظه تا رسیدن رویداد"""
+
+    def __init__(self, store: SegmentStore, fps: float = 5.0, quality: int = 70,
+                 segment_seconds: float = 2.0, pre_roll: float = 6.0):
+        self.store = store
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self.segment_seconds = segment_seconds
+        self.pre_roll = deque(maxlen=max(1, int(np.ceil(pre_roll / segment_seconds))))
+
+        self._frames: List[Tuple[float, bytes]] = []
+        self._segment_start = None
+        self._last_frame = float('-inf')
+        self.recording = False
+        self.encoded = 0
+        self.events = 0
+
+    def add(self, frame: np.ndarray, timestamp: float, record_until: float):
+        """یک frame capture شده؛ record_until = پایان post-roll آخرین رویداد"""
+        triggered = timestamp <= record_until
+        if triggered and not self.recording:
+            # شروع رویداد: pre-roll بلافاصله روی دیسک می‌رود
+            self.recording = True
+            self.events += 1
+            while self.pre_roll:
+                self.store.append(*self.pre_roll.popleft())
+
+        if timestamp - self._last_frame >= self.interval:
+            self._last_frame = timestamp
+            ok, jpeg = cv2.imencode('.jpg', frame, self.params)
+            if ok:
+                self.encoded += 1
+                if self._segment_start is None:
+                    self._segment_start = timestamp
+                self._frames.append((timestamp, jpeg.tobytes()))
+
+        if self._segment_start is not None and timestamp - self._segment_start >= self.segment_seconds:
+            self._close_segment(timestamp)
+            if not triggered:
+                self.recording = False
+
+    def _close_segment(self, end: float):
+        segment = (self._segment_start, end, encode_segment(self._frames))
+        self._frames = []
+        self._segment_start = None
+        if self.recording:
+            self.store.append(*segment)
+        else:
+            self.pre_roll.append(segment)
+
+    def close(self):
+        if self.recording and self._frames:
+            self._close_segment(self._frames[-1][0])
+        self.store.close()
+
+
+class RecordingIndex:
+    """خواندن index و clip های ضبط شده (در پردازه gateway)"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def cameras(self) -> List[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def segments(self, camera_id: str, start: float = 0.0, end: float = float('inf')) -> List[Tuple[Path, np.ndarray]]:
+        """رکوردهای index هم‌پوشان با بازه، برای هر فایل segment"""
+        if camera_id not in self.cameras():
+            return []
+        result = []
+        for index_path in sorted((self.root / camera_id).glob('*.idx')):
+            # نام فایل = زمان شروع؛ فایل‌های شروع شده بعد از end لازم نیستند
+            if int(index_path.stem) / 1000 > end:
+                break
+            records = self._load(index_path)
+            if not len(records) or records['end'][-1] < start:
+                continue
+            # end ها صعودی‌اند؛ جستجوی دودویی اولین segment هم‌پوشان
+            first = int(np.searchsorted(records['end'], start))
+            selected = records[first:][records['start'][first:] <= end]
+            if len(selected):
+                result.append((index_path.with_suffix('.seg'), selected))
+        return result
+
+    def clips(self, camera_id: str, start: float = 0.0, end: float = float('inf'),
+              gap: float = 1.0) -> List[Dict[str, Any]]:
+        """بازه‌های پیوسته ضبط شده (segment هایی با فاصله کمتر از gap ادغام می‌شوند)"""
+        clips = []
+        for _, records in self.segments(camera_id, start, end):
+            for record in records:
+                if clips and record['start'] - clips[-1]['end'] <= gap:
+                    clips[-1]['end'] = float(record['end'])
+                    clips[-1]['bytes'] += int(record['length'])
+                else:
+                    clips.append({'start': float(record['start']), 'end': float(record['end']),
+                                  'bytes': int(record['length'])})
+        return clips
+
+    def frames(self, camera_id: str, start: float, end: float) -> Iterator[Tuple[float, bytes]]:
+        """frame های JPEG بازه با خواندن مستقیم offset ها از فایل‌های segment"""
+        for segment_path, records in self.segments(camera_id, start, end):
+            try:
+                with open(segment_path, 'rb') as f:
+                    for record in records:
+                        f.seek(int(record['offset']))
+                        for ts, jpeg in decode_segment(f.read(int(record['length']))):
+                            if start <= ts <= end:
+                                yield ts, jpeg
+            except FileNotFoundError:
+                continue   # در حین خواندن توسط retention حذف شده است
+
+    @staticmethod
+    def _load(index_path: Path) -> np.ndarray:
+        data = index_path.read_bytes()
+        # رکورد نیمه‌نوشته در انتهای index نادیده گرفته می‌شود
+        usable = len(data) - len(data) % RECORD_DTYPE.itemsize
+        return np.frombuffer(data[:usable], RECORD_DTYPE)
+
+    def enforce_retention(self, quota_bytes: int, max_age: float, now: Optional[float] = None) -> Dict[str, int]:
+        """حذف قدیمی‌ترین فایل‌ها تا زیر سقف حجم و عمر (فایل جاری هر دوربین حذف نمی‌شود)"""
+        now = time.time() if now is None else now
+        files = []
+        for camera_id in self.cameras():
+            segments = sorted((self.root / camera_id).glob('*.seg'))
+            files.extend(segments[:-1])
+            if segments:
+                quota_bytes -= segments[-1].stat().st_size
+
+        files.sort(key=lambda p: p.stem)
+        sizes = [p.stat().st_size for p in files]
+        total = sum(sizes)
+        removed = freed = 0
+        for path, size in zip(files, sizes):
+            if total <= quota_bytes and now - path.stat().st_mtime <= max_age:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix('.idx').unlink(missing_ok=True)
+            total -= size
+            freed += size
+            removed += 1
+        if removed:
+            logger.info(f"Recording retention removed {removed} segment files ({freed / 1e6:.1f} MB)")
+        return {'removed_files': removed, 'freed_bytes': freed, 'used_bytes': total}
@@ -0,0 +1,216 @@
+"""
+IoT Smart System - Redis Mirror
+===============================
+
+آینه آخرین وضعیت دستگاه‌ها در Redis:
+- ادغام به‌روزرسانی‌های هر دستگاه در یک پنجره زمانی قابل تنظیم
+- نوشتن دسته‌ای با pipeline (HSET + EXPIRE) روی connection pool
+- یک hash برای هر دستگاه با به‌روزرسانی در سطح فیلد به جای JSON کامل
+- اتصال مجدد با backoff نمایی به جای غیرفعال شدن دائمی
+- کتابخانه redis و connection pool در start ساخته می‌شوند (راه‌اندازی در پس‌زمینه)
+"""
+
+import json
+import logging
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Optional
+
+from metrics import Histogram
+from startup import lazy_import
+
+redis = lazy_import('redis')
+
+logger = logging.getLogger('IoTGateway.redis')
+
+
+def encode_field(value: Any):
+    """تبدیل مقدار payload به مقدار قابل ذخیره در فیلد hash"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float, str, bytes)):
+        return value
+    return json.dumps(value)
+
+
+class RedisMirror:
+    """نگهداری آخرین وضعیت هر دستگاه در device:<id>:latest به صورت hash"""
+
+    KEY_FORMAT = 'device:{}:latest'
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0,
+                 window: float = 0.5, ttl: int = 3600, max_connections: int = 4,
+                 backoff_initial: float = 0.5, backoff_max: float = 30.0,
+                 client_factory: Optional[Callable[[], Any]] = None):
+        self.window = window
+        self.ttl = ttl
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+
+        if client_factory is None:
+            def client_factory():
+                pool = redis.ConnectionPool(host=host, port=port, db=db,
+                                            max_connections=max_connections,
+                                            socket_timeout=2, socket_connect_timeout=2)
+                return redis.Redis(connection_pool=pool)
+        self.client_factory = client_factory
+        self.client = None   # تا start، به‌روزرسانی‌ها فقط در _pending جمع می‌شوند
+
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+
+        self.available = False
+        self._connected_once = False
+        self._backoff = backoff_initial
+        self._retry_at = 0.0
+
+        self.updates = 0
+        self.coalesced = 0
+        self.flushed_devices = 0
+        self.flushes = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.flush_seconds = Histogram()   # رفت و برگشت pipeline هر flush
+
+    def start(self):
+        """ساخت client، بررسی اولیه اتصال و شروع thread نوشتن"""
+        if self.client is None:
+            self.client = self.client_factory()
+        self._connect()
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='redis-mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """نوشتن تغییرات باقی‌مانده و توقف"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(self.window + 5)
+            self._thread = None
+        self.flush()
+
+    def update(self, device_id: str, data: Dict[str, Any]):
+        """ثبت به‌روزرسانی؛ چند پیام یک دستگاه در یک پنجره ادغام می‌شوند"""
+        with self._lock:
+            self.updates += 1
+            pending = self._pending.get(device_id)
+            if pending is None:
+                self._pending[device_id] = dict(data)
+            else:
+                self.coalesced += 1
+                pending.update(data)
+
+    def flush(self) -> int:
+        """نوشتن تغییرات جمع شده با یک pipeline؛ تعداد دستگاه‌های نوشته شده"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+        if not self.available and not self._connect():
+            self._requeue(pending)
+            return 0
+
+        started = time.perf_counter()
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for device_id, fields in pending.items():
+                key = self.KEY_FORMAT.format(device_id)
+                mapping = {k: encode_field(v) for k, v in fields.items() if v is not None}
+                # HSET بدون فیلد (payload خالی یا فقط null) در redis-py خطای DataError است؛ فقط TTL تمدید می‌شود
+                if mapping:
+                    pipe.hset(key, mapping=mapping)
+                pipe.expire(key, self.ttl)
+            results = pipe.execute(raise_on_error=False)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            self._mark_unavailable(e)
+            self._requeue(pending)
+            return 0
+        except redis.RedisError as e:
+            # خطای دستور (نه قطعی اتصال): تکرار همین دسته دوباره خطا می‌دهد، پس کنار گذاشته می‌شود
+            self.errors += 1
+            logger.error(f"Redis mirror batch of {len(pending)} devices dropped: {e}")
+            return 0
+
+        self.flush_seconds.observe(time.perf_counter() - started)
+        errors = sum(1 for r in results if isinstance(r, Exception))
+        if errors:
+            self.errors += errors
+            logger.debug(f"Redis mirror: {errors} commands failed in batch")
+
+        self.flushes += 1
+        self.flushed_devices += len(pending)
+        return len(pending)
+
+    def get(self, device_id: str) -> Dict[str, str]:
+        """خواندن hash یک دستگاه"""
+        raw = self.client.hgetall(self.KEY_FORMAT.format(device_id))
+        return {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+                for k, v in raw.items()}
+
+    def flushdb(self):
+        """پاک کردن کامل دیتابیس Redis (factory reset)"""
+        with self._lock:
+            self._pending.clear()
+        if self.available or self._connect():
+            self.client.flushdb()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'available': self.available,
+            'pending_devices': len(self._pending),
+            'updates': self.updates,
+            'coalesced': self.coalesced,
+            'flushes': self.flushes,
+            'flushed_devices': self.flushed_devices,
+            'errors': self.errors,
+            'reconnects': self.reconnects
+        }
+
+    def _run(self):
+        while not self._stop_event.wait(self.window):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Redis mirror flush error: {e}")
+
+    def _connect(self) -> bool:
+        """ping با رعایت زمان backoff"""
+        now = time.monotonic()
+        if self.client is None or now < self._retry_at:
+            return False
+        try:
+            self.client.ping()
+        except redis.RedisError as e:
+            self._mark_unavailable(e)
+            return False
+
+        if not self.available:
+            if self._connected_once:
+                logger.info("Redis reconnected")
+                self.reconnects += 1
+            else:
+                logger.info("Redis connected")
+            self._connected_once = True
+        self.available = True
+        self._backoff = self.backoff_initial
+        return True
+
+    def _mark_unavailable(self, error: Exception):
+        """زمان‌بندی تلاش بعدی با backoff نمایی"""
+        if self.available or self._retry_at == 0.0:
+            logger.error(f"Redis connection failed: {error}")
+        self.available = False
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+
+    def _requeue(self, pending: Dict[str, Dict[str, Any]]):
+        """برگرداندن تغییرات نوشته نشده؛ داده جدیدتر بر قدیمی‌تر اولویت دارد"""
+        with self._lock:
+            for device_id, fields in pending.items():
+                newer = self._pending.get(device_id)
+                if newer is not None:
+                    fields.update(newer)
+                self._pending[device_id] = fields
@@ -0,0 +1,200 @@
+"""
+IoT Smart System - Sensor Rollups
+=================================
+
+جداول تجمیعی minute/hour/day برای داده‌های سنسور:
+- min/max/avg/count برای هر دستگاه و هر متریک
+- به‌روزرسانی افزایشی داخل تراکنش writer ورودی
+- پرس‌وجوی تاریخچه با انتخاب درشت‌ترین rollup مناسب
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ingest import SENSOR_COLUMNS
+
+logger = logging.getLogger('IoTGateway.rollups')
+
+ROLLUP_METRICS = ('temperature', 'humidity', 'pressure', 'light_level')
+
+# (نام جدول، طول bucket بر حسب ثانیه) از ریز به درشت
+ROLLUP_LEVELS = (
+    ('sensor_rollup_minute', 60),
+    ('sensor_rollup_hour', 3600),
+    ('sensor_rollup_day', 86400),
+)
+
+RESOLUTION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_DEVICE_INDEX = SENSOR_COLUMNS.index('device_id')
+_TIMESTAMP_INDEX = SENSOR_COLUMNS.index('timestamp')
+_METRIC_INDEXES = tuple((metric, SENSOR_COLUMNS.index(metric)) for metric in ROLLUP_METRICS)
+
+
+def parse_resolution(value: Optional[str]) -> int:
+    """تبدیل resolution مثل 300، 5m، 1h یا 1d به ثانیه (ValueError برای مقدار نامعتبر یا ≤ 0)"""
+    if not value:
+        return 60
+    value = value.strip().lower()
+    if value == 'raw':
+        return 0
+    try:
+        if value and value[-1] in RESOLUTION_UNITS:
+            seconds = int(float(value[:-1]) * RESOLUTION_UNITS[value[-1]])
+        else:
+            seconds = int(value)
+    except OverflowError:
+        raise ValueError(f"Resolution out of range: {value!r}") from None
+    if seconds <= 0:
+        raise ValueError(f"Resolution must be positive: {value!r}")
+    return seconds
+
+
+def create_rollup_tables(db: sqlite3.Connection):
+    """ایجاد جداول rollup (کلید اصلی همان ایندکس پرس‌وجو است)"""
+    for table, _ in ROLLUP_LEVELS:
+        db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                device_id TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                min_value REAL NOT NULL,
+                max_value REAL NOT NULL,
+                sum_value REAL NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (device_id, metric, bucket)
+            ) WITHOUT ROWID
+        ''')
+
+
+class RollupStore:
+    """نگهداری افزایشی rollup ها و پاسخ به پرس‌وجوی تاریخچه"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def apply_batch(self, db: sqlite3.Connection, rows: Sequence[Tuple[Any, ...]]):
+        """تجمیع یک دسته ردیف sensor_data و upsert در همه سطوح"""
+        for table, seconds in ROLLUP_LEVELS:
+            buckets: Dict[Tuple[str, str, int], List[float]] = {}
+
+            for row in rows:
+                try:
+                    bucket = int(row[_TIMESTAMP_INDEX]) // seconds * seconds
+                except (TypeError, ValueError):
+                    continue
+                device_id = row[_DEVICE_INDEX]
+
+                for metric, index in _METRIC_INDEXES:
+                    value = row[index]
+                    if value is None or isinstance(value, bool):
+                        continue
+                    value = float(value)
+
+                    key = (device_id, metric, bucket)
+                    agg = buckets.get(key)
+                    if agg is None:
+                        buckets[key] = [value, value, value, 1]
+                    else:
+                        if value < agg[0]:
+                            agg[0] = value
+                        if value > agg[1]:
+                            agg[1] = value
+                        agg[2] += value
+                        agg[3] += 1
+
+            if not buckets:
+                continue
+
+            db.executemany(f'''
+                INSERT INTO {table}
+                (device_id, metric, bucket, min_value, max_value, sum_value, count)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (device_id, metric, bucket) DO UPDATE SET
+                    min_value = min(min_value, excluded.min_value),
+                    max_value = max(max_value, excluded.max_value),
+                    sum_value = sum_value + excluded.sum_value,
+                    count = count + excluded.count
+            ''', [key + tuple(agg) for key, agg in buckets.items()])
+
+    def rebuild(self, db: sqlite3.Connection):
+        """ساخت دوباره rollup ها از داده‌های خام (برای دیتابیس‌های قدیمی)"""
+        columns = ', '.join(SENSOR_COLUMNS)
+        with db:
+            for table, _ in ROLLUP_LEVELS:
+                db.execute(f'DELETE FROM {table}')
+            cursor = db.execute(f'SELECT {columns} FROM sensor_data')
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                self.apply_batch(db, rows)
+        logger.info("Sensor rollups rebuilt from raw data")
+
+    def history(self, device_id: str, start: int, end: int, resolution: int,
+                metrics: Sequence[str] = ROLLUP_METRICS) -> Dict[str, Any]:
+        """تاریخچه یک دستگاه با درشت‌ترین rollup که از resolution ریزتر نیست"""
+        metrics = [m for m in metrics if m in ROLLUP_METRICS]
+        table, source_seconds = self._choose_level(resolution)
+        step = max(resolution, source_seconds, 1)
+
+        db = self._connection()
+        series: Dict[str, List[Dict[str, Any]]] = {m: [] for m in metrics}
+
+        if table is None:
+            # resolution زیر یک دقیقه: تجمیع مستقیم از داده خام
+            for metric in metrics:
+                cursor = db.execute(f'''
+                    SELECT (timestamp / :step) * :step AS t,
+                           min({metric}), max({metric}), avg({metric}), count({metric})
+                    FROM sensor_data
+                    WHERE device_id = :device AND timestamp >= :start AND timestamp < :end
+                      AND {metric} IS NOT NULL
+                    GROUP BY t ORDER BY t
+                ''', {'step': step, 'device': device_id, 'start': start, 'end': end})
+                series[metric] = [self._point(*row) for row in cursor]
+        else:
+            cursor = db.execute(f'''
+                SELECT metric, (bucket / :step) * :step AS t,
+                       min(min_value), max(max_value), sum(sum_value), sum(count)
+                FROM {table}
+                WHERE device_id = :device AND bucket >= :start AND bucket < :end
+                GROUP BY metric, t ORDER BY metric, t
+            ''', {'step': step, 'device': device_id,
+                  'start': start // source_seconds * source_seconds, 'end': end})
+            for metric, t, lo, hi, total, count in cursor:
+                if metric in series:
+                    series[metric].append(self._point(t, lo, hi, total / count, count))
+
+        return {
+            'device_id': device_id,
+            'from': start,
+            'to': end,
+            'resolution': step,
+            'source': table or 'sensor_data',
+            'series': series
+        }
+
+    @staticmethod
+    def _choose_level(resolution: int) -> Tuple[Optional[str], int]:
+        """انتخاب درشت‌ترین جدول که bucket آن از resolution بزرگ‌تر نیست"""
+        chosen = (None, 1)
+        for table, seconds in ROLLUP_LEVELS:
+            if seconds <= resolution:
+                chosen = (table, seconds)
+        return chosen
+
+    @staticmethod
+    def _point(t, lo, hi, avg, count) -> Dict[str, Any]:
+        return {'t': t, 'min': lo, 'max': hi, 'avg': avg, 'count': count}
+
+    def _connection(self) -> sqlite3.Connection:
+        """اتصال فقط-خواندنی جداگانه برای هر thread وب سرور"""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, timeout=30)
+            self._local.db = db
+        return db
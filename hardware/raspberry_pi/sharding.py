@@ -0,0 +1,247 @@
+"""
+IoT Smart System - Sharded Ingest
+=================================
+
+اجرای چند worker ingest (پردازه یا node جدا) روی یک broker:
+- دریافت با shared subscription ($share/<group>/devices/+/data) تا broker پیام‌ها را بین worker ها پخش کند
+- مالک هر دستگاه با consistent hashing (HashRing)؛ وضعیت، ring buffer و alarm های دستگاه فقط در worker مالک
+- پیام دستگاهی که مال این worker نیست به topic مستقیم worker مالک فوروارد می‌شود
+  (با استراتژی hash در broker هایی مثل EMQX تقریباً هیچ پیامی فوروارد نمی‌شود)
+- هر worker خلاصه وضعیت خود را دوره‌ای روی gateway/shards/<id>/state منتشر می‌کند؛
+  /api/devices و /api/statistics از ادغام آن‌ها ساخته می‌شوند
+- worker ای (تنظیم شده یا کشف شده در زمان اجرا) که تا peer_timeout وضعیت نفرستد از ring حذف و دستگاه‌هایش
+  بین بقیه پخش می‌شوند؛ تازگی از فیلد time خود وضعیت سنجیده می‌شود (ساعت node ها با NTP همگام)
+"""
+
+import hashlib
+import json
+import logging
+import time
+import zlib
+from bisect import bisect
+from threading import Event, Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('IoTGateway.sharding')
+
+STATE_TOPIC = 'gateway/shards/{}/state'
+FORWARD_PREFIX = 'gateway/shards/{}/'
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """consistent hashing با چند گره مجازی برای هر worker"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64, cache_size: int = 65536):
+        self.vnodes = vnodes
+        self.cache_size = cache_size
+        # (نقاط مرتب، مالک هر نقطه، cache) با یک انتساب عوض می‌شود تا owner هم‌زمان نسخه‌های ناهم‌خوان نبیند
+        self._ring: Tuple[List[int], List[str], Dict[str, str]] = ([], [], {})
+        self._nodes: set = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        self._rebuild()
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        self._rebuild()
+
+    def _rebuild(self):
+        points = sorted((_hash(f'{node}#{i}'), node) for node in self._nodes for i in range(self.vnodes))
+        self._ring = ([p for p, _ in points], [n for _, n in points], {})
+
+    def owner(self, key: str) -> Optional[str]:
+        """worker مالک کلید (نتیجه تا تغییر عضویت cache می‌شود)"""
+        points, owners, cache = self._ring
+        owner = cache.get(key)
+        if owner is not None:
+            return owner
+        if not points:
+            return None
+        owner = owners[bisect(points, _hash(key)) % len(points)]
+        if len(cache) >= self.cache_size:
+            cache.clear()
+        cache[key] = owner
+        return owner
+
+
+class ShardCoordinator:
+    """عضویت worker ها، مالکیت دستگاه‌ها و ادغام وضعیت منتشر شده worker ها"""
+
+    def __init__(self, worker_id: str, workers: Iterable[str],
+                 publish: Callable[[str, bytes, int, bool], Any],
+                 snapshot: Callable[[], Dict[str, Any]],
+                 group: str = 'ingest', state_interval: float = 5.0,
+                 peer_timeout: Optional[float] = None, vnodes: int = 64,
+                 on_rebalance: Optional[Callable[[], None]] = None):
+        self.worker_id = worker_id
+        self.workers = sorted(set(workers) | {worker_id})
+        self.publish = publish
+        self.snapshot = snapshot
+        self.group = group
+        self.state_interval = state_interval
+        self.peer_timeout = peer_timeout or state_interval * 3
+        self.on_rebalance = on_rebalance
+
+        # عضویت ثابت از تنظیمات؛ worker های بی‌پاسخ پس از peer_timeout حذف می‌شوند
+        self.ring = HashRing(self.workers, vnodes)
+        self.peers: Dict[str, Dict[str, Any]] = {}
+        # زمان (wall clock) آخرین وضعیت هر worker طبق فیلد time خود وضعیت، نه زمان دریافت:
+        # وضعیت retained یک worker مرده پس از restart دیگران دوباره تازه به حساب نمی‌آید
+        self._peer_seen: Dict[str, float] = {}
+        self._started = time.time()
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread = None
+
+        self.local_messages = 0
+        self.forwarded = 0
+        self.received_forwards = 0
+        self.rebalances = 0
+
+    def subscriptions(self, device_topics: Iterable[str]) -> List[str]:
+        """topic های shared برای داده دستگاه‌ها، topic مستقیم فوروارد و وضعیت worker ها"""
+        topics = [f'$share/{self.group}/{topic}' for topic in device_topics]
+        topics += [FORWARD_PREFIX.format(self.worker_id) + topic for topic in device_topics]
+        topics.append(STATE_TOPIC.format('+'))
+        return topics
+
+    def forward_patterns(self, device_topics: Iterable[str]) -> List[str]:
+        """الگوهای router برای پیام‌های فوروارد شده به این worker"""
+        return [FORWARD_PREFIX.format(self.worker_id) + topic for topic in device_topics]
+
+    def route(self, device_id: str, topic: str, payload: bytes) -> bool:
+        """True اگر پیام مال این worker باشد؛ در غیر این صورت به مالک فوروارد می‌شود"""
+        owner = self.ring.owner(device_id)
+        if owner == self.worker_id or owner is None:
+            self.local_messages += 1
+            return True
+        if topic.startswith('gateway/shards/'):
+            # فوروارد شده بر اساس ring قدیمی‌تر؛ پردازش محلی به جای رفت و برگشت
+            self.received_forwards += 1
+            return True
+        self.forwarded += 1
+        self.publish(FORWARD_PREFIX.format(owner) + topic, payload, 0, False)
+        return False
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='shard-coordinator', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(self.state_interval + 1)
+            self._thread = None
+        # وضعیت retained خالی: worker های دیگر این worker را فوراً از ring حذف می‌کنند
+        self.publish(STATE_TOPIC.format(self.worker_id), b'', 1, True)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.publish_state()
+                self.check_peers()
+            except Exception as e:
+                logger.error(f"Shard state publish error: {e}")
+            self._stop_event.wait(self.state_interval)
+
+    def publish_state(self):
+        """انتشار خلاصه فشرده وضعیت این worker (retained)"""
+        state = dict(self.snapshot(), worker=self.worker_id, time=time.time())
+        payload = zlib.compress(json.dumps(state, separators=(',', ':'), default=str).encode())
+        self.publish(STATE_TOPIC.format(self.worker_id), payload, 0, True)
+
+    def handle_state(self, worker_id: str, payload: bytes, now: Optional[float] = None):
+        """وضعیت منتشر شده یک worker دیگر؛ payload خالی یا وضعیت قدیمی‌تر از peer_timeout = خروج worker"""
+        if worker_id == self.worker_id:
+            return
+        now = time.time() if now is None else now
+        state = json.loads(zlib.decompress(payload)) if payload else None
+        alive = state is not None and now - state.get('time', 0) <= self.peer_timeout
+        with self._lock:
+            if alive:
+                self.peers[worker_id] = state
+                self._peer_seen[worker_id] = state['time']
+            else:
+                self.peers.pop(worker_id, None)
+                self._peer_seen.pop(worker_id, None)
+        self._update_ring(worker_id, alive)
+
+    def check_peers(self, now: Optional[float] = None):
+        """حذف worker هایی (تنظیم شده یا کشف شده در زمان اجرا) که بیش از peer_timeout وضعیت نفرستاده‌اند"""
+        now = time.time() if now is None else now
+        with self._lock:
+            candidates = set(self.workers) | set(self.peers)
+        candidates |= set(self.ring.nodes)
+        candidates.discard(self.worker_id)
+        for worker_id in candidates:
+            seen = self._peer_seen.get(worker_id, self._started)
+            if now - seen > self.peer_timeout:
+                with self._lock:
+                    self.peers.pop(worker_id, None)
+                    self._peer_seen.pop(worker_id, None)
+                self._update_ring(worker_id, False)
+
+    def _update_ring(self, worker_id: str, alive: bool):
+        if alive == (worker_id in self.ring.nodes):
+            return
+        if alive:
+            self.ring.add(worker_id)
+            logger.info(f"Shard worker {worker_id} joined, rebalancing devices")
+        else:
+            self.ring.remove(worker_id)
+            logger.warning(f"Shard worker {worker_id} left, rebalancing devices")
+        self.rebalances += 1
+        if self.on_rebalance:
+            self.on_rebalance()
+
+    def merged_devices(self, local: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """دستگاه‌های همه worker ها؛ در صورت تکرار (حین rebalance) جدیدترین last_seen"""
+        merged = {d['id']: d for d in local}
+        with self._lock:
+            peers = list(self.peers.values())
+        for state in peers:
+            for device in state.get('devices', ()):
+                current = merged.get(device['id'])
+                if current is None or device.get('last_seen', 0) > current.get('last_seen', 0):
+                    merged[device['id']] = device
+        return list(merged.values())
+
+    def merged_stats(self, local: Dict[str, Any]) -> Dict[str, Any]:
+        """جمع شمارنده‌های دستگاه و آمار هر worker"""
+        workers = {self.worker_id: local}
+        with self._lock:
+            for worker_id, state in self.peers.items():
+                workers[worker_id] = dict(state.get('stats', {}), state_age=round(time.time() - state['time'], 2))
+        totals = {}
+        for stats in workers.values():
+            for key in ('total_devices', 'online_devices', 'offline_devices', 'total_sensors'):
+                if isinstance(stats.get(key), (int, float)):
+                    totals[key] = totals.get(key, 0) + stats[key]
+        return dict(totals, workers=workers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'ring': self.ring.nodes,
+            'peers': sorted(self.peers),
+            'local_messages': self.local_messages,
+            'forwarded': self.forwarded,
+            'received_forwards': self.received_forwards,
+            'rebalances': self.rebalances
+        }
@@ -0,0 +1,170 @@
+"""
+IoT Smart System - API Snapshots
+================================
+
+نمای نسخه‌دار وضعیت دستگاه‌ها برای REST API:
+- شمارنده نسخه سراسری و نسخه هر دستگاه؛ هر به‌روزرسانی فقط همان دستگاه را dirty می‌کند
+- snapshot (dict هر دستگاه، مرتب بر اساس id) فقط پس از تغییر نسخه و فقط برای دستگاه‌های dirty دوباره ساخته می‌شود؛
+  با max_age حداکثر یک بار در هر بازه (در ingest پیوسته نسخه هر چند میلی‌ثانیه عوض می‌شود)
+- صفحه‌بندی با cursor (id آخرین دستگاه صفحه) و projection فیلدها
+- cache پاسخ‌های سریال شده با کلید (نسخه، درخواست) و ETag برای If-None-Match / 304
+"""
+
+import base64
+import json
+import os
+import time
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from device_state import DeviceState
+
+
+def encode_cursor(device_id: str) -> str:
+    return base64.urlsafe_b64encode(device_id.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    """ValueError برای cursor نامعتبر"""
+    try:
+        return base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode()
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+
+
+def paginate(ids: Sequence[str], entries: Dict[str, Dict[str, Any]], after: Optional[str] = None,
+             limit: Optional[int] = None, fields: Optional[Sequence[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+    """یک صفحه از دستگاه‌های مرتب بعد از id داده شده؛ (items, cursor صفحه بعد یا None)"""
+    start = bisect_right(ids, after) if after is not None else 0
+    end = len(ids) if limit is None else min(len(ids), start + limit)
+    page = ids[start:end]
+    if fields:
+        items = [{f: entries[i][f] for f in fields if f in entries[i]} for i in page]
+    else:
+        items = [entries[i] for i in page]
+    next_cursor = encode_cursor(page[-1]) if page and end < len(ids) else None
+    return items, next_cursor
+
+
+class DeviceSnapshots:
+    """snapshot نسخه‌دار self.devices؛ به‌روزرسانی‌ها با mark (زیر data_lock) اعلام می‌شوند"""
+
+    def __init__(self, devices: Dict[str, DeviceState], lock, max_age: float = 0.0):
+        self.devices = devices
+        self.lock = lock
+        self.max_age = max_age
+        # نسخه‌ها پس از restart از صفر شروع می‌شوند؛ epoch در ETag از تداخل جلوگیری می‌کند
+        self.epoch = os.urandom(4).hex()
+        self.version = 0
+        self.device_versions: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._ids: List[str] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._built = 0
+        self._built_at = 0.0
+        self._build_lock = Lock()
+        self.rebuilds = 0
+        self.serialized = 0
+
+    def mark(self, device_id: str):
+        """ثبت تغییر (یا حذف) یک دستگاه؛ فراخواننده data_lock را گرفته است"""
+        self.version += 1
+        self.device_versions[device_id] = self.version
+        self._dirty.add(device_id)
+
+    def touch(self):
+        """تغییر داده‌ای خارج از self.devices (مثلاً وضعیت worker های دیگر)"""
+        with self.lock:
+            self.version += 1
+
+    def etag(self, version: int, key: str = '') -> str:
+        return f'"{self.epoch}-{version:x}-{zlib.crc32(key.encode()):08x}"'
+
+    def view(self) -> Tuple[int, List[str], Dict[str, Dict[str, Any]]]:
+        """(نسخه، id های مرتب، dict هر دستگاه)؛ ساختارهای برگشتی دیگر تغییر نمی‌کنند"""
+        if self._built == self.version or time.monotonic() - self._built_at < self.max_age:
+            return self._built, self._ids, self._entries
+        with self._build_lock:
+            if time.monotonic() - self._built_at < self.max_age:
+                return self._built, self._ids, self._entries
+            with self.lock:
+                version = self.version
+                dirty, self._dirty = self._dirty, set()
+                # copy-on-write: خواننده‌های snapshot قبلی تحت تأثیر قرار نمی‌گیرند
+                entries = dict(self._entries)
+                for device_id in dirty:
+                    device = self.devices.get(device_id)
+                    if device is None:
+                        entries.pop(device_id, None)
+                        self.device_versions.pop(device_id, None)
+                    else:
+                        entries[device_id] = device.to_dict()
+            self.serialized += len(dirty)
+            # ترتیب id ها فقط با اضافه یا حذف دستگاه عوض می‌شود
+            added_or_removed = any((d in entries) != (d in self._entries) for d in dirty)
+            ids = sorted(entries) if added_or_removed else self._ids
+            self._ids, self._entries, self._built = ids, entries, version
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+            return version, ids, entries
+
+    def device(self, device_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(نسخه، dict) یک دستگاه با خواندن سازگار زیر lock"""
+        with self.lock:
+            device = self.devices.get(device_id)
+            if device is None:
+                return 0, None
+            return self.device_versions.get(device_id, 0), device.to_dict()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'devices': len(self._ids),
+            'rebuilds': self.rebuilds,
+            'serialized_devices': self.serialized
+        }
+
+
+class ResponseCache:
+    """بدنه JSON سریال شده برای هر کلید درخواست؛ تغییر نسخه کل cache را باطل می‌کند"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._version = None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: int, build: Callable[[], Any]) -> bytes:
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._entries.clear()
+                self._version = version
+            body = self._entries.get(key) if version == self._version else None
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+
+        body = json.dumps(build(), separators=(',', ':'), default=str).encode()
+        if self.max_entries:
+            with self._lock:
+                # پاسخ نسخه قدیمی‌تر (درخواست هم‌زمان با تغییر نسخه) ذخیره نمی‌شود
+                if version == self._version:
+                    self._entries[key] = body
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return body
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else None
+        }
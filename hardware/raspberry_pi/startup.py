@@ -0,0 +1,129 @@
+"""
+IoT Smart System - Startup
+==========================
+
+راه‌اندازی سریع gateway بعد از قطع برق:
+- ماژول‌های سنگین (AI، ویدیو، Redis) فقط هنگام اولین استفاده import می‌شوند
+- اجزای مستقل (اتصال broker، Redis، Flask، مدل AI) در thread های جداگانه راه‌اندازی می‌شوند
+- زمان هر مرحله برای گزارش و benchmark ثبت می‌شود
+"""
+
+import importlib
+import importlib.util
+import logging
+import time
+from contextlib import contextmanager
+from threading import Lock, Thread, current_thread
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger('IoTGateway.startup')
+
+
+class LazyModule:
+    """ماژولی که در اولین دسترسی به یکی از attribute هایش import می‌شود"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = Lock()
+
+    @property
+    def available(self) -> bool:
+        """نصب بودن ماژول بدون import کردن آن"""
+        if self._module is not None:
+            return True
+        try:
+            return importlib.util.find_spec(self._name) is not None
+        except (ImportError, ValueError):
+            return False
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                started = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                logger.debug(f"Imported {self._name} in {time.perf_counter() - started:.3f}s")
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._module or self._load(), attr)
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+class StartupTimeline:
+    """ثبت زمان مراحل راه‌اندازی (هم‌زمان یا در پس‌زمینه) نسبت به شروع"""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self._phases: Dict[str, Dict[str, Any]] = {}
+        self._milestones: Dict[str, float] = {}
+        self._threads: Dict[str, Thread] = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """اندازه‌گیری یک مرحله در thread فعلی"""
+        started = self.clock()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self._phases[name] = {
+                    'start': round(started - self.started, 4),
+                    'duration': round(self.clock() - started, 4),
+                    'thread': current_thread().name,
+                    'error': error
+                }
+
+    def start_background(self, name: str, fn: Callable[[], Any]) -> Thread:
+        """اجرای یک مرحله مستقل در thread جداگانه؛ خطا فقط log می‌شود"""
+        def run():
+            try:
+                with self.phase(name):
+                    fn()
+            except Exception as e:
+                logger.error(f"Startup phase '{name}' failed: {e}")
+
+        thread = Thread(target=run, name=f'startup-{name}', daemon=True)
+        with self._lock:
+            self._threads[name] = thread
+        thread.start()
+        return thread
+
+    def mark(self, name: str):
+        """ثبت یک نقطه زمانی (مثلاً آماده شدن مسیر ingest)"""
+        with self._lock:
+            self._milestones[name] = round(self.clock() - self.started, 4)
+
+    def wait(self, name: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """انتظار برای یک مرحله پس‌زمینه (یا همه)؛ False اگر تا timeout تمام نشده باشد"""
+        with self._lock:
+            threads = [self._threads[name]] if name in self._threads else (
+                [] if name else list(self._threads.values()))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                return False
+        return True
+
+    def succeeded(self, name: str) -> bool:
+        phase = self._phases.get(name)
+        return phase is not None and phase['error'] is None
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = sorted(self._phases.items(), key=lambda item: item[1]['start'])
+            return {
+                'phases': dict(phases),
+                'milestones': dict(self._milestones),
+                'pending': [name for name, t in self._threads.items() if t.is_alive()]
+            }
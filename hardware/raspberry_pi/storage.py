@@ -0,0 +1,260 @@
+"""
+IoT Smart System - Partitioned Storage
+======================================
+
+جداول SQLite تقسیم شده بر اساس زمان برای داده‌های سنسور و event ها:
+- یک جدول برای هر روز (<name>_pYYYYMMDD) با ایندکس (device_id, timestamp)
+- view با نام اصلی جدول (UNION ALL همه partition ها) برای پرس‌وجوهای موجود؛ id هر partition از 1 شروع
+  می‌شود و در view یکتا نیست، پس view به جای id ستون‌های partition_name و row_id را دارد (کلید یکتا: هر دو)
+- retention با DROP کل partition به جای DELETE ردیف به ردیف؛ retention جدا برای هر جدول
+- جدول قدیمی غیر partition شده به <name>_legacy تغییر نام داده و تا انقضا در view می‌ماند
+"""
+
+import logging
+import sqlite3
+import time
+from itertools import groupby
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('IoTGateway.storage')
+
+DAY_SECONDS = 86400
+
+# SQLite حداکثر 500 بخش در یک compound SELECT می‌پذیرد
+MAX_PARTITIONS = 500
+
+SENSOR_SCHEMA = '''
+    id INTEGER PRIMARY KEY,
+    device_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    temperature REAL,
+    humidity REAL,
+    pressure REAL,
+    light_level REAL,
+    motion BOOLEAN,
+    data_json TEXT
+'''
+
+EVENT_SCHEMA = '''
+    id INTEGER PRIMARY KEY,
+    device_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    data_json TEXT
+'''
+
+
+class PartitionedTable:
+    """جدول روزانه partition شده با view هم‌نام"""
+
+    def __init__(self, name: str, schema: str, retention_days: Optional[float] = None,
+                 index_columns: Sequence[str] = ('device_id', 'timestamp')):
+        self.name = name
+        self.schema = schema
+        self.columns = [line.strip().split()[0] for line in schema.strip().split(',')]
+        self.retention_days = retention_days
+        self.index_columns = tuple(index_columns)
+        self.legacy = f'{name}_legacy'
+        self._known: set = set()
+        self._lock = Lock()
+        self.dropped_partitions = 0
+
+    def partition_for(self, timestamp: Any, now: Optional[float] = None) -> str:
+        """نام partition یک ردیف؛ timestamp نامعتبر یا خارج از بازه retention در partition امروز"""
+        now = time.time() if now is None else now
+        try:
+            ts = float(timestamp)
+        except (TypeError, ValueError):
+            ts = now
+        oldest = now - self.retention_days * DAY_SECONDS if self.retention_days else 0
+        if not oldest <= ts <= now + DAY_SECONDS:
+            ts = now
+        return f"{self.name}_p{time.strftime('%Y%m%d', time.gmtime(ts))}"
+
+    def setup(self, db: sqlite3.Connection):
+        """مهاجرت جدول قدیمی، ساخت partition امروز و view (داخل تراکنش فراخواننده)"""
+        kind = self._object_type(db, self.name)
+        if kind == 'table':
+            # جدول قدیمی: تغییر نام و ایندکس؛ data_json کامل آن تا انقضا دست نمی‌خورد
+            db.execute(f'ALTER TABLE {self.name} RENAME TO {self.legacy}')
+            logger.info(f"Migrated {self.name} to {self.legacy}")
+        if self._object_type(db, self.legacy) == 'table':
+            self._create_index(db, self.legacy)
+        self.ensure(db, self.partition_for(time.time()))
+        self.refresh_view(db)
+
+    def ensure(self, db: sqlite3.Connection, partition: str) -> bool:
+        """ساخت partition در صورت نبود؛ True اگر تازه ساخته شده باشد"""
+        if partition in self._known:
+            return False
+        with self._lock:
+            created = self._object_type(db, partition) is None
+            if created:
+                db.execute(f'CREATE TABLE {partition} ({self.schema})')
+                self._create_index(db, partition)
+            self._known.add(partition)
+        if created:
+            self.refresh_view(db)
+        return created
+
+    def insert_many(self, db: sqlite3.Connection, columns: Sequence[str], rows: Iterable[Sequence[Any]]):
+        """درج دسته‌ای؛ ردیف‌ها بر اساس partition گروه‌بندی می‌شوند (داخل تراکنش فراخواننده)"""
+        ts_index = list(columns).index('timestamp')
+        now = time.time()
+        keyed = sorted(((self.partition_for(row[ts_index], now), row) for row in rows), key=lambda item: item[0])
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format('{}', ', '.join(columns), ', '.join('?' * len(columns)))
+        for partition, group in groupby(keyed, key=lambda item: item[0]):
+            self.ensure(db, partition)
+            db.executemany(sql.format(partition), [row for _, row in group])
+
+    def partitions(self, db: sqlite3.Connection) -> List[str]:
+        """partition های روزانه موجود به ترتیب زمان"""
+        cursor = db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                            (f'{self.name}_p[0-9]*',))
+        return sorted(row[0] for row in cursor)
+
+    def refresh_view(self, db: sqlite3.Connection):
+        """بازسازی view با همه partition ها (و جدول legacy در صورت وجود)"""
+        tables = self.partitions(db)
+        if self._object_type(db, self.legacy) == 'table':
+            tables.insert(0, self.legacy)
+        if len(tables) > MAX_PARTITIONS:
+            logger.warning(f"{self.name}: {len(tables)} partitions exceed the view limit, "
+                           f"oldest are hidden until retention drops them")
+            tables = tables[-MAX_PARTITIONS:]
+        columns = ', '.join(c for c in self.columns if c != 'id')
+        select = ' UNION ALL '.join(f"SELECT {columns}, '{table}' AS partition_name, id AS row_id FROM {table}"
+                                    for table in tables)
+        db.execute(f'DROP VIEW IF EXISTS {self.name}')
+        db.execute(f'CREATE VIEW {self.name} AS {select}')
+
+    def drop_expired(self, db: sqlite3.Connection, now: Optional[float] = None) -> List[str]:
+        """حذف partition های کاملاً قدیمی‌تر از retention با DROP TABLE"""
+        if not self.retention_days:
+            return []
+        now = time.time() if now is None else now
+        cutoff = time.strftime('%Y%m%d', time.gmtime(now - self.retention_days * DAY_SECONDS))
+        expired = [p for p in self.partitions(db) if p.rsplit('_p', 1)[1] < cutoff]
+
+        if self._object_type(db, self.legacy) == 'table':
+            # ردیف‌ها به ترتیب زمان درج شده‌اند؛ آخرین rowid جدیدترین ردیف legacy است
+            row = db.execute(f'SELECT timestamp FROM {self.legacy} ORDER BY rowid DESC LIMIT 1').fetchone()
+            if row is None or row[0] < now - self.retention_days * DAY_SECONDS:
+                expired.insert(0, self.legacy)
+
+        return self.drop(db, expired)
+
+    def drop(self, db: sqlite3.Connection, partitions: Sequence[str]) -> List[str]:
+        if not partitions:
+            return []
+        with self._lock:
+            # view اول حذف و در همان تراکنش بازسازی می‌شود تا به جدول حذف شده اشاره نکند
+            self._known.difference_update(partitions)
+            db.execute(f'DROP VIEW IF EXISTS {self.name}')
+            for partition in partitions:
+                db.execute(f'DROP TABLE IF EXISTS {partition}')
+            self.ensure_today(db)
+            self.refresh_view(db)
+        self.dropped_partitions += len(partitions)
+        logger.info(f"{self.name}: dropped partitions {', '.join(partitions)}")
+        return list(partitions)
+
+    def drop_all(self, db: sqlite3.Connection):
+        """حذف همه داده‌ها (factory reset)"""
+        tables = self.partitions(db)
+        if self._object_type(db, self.legacy) == 'table':
+            tables.append(self.legacy)
+        self.drop(db, tables)
+
+    def ensure_today(self, db: sqlite3.Connection):
+        partition = self.partition_for(time.time())
+        if self._object_type(db, partition) is None:
+            db.execute(f'CREATE TABLE {partition} ({self.schema})')
+            self._create_index(db, partition)
+        self._known.add(partition)
+
+    def _create_index(self, db: sqlite3.Connection, table: str):
+        columns = ', '.join(self.index_columns)
+        db.execute(f'CREATE INDEX IF NOT EXISTS {table}_device_time ON {table} ({columns})')
+
+    @staticmethod
+    def _object_type(db: sqlite3.Connection, name: str) -> Optional[str]:
+        row = db.execute('SELECT type FROM sqlite_master WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self, db: sqlite3.Connection) -> Dict[str, Any]:
+        partitions = self.partitions(db)
+        return {
+            'partitions': len(partitions),
+            'oldest': partitions[0] if partitions else None,
+            'legacy': self._object_type(db, self.legacy) == 'table',
+            'retention_days': self.retention_days,
+            'dropped_partitions': self.dropped_partitions
+        }
+
+
+class StorageRetention:
+    """thread دوره‌ای retention: DROP partition های منقضی و DELETE از جداول کوچک (rollup ها)"""
+
+    def __init__(self, db_path: str, tables: Sequence[PartitionedTable],
+                 row_retention: Optional[Dict[str, Tuple[str, Optional[float]]]] = None,
+                 interval: float = 3600.0):
+        self.db_path = db_path
+        self.tables = list(tables)
+        # نام جدول -> (ستون زمان، روز)
+        self.row_retention = {k: v for k, v in (row_retention or {}).items() if v[1]}
+        self.interval = interval
+        self._stop_event = Event()
+        self._thread = None
+        self.runs = 0
+        self.deleted_rows = 0
+        self.last_run_seconds = 0.0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name='storage-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self, db: sqlite3.Connection, now: Optional[float] = None) -> Dict[str, Any]:
+        """یک دور retention روی همه جداول"""
+        now = time.time() if now is None else now
+        started = time.monotonic()
+        dropped = {}
+        with db:
+            for table in self.tables:
+                dropped[table.name] = table.drop_expired(db, now)
+            for name, (column, days) in self.row_retention.items():
+                cursor = db.execute(f'DELETE FROM {name} WHERE {column} < ?', (int(now - days * DAY_SECONDS),))
+                self.deleted_rows += cursor.rowcount
+        self.runs += 1
+        self.last_run_seconds = time.monotonic() - started
+        return dropped
+
+    def _run(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    self.run_once(db)
+                except sqlite3.Error as e:
+                    logger.error(f"Storage retention failed: {e}")
+                self._stop_event.wait(self.interval)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'runs': self.runs,
+            'deleted_rows': self.deleted_rows,
+            'last_run_seconds': round(self.last_run_seconds, 4),
+            'dropped_partitions': {t.name: t.dropped_partitions for t in self.tables}
+        }
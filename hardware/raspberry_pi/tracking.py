@@ -0,0 +1,223 @@
+"""
+IoT Smart System - Object Tracking
+==================================
+
+پس‌پردازش detection ها و ردیابی اشیاء بین frame ها:
+- non-max suppression برداری با NumPy (به تفکیک کلاس)
+- ردیاب سبک IoU/مرکز با شناسه پایدار برای هر شیء
+- event فقط هنگام ظاهر شدن، رفتن یا ورود یک شیء به zone (نه برای هر frame)
+
+کادرها به ترتیب خروجی مدل‌های SSD هستند: [ymin, xmin, ymax, xmax] نرمال شده (0..1).
+zone ها مستطیل (x1, y1, x2, y2) نرمال شده‌اند و مرکز شیء با آن‌ها مقایسه می‌شود.
+"""
+
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger('IoTGateway.tracking')
+
+DEFAULT_TRACKING = {
+    'iou_threshold': 0.3,      # حداقل IoU برای انتساب detection به track
+    'max_distance': 0.1,       # اگر IoU کم بود: حداکثر فاصله مرکزها (نسبت به اندازه تصویر)
+    'max_age': 10.0,           # track بدون detection بعد از این مدت «رفته» است (ثانیه)
+    'min_hits': 2,             # track بعد از این تعداد detection تأیید و اعلام می‌شود
+    'zones': {}                # نام zone -> (x1, y1, x2, y2)
+}
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU همه جفت کادرها: (N, 4) × (M, 4) → (N, M)"""
+    a = a[:, None, :]
+    b = b[None, :, :]
+    height = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    width = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = height * width
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.5,
+        classes: Optional[np.ndarray] = None) -> np.ndarray:
+    """ایندکس کادرهای باقی‌مانده پس از non-max suppression، به ترتیب نزولی score"""
+    count = len(scores)
+    if count <= 1:
+        return np.arange(count)
+    order = np.argsort(-scores, kind='stable')
+    boxes = boxes[order]
+    if classes is not None:
+        # جابه‌جایی کادرهای هر کلاس تا کلاس‌های مختلف هرگز هم‌پوشانی نداشته باشند
+        offset = classes[order].astype(boxes.dtype)[:, None] * (float(boxes.max()) + 1.0)
+        boxes = boxes + offset
+
+    # ماتریس IoU یک بار حساب می‌شود؛ هر مرحله یک سطر را برداری اعمال می‌کند
+    overlaps = iou_matrix(boxes, boxes) > iou_threshold
+    suppressed = np.zeros(count, bool)
+    keep = []
+    for i in range(count):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= overlaps[i]
+    return order[keep]
+
+
+class Track:
+    """یک شیء ردیابی شده"""
+
+    __slots__ = ('id', 'cls', 'box', 'confidence', 'first_seen', 'last_seen', 'hits', 'confirmed', 'zones')
+
+    def __init__(self, track_id: int, cls: int, box: np.ndarray, confidence: float, now: float):
+        self.id = track_id
+        self.cls = cls
+        self.box = box
+        self.confidence = confidence
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.confirmed = False
+        self.zones: set = set()
+
+
+class ObjectTracker:
+    """ردیاب IoU/مرکز برای یک دوربین؛ update فقط event های تغییر وضعیت را برمی‌گرداند"""
+
+    def __init__(self, camera_id: str, iou_threshold: float = 0.3, max_distance: float = 0.1,
+                 max_age: float = 10.0, min_hits: int = 2, zones: Optional[Dict[str, Sequence[float]]] = None):
+        self.camera_id = camera_id
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.zone_names = list((zones or {}).keys())
+        self._zones = np.array([zones[name] for name in self.zone_names], np.float64).reshape(-1, 4)
+
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+        self.frames = 0
+        self.detections = 0
+        self.events = 0
+
+    def update(self, detections: List[Dict[str, Any]], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """انتساب detection های یک frame به track ها؛ خروجی: event های appeared / entered_zone / left"""
+        now = time.time() if now is None else now
+        self.frames += 1
+        self.detections += len(detections)
+        events = []
+
+        if detections:
+            boxes = np.array([d['bbox'] for d in detections], np.float64).reshape(-1, 4)
+            classes = np.array([d['class'] for d in detections], np.int64)
+            confidences = [d['confidence'] for d in detections]
+
+            matched = self._match(boxes, classes)
+            for det, track in enumerate(matched):
+                if track is None:
+                    self.tracks.append(Track(next(self._ids), int(classes[det]), boxes[det],
+                                             confidences[det], now))
+                    continue
+                track.box = boxes[det]
+                track.confidence = confidences[det]
+                track.last_seen = now
+                track.hits += 1
+
+            for track in self.tracks:
+                if track.last_seen == now and not track.confirmed and track.hits >= self.min_hits:
+                    track.confirmed = True
+                    events.append(self._event('appeared', track, now))
+            events.extend(self._check_zones(now))
+
+        events.extend(self.expire(now))
+        return events
+
+    def expire(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """حذف track هایی که max_age ثانیه دیده نشده‌اند (event 'left' برای track های تأیید شده)"""
+        now = time.time() if now is None else now
+        events = []
+        alive = []
+        for track in self.tracks:
+            if now - track.last_seen <= self.max_age:
+                alive.append(track)
+            elif track.confirmed:
+                events.append(self._event('left', track, now, duration=round(track.last_seen - track.first_seen, 3)))
+        self.tracks = alive
+        return events
+
+    def _match(self, boxes: np.ndarray, classes: np.ndarray) -> List[Optional[Track]]:
+        """انتساب حریصانه بر اساس IoU و در صورت نبود هم‌پوشانی، نزدیکی مرکزها"""
+        matched: List[Optional[Track]] = [None] * len(boxes)
+        if not self.tracks:
+            return matched
+
+        track_boxes = np.array([t.box for t in self.tracks])
+        track_classes = np.array([t.cls for t in self.tracks])
+        iou = iou_matrix(track_boxes, boxes)
+
+        # مرکزها برای اشیاء کوچک و سریع که بین دو frame هم‌پوشانی ندارند
+        distance = np.linalg.norm(self._centers(track_boxes)[:, None, :] - self._centers(boxes)[None, :, :], axis=2)
+        near = (1.0 - distance / self.max_distance) * self.iou_threshold if self.max_distance else np.zeros_like(iou)
+
+        # امتیاز IoU همیشه بالاتر از امتیاز فاصله است (حداکثر آن کمتر از iou_threshold)
+        score = np.where(iou >= self.iou_threshold, iou, np.clip(near, 0, None) * 0.999)
+        score[track_classes[:, None] != classes[None, :]] = 0.0
+
+        rows, cols = np.nonzero(score > 0)
+        order = np.argsort(-score[rows, cols], kind='stable')
+        used_tracks = set()
+        for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+            if r in used_tracks or matched[c] is not None:
+                continue
+            used_tracks.add(r)
+            matched[c] = self.tracks[r]
+        return matched
+
+    def _check_zones(self, now: float) -> List[Dict[str, Any]]:
+        """event ورود track های تأیید شده به zone ها (برداری روی همه track ها و zone ها)"""
+        if not len(self._zones):
+            return []
+        tracks = [t for t in self.tracks if t.confirmed and t.last_seen == now]
+        if not tracks:
+            return []
+
+        centers = self._centers(np.array([t.box for t in tracks]))   # (x, y)
+        zones = self._zones
+        inside = ((centers[:, None, 0] >= zones[None, :, 0]) & (centers[:, None, 0] <= zones[None, :, 2]) &
+                  (centers[:, None, 1] >= zones[None, :, 1]) & (centers[:, None, 1] <= zones[None, :, 3]))
+
+        events = []
+        for track, row in zip(tracks, inside):
+            current = {self.zone_names[z] for z in np.flatnonzero(row)}
+            for zone in sorted(current - track.zones):
+                events.append(self._event('entered_zone', track, now, zone=zone))
+            track.zones = current
+        return events
+
+    @staticmethod
+    def _centers(boxes: np.ndarray) -> np.ndarray:
+        """مرکز کادرها به صورت (x, y)"""
+        return np.stack([(boxes[:, 1] + boxes[:, 3]) / 2, (boxes[:, 0] + boxes[:, 2]) / 2], axis=1)
+
+    def _event(self, event: str, track: Track, now: float, **extra) -> Dict[str, Any]:
+        self.events += 1
+        return dict({
+            'event': event,
+            'camera_id': self.camera_id,
+            'track_id': track.id,
+            'class': track.cls,
+            'confidence': round(float(track.confidence), 4),
+            'bbox': [round(float(v), 4) for v in track.box],
+            'timestamp': now
+        }, **extra)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'active_tracks': sum(1 for t in self.tracks if t.confirmed),
+            'tentative_tracks': sum(1 for t in self.tracks if not t.confirmed),
+            'frames': self.frames,
+            'detections': self.detections,
+            'events': self.events
+        }
@@ -0,0 +1,566 @@
+"""
+IoT Smart System - Cloud Uplink
+===============================
+
+ارسال store-and-forward داده‌ها به cloud:
+- داده‌های سنسور و event ها در frame های دسته‌ای فشرده (zlib) جمع می‌شوند
+- هر frame با شماره ترتیبی در یک spool روی دیسک (فایل‌های segment فقط-افزودنی با CRC) نوشته می‌شود
+- ارسال به ترتیب با ack سرور؛ offset تایید شده روی دیسک ذخیره و پس از restart یا قطعی از همان‌جا ادامه می‌یابد
+- سقف پهنای باند (بایت در ثانیه) و نرخ frame با token bucket
+- اتصال‌های keep-alive پایدار (connection pool) برای HTTP، یا MQTT با QoS 1
+"""
+
+import http.client
+import json
+import logging
+import os
+import socket
+import struct
+import time
+import zlib
+from pathlib import Path
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from metrics import Histogram
+from startup import lazy_import
+
+mqtt = lazy_import('paho.mqtt.client')
+
+logger = logging.getLogger('IoTGateway.uplink')
+
+# magic، شماره ترتیبی، طول payload، CRC32 payload
+FRAME_HEADER = struct.Struct('<4sQII')
+FRAME_MAGIC = b'UPL1'
+ACK_FILE = 'acked.json'
+
+CONTENT_TYPE = 'application/x-iot-uplink'
+
+
+def frame_body(gateway_id: str, records: List[Dict[str, Any]]) -> bytes:
+    """JSON فشرده نشده یک دسته رکورد"""
+    return json.dumps({'gateway': gateway_id, 'records': records}, separators=(',', ':'), default=str).encode()
+
+
+def encode_frame(gateway_id: str, records: List[Dict[str, Any]], level: int = 6) -> bytes:
+    """فشرده‌سازی یک دسته رکورد (JSON + zlib)"""
+    return zlib.compress(frame_body(gateway_id, records), level)
+
+
+def decode_frame(payload: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(payload))
+
+
+class UplinkSpool:
+    """log فقط-افزودنی frame ها در segment های <اولین seq>.log با offset تایید شده روی دیسک"""
+
+    def __init__(self, path: str, segment_bytes: int = 4 * 1024 * 1024,
+                 max_bytes: int = 512 * 1024 * 1024, fsync: bool = True):
+        self.path = Path(path)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self._lock = Lock()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.acked = self._load_ack()
+        self.segments: List[Tuple[int, Path]] = []   # (اولین seq، مسیر)
+        self.next_seq = self.acked + 1
+        self.dropped_frames = 0
+        self._writer = None
+        self._writer_bytes = 0
+        self._cursor = None   # (segment، موقعیت، seq) اولین frame تایید نشده
+        self._after = None    # موقعیت frame بعد از آن؛ پس از ack بدون جستجو استفاده می‌شود
+        self._recover()
+
+    def _recover(self):
+        """فهرست segment ها و بریدن رکورد ناقص انتهای آخرین segment (قطع برق حین نوشتن)"""
+        self.segments = sorted((int(p.stem), p) for p in self.path.glob('*.log') if p.stem.isdigit())
+        if not self.segments:
+            return
+        first, last = self.segments[-1]
+        last_seq, valid = first - 1, 0
+        with open(last, 'rb') as f:
+            for last_seq, _, _, valid in self._scan(f):
+                pass
+        if valid < last.stat().st_size:
+            logger.warning(f"Uplink spool: truncating torn record in {last.name} at {valid}")
+            with open(last, 'r+b') as f:
+                f.truncate(valid)
+        self.next_seq = max(self.next_seq, last_seq + 1)
+
+    @staticmethod
+    def _scan(f):
+        """پیمایش رکوردهای سالم یک segment از موقعیت جاری: (seq، payload، شروع، پایان)"""
+        position = f.tell()
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            magic, seq, length, crc = FRAME_HEADER.unpack(header)
+            if magic != FRAME_MAGIC:
+                return
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            end = position + FRAME_HEADER.size + length
+            yield seq, payload, position, end
+            position = end
+
+    def append(self, payload: bytes) -> int:
+        """افزودن یک frame؛ شماره ترتیبی آن برگردانده می‌شود"""
+        with self._lock:
+            seq = self.next_seq
+            if self._writer is None or self._writer_bytes >= self.segment_bytes:
+                self._roll(seq)
+            self._writer.write(FRAME_HEADER.pack(FRAME_MAGIC, seq, len(payload), zlib.crc32(payload)))
+            self._writer.write(payload)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self._writer_bytes += FRAME_HEADER.size + len(payload)
+            self.next_seq = seq + 1
+            return seq
+
+    def _roll(self, seq: int):
+        """بستن segment جاری و شروع segment جدید (پس از restart ادامه آخرین segment)"""
+        if self._writer:
+            self._writer.close()
+        if self._writer is None and self.segments:
+            path = self.segments[-1][1]
+        else:
+            path = self.path / f'{seq:020d}.log'
+            self.segments.append((seq, path))
+        self._writer = open(path, 'ab')
+        self._writer_bytes = path.stat().st_size
+        self._enforce_capacity()
+
+    def _enforce_capacity(self):
+        """حذف قدیمی‌ترین segment ها (حتی تایید نشده) وقتی spool از max_bytes بزرگ‌تر شود"""
+        while len(self.segments) > 1 and self.size_bytes() > self.max_bytes:
+            first, path = self.segments.pop(0)
+            lost = self.segments[0][0] - max(first, self.acked + 1)
+            path.unlink(missing_ok=True)
+            if lost > 0:
+                self.dropped_frames += lost
+                self.acked = self.segments[0][0] - 1
+                self._cursor = None
+                self._save_ack()
+                logger.warning(f"Uplink spool full, dropped {lost} unsent frames")
+
+    def peek(self) -> Optional[Tuple[int, bytes]]:
+        """اولین frame تایید نشده (بدون حذف)"""
+        with self._lock:
+            want = self.acked + 1
+            if want >= self.next_seq:
+                return None
+            cursor = self._cursor if self._cursor and self._cursor[2] == want else self._locate(want)
+            while cursor:
+                path, position, _ = cursor
+                with open(path, 'rb') as f:
+                    f.seek(position)
+                    for seq, payload, start, end in self._scan(f):
+                        if seq < want:
+                            continue
+                        self._cursor = (path, start, seq)
+                        self._after = (path, end, seq + 1)
+                        return seq, payload
+                cursor = self._next_segment(path)
+            return None
+
+    def _locate(self, seq: int) -> Optional[Tuple[Path, int, int]]:
+        """آخرین segment که seq را پوشش می‌دهد (جستجو از ابتدای آن)"""
+        covering = [(first, path) for first, path in self.segments if first <= seq]
+        if covering:
+            first, path = covering[-1]
+            return path, 0, first
+        return (self.segments[0][1], 0, self.segments[0][0]) if self.segments else None
+
+    def _next_segment(self, path: Path) -> Optional[Tuple[Path, int, int]]:
+        later = [(first, p) for first, p in self.segments if p > path]
+        return (later[0][1], 0, later[0][0]) if later else None
+
+    def ack(self, seq: int):
+        """تایید همه frame ها تا seq؛ segment های کاملاً تایید شده حذف می‌شوند"""
+        with self._lock:
+            seq = min(seq, self.next_seq - 1)
+            if seq <= self.acked:
+                return
+            self.acked = seq
+            self._cursor = self._after if self._after and self._after[2] == seq + 1 else None
+            self._save_ack()
+            while len(self.segments) > 1 and self.segments[1][0] <= self.acked + 1:
+                _, path = self.segments.pop(0)
+                path.unlink(missing_ok=True)
+                if self._cursor and self._cursor[0] == path:
+                    self._cursor = None
+
+    def pending(self) -> int:
+        return self.next_seq - 1 - self.acked
+
+    def size_bytes(self) -> int:
+        return sum(path.stat().st_size for _, path in self.segments if path.exists())
+
+    def close(self):
+        with self._lock:
+            if self._writer:
+                self._writer.close()
+                self._writer = None
+
+    def _load_ack(self) -> int:
+        try:
+            return int(json.loads((self.path / ACK_FILE).read_text())['acked'])
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _save_ack(self):
+        path = self.path / ACK_FILE
+        temp = path.with_suffix('.tmp')
+        temp.write_text(json.dumps({'acked': self.acked, 'time': time.time()}))
+        os.replace(temp, path)
+
+
+class TokenBucket:
+    """محدودیت نرخ؛ take تا در دسترس شدن مقدار درخواستی منتظر می‌ماند"""
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or rate or 0.0
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+    def take(self, amount: float, stop: Event) -> bool:
+        """False اگر حین انتظار stop شود"""
+        if not self.rate:
+            return True
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # frame بزرگ‌تر از burst با بدهکار کردن bucket ارسال می‌شود
+            if self._tokens >= min(amount, self.burst):
+                self._tokens -= amount
+                return True
+            if stop.wait((min(amount, self.burst) - self._tokens) / self.rate):
+                return False
+
+
+class UplinkError(Exception):
+    """ارسال ناموفق frame (شبکه یا پاسخ سرور)"""
+
+
+class HttpTransport:
+    """POST هر frame روی اتصال‌های keep-alive؛ سرور بالاترین seq دریافت شده را برمی‌گرداند"""
+
+    def __init__(self, url: str, gateway_id: str, pool_size: int = 2, timeout: float = 10.0,
+                 headers: Optional[Dict[str, str]] = None):
+        parts = urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.path = parts.path or '/'
+        self.gateway_id = gateway_id
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self._pool: Queue = Queue()
+        for _ in range(pool_size):
+            self._pool.put(None)
+        self.connections_opened = 0
+
+    def _connection(self) -> http.client.HTTPConnection:
+        factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.connections_opened += 1
+        return factory(self.host, self.port, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None,
+                 headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """یک درخواست روی اتصالی از pool؛ اتصال خراب بسته و بعداً دوباره ساخته می‌شود"""
+        conn = self._pool.get()
+        try:
+            if conn is None:
+                conn = self._connection()
+            conn.request(method, path, body=body, headers=dict(self.headers, **(headers or {})))
+            response = conn.getresponse()
+            data = response.read()
+            if response.status != 200:
+                raise UplinkError(f"HTTP {response.status}")
+            if response.will_close:
+                conn.close()
+                conn = None
+            return json.loads(data)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            if conn is not None:
+                conn.close()
+                conn = None
+            raise UplinkError(str(e) or type(e).__name__) from e
+        except UplinkError:
+            conn.close()
+            conn = None
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def send(self, seq: int, payload: bytes) -> int:
+        return self._ack(self._request('POST', self.path, payload, {
+            'Content-Type': CONTENT_TYPE,
+            'Content-Encoding': 'deflate',
+            'X-Gateway-Id': self.gateway_id,
+            'X-Uplink-Seq': str(seq)
+        }))
+
+    def offset(self) -> Optional[int]:
+        """آخرین seq تایید شده برای این gateway از دید سرور (برای ادامه پس از restart)"""
+        return self._ack(self._request('GET', f"{self.path.rstrip('/')}/offset?gateway={self.gateway_id}"))
+
+    @staticmethod
+    def _ack(result: Any) -> int:
+        """فیلد ack پاسخ سرور؛ پاسخ 200 بدون ack عددی هم خطای ارسال است"""
+        ack = result.get('ack') if isinstance(result, dict) else None
+        if not isinstance(ack, int) or isinstance(ack, bool):
+            raise UplinkError(f"Invalid ack in server response: {str(result)[:100]}")
+        return ack
+
+    def close(self):
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+class MqttTransport:
+    """publish هر frame با QoS 1 روی یک اتصال پایدار؛ PUBACK به عنوان ack"""
+
+    def __init__(self, broker: str, port: int, gateway_id: str, topic: str = 'uplink/{gateway}',
+                 timeout: float = 10.0, tls: bool = False, username: Optional[str] = None,
+                 password: Optional[str] = None):
+        self.broker = broker
+        self.port = port
+        self.topic = topic.format(gateway=gateway_id)
+        self.timeout = timeout
+        self.client = mqtt.Client(client_id=f'uplink-{gateway_id}', clean_session=False)
+        if tls:
+            self.client.tls_set()
+        if username:
+            self.client.username_pw_set(username, password)
+        self.client.max_inflight_messages_set(1)
+        self._connected = False
+        self.connections_opened = 0
+
+    def _connect(self):
+        if self._connected and self.client.is_connected():
+            return
+        try:
+            self.client.connect(self.broker, self.port, keepalive=60)
+            self.client.loop_start()
+        except OSError as e:
+            raise UplinkError(str(e)) from e
+        self._connected = True
+        self.connections_opened += 1
+
+    def send(self, seq: int, payload: bytes) -> int:
+        self._connect()
+        info = self.client.publish(self.topic, FRAME_HEADER.pack(FRAME_MAGIC, seq, len(payload),
+                                                                 zlib.crc32(payload)) + payload, qos=1)
+        try:
+            info.wait_for_publish(self.timeout)
+        except (RuntimeError, ValueError) as e:
+            raise UplinkError(str(e)) from e
+        if not info.is_published():
+            raise UplinkError("PUBACK timeout")
+        return seq
+
+    def offset(self) -> Optional[int]:
+        return None
+
+    def close(self):
+        if self._connected:
+            self.client.loop_stop()
+            self.client.disconnect()
+            self._connected = False
+
+
+class CloudUplink:
+    """جمع‌آوری رکوردها در frame، نوشتن در spool و ارسال به ترتیب با ack"""
+
+    def __init__(self, transport, spool: UplinkSpool, gateway_id: str,
+                 batch_records: int = 500, batch_interval: float = 2.0, compress_level: int = 6,
+                 max_pending_records: int = 50000, max_bytes_per_second: Optional[float] = None,
+                 max_frames_per_second: Optional[float] = None,
+                 backoff_initial: float = 1.0, backoff_max: float = 60.0):
+        self.transport = transport
+        self.spool = spool
+        self.gateway_id = gateway_id
+        self.batch_records = batch_records
+        self.batch_interval = batch_interval
+        self.compress_level = compress_level
+        self.max_pending_records = max_pending_records
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.bandwidth = TokenBucket(max_bytes_per_second)
+        self.frame_rate = TokenBucket(max_frames_per_second, max(1.0, max_frames_per_second or 0))
+
+        self._records: List[Dict[str, Any]] = []
+        self._lock = Lock()
+        self._batch_ready = Event()
+        self._frame_ready = Event()
+        self._stop_event = Event()
+        self._threads: List[Thread] = []
+
+        self.online = False
+        self.submitted_records = 0
+        self.dropped_records = 0
+        self.frames = 0
+        self.raw_bytes = 0
+        self.frame_bytes = 0
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.failures = 0
+        self.lagging_acks = 0
+        self.last_error: Optional[str] = None
+        self.send_seconds = Histogram()
+
+    def start(self):
+        """ادامه از offset سرور (در صورت پشتیبانی) و شروع thread های batch و ارسال"""
+        self._stop_event.clear()
+        self._sync_offset()
+        for name, target in (('uplink-batch', self._batch_loop), ('uplink-send', self._send_loop)):
+            thread = Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Cloud uplink started ({self.spool.pending()} frames spooled)")
+
+    def stop(self, drain_timeout: float = 5.0):
+        """نوشتن دسته جاری در spool و فرصت محدود برای ارسال؛ باقی‌مانده روی دیسک می‌ماند"""
+        self._batch_ready.set()
+        deadline = time.monotonic() + drain_timeout
+        while self.online and self.spool.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stop_event.set()
+        self._batch_ready.set()
+        self._frame_ready.set()
+        for thread in self._threads:
+            thread.join(5)
+        self._threads = []
+        self._flush_batch()
+        self.spool.close()
+        self.transport.close()
+
+    def submit_reading(self, device_id: str, data: Dict[str, Any]):
+        self._submit({'type': 'reading', 'device_id': device_id, 'data': data})
+
+    def submit_events(self, events: List[Dict[str, Any]]):
+        for event in events:
+            self._submit({'type': 'event', 'data': event})
+
+    def _submit(self, record: Dict[str, Any]):
+        with self._lock:
+            if len(self._records) >= self.max_pending_records:
+                self.dropped_records += 1
+                return
+            self._records.append(record)
+            self.submitted_records += 1
+            if len(self._records) >= self.batch_records:
+                self._batch_ready.set()
+
+    def _batch_loop(self):
+        while not self._stop_event.is_set():
+            self._batch_ready.wait(self.batch_interval)
+            self._batch_ready.clear()
+            try:
+                self._flush_batch()
+            except Exception as e:
+                logger.error(f"Uplink batch error: {e}")
+
+    def _flush_batch(self):
+        """بستن دسته جاری به یک frame در spool"""
+        with self._lock:
+            records, self._records = self._records, []
+        for start in range(0, len(records), self.batch_records):
+            chunk = records[start:start + self.batch_records]
+            # اندازه قبل از فشرده‌سازی از همان JSON ساخته شده (بدون سریال‌سازی دوباره)
+            body = frame_body(self.gateway_id, chunk)
+            payload = zlib.compress(body, self.compress_level)
+            self.spool.append(payload)
+            self.frames += 1
+            self.frame_bytes += len(payload)
+            self.raw_bytes += len(body)
+            self._frame_ready.set()
+
+    def _sync_offset(self):
+        """تایید frame هایی که سرور قبلاً دریافت کرده (ack محلی پیش از crash ذخیره نشده بود)"""
+        try:
+            offset = self.transport.offset()
+        except UplinkError as e:
+            logger.info(f"Uplink offset unavailable ({e}), resuming from local ack {self.spool.acked}")
+            return
+        if offset is not None and offset > self.spool.acked:
+            logger.info(f"Uplink resuming after server offset {offset}")
+            self.spool.ack(offset)
+
+    def _send_loop(self):
+        """ارسال به ترتیب: frame بعدی فقط پس از ack قبلی؛ backoff نمایی در قطعی"""
+        backoff = self.backoff_initial
+        while not self._stop_event.is_set():
+            frame = self.spool.peek()
+            if frame is None:
+                self._frame_ready.wait(1.0)
+                self._frame_ready.clear()
+                continue
+            seq, payload = frame
+            if not (self.frame_rate.take(1, self._stop_event)
+                    and self.bandwidth.take(len(payload), self._stop_event)):
+                break
+
+            started = time.monotonic()
+            try:
+                ack = self.transport.send(seq, payload)
+            except Exception as e:   # UplinkError یا خطای غیرمنتظره transport؛ thread ارسال نباید متوقف شود
+                self.failures += 1
+                self.last_error = str(e)
+                if self.online:
+                    logger.warning(f"Cloud uplink offline: {e}")
+                self.online = False
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+
+            self.send_seconds.observe(time.monotonic() - started)
+            if not self.online:
+                logger.info(f"Cloud uplink online, {self.spool.pending()} frames to replay")
+            self.online = True
+            self.sent_frames += 1
+            self.sent_bytes += len(payload)
+            self.spool.ack(ack)
+            if ack < seq:
+                # سرور هنوز این frame را نپذیرفته (عقب‌تر است)؛ ارسال دوباره با همان backoff خطای انتقال
+                self.lagging_acks += 1
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+            backoff = self.backoff_initial
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'online': self.online,
+            'pending_records': len(self._records),
+            'spooled_frames': self.spool.pending(),
+            'spool_bytes': self.spool.size_bytes(),
+            'acked_seq': self.spool.acked,
+            'submitted_records': self.submitted_records,
+            'dropped_records': self.dropped_records,
+            'dropped_frames': self.spool.dropped_frames,
+            'frames': self.frames,
+            'compression_ratio': round(self.raw_bytes / self.frame_bytes, 2) if self.frame_bytes else None,
+            'sent_frames': self.sent_frames,
+            'sent_bytes': self.sent_bytes,
+            'failures': self.failures,
+            'lagging_acks': self.lagging_acks,
+            'last_error': self.last_error,
+            'connections_opened': self.transport.connections_opened
+        }
+
+
+def default_gateway_id() -> str:
+    return socket.gethostname()
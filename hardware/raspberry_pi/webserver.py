@@ -0,0 +1,87 @@
+"""
+IoT Smart System - Web Server
+=============================
+
+اجرای Flask و Socket.IO (حالت threading) به جای socketio.run:
+- production: gunicorn با یک worker از نوع gthread (چند thread، HTTP/1.1 keep-alive و WebSocket از طریق
+  simple-websocket)؛ مدل توصیه شده Flask-SocketIO برای حالت threading. arbiter پردازه اصلی است و
+  gateway (MQTT، pipeline، SQLite) داخل worker پس از fork ساخته می‌شود، چون thread ها از fork عبور نمی‌کنند.
+  worker از کار افتاده توسط arbiter دوباره راه‌اندازی می‌شود.
+- فقط یک worker: وضعیت دستگاه‌ها، MQTT و SQLite درون همان پردازه‌اند؛ مقیاس افقی با sharding
+  (چند gateway worker) انجام می‌شود.
+- fallback: سرور توسعه Werkzeug (ThreadedWSGIServer) در یک thread، وقتی gunicorn نصب نیست یا
+  web.server = 'werkzeug'. این سرور برای production نیست (Flask-SocketIO هم در socketio.run آن را بدون
+  allow_unsafe_werkzeug رد می‌کند) و فقط برای توسعه، benchmark ها و دستگاه‌های بدون gunicorn است.
+"""
+
+import logging
+from typing import Any, Callable
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+from startup import lazy_import
+
+gunicorn_base = lazy_import('gunicorn.app.base')
+
+logger = logging.getLogger('IoTGateway.web')
+
+
+def gunicorn_available() -> bool:
+    return gunicorn_base.available
+
+
+def run_gunicorn(load: Callable[[], Any], on_exit: Callable[[], None], host: str = '0.0.0.0',
+                 port: int = 5000, backlog: int = 128, threads: int = 8, timeout: int = 60,
+                 graceful_timeout: int = 30):
+    """اجرای arbiter در پردازه فعلی تا پایان (بلاک می‌کند)؛ load در worker برنامه WSGI را می‌سازد"""
+
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': 1,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'backlog': backlog,
+        'timeout': timeout,
+        'graceful_timeout': graceful_timeout,
+        'keepalive': 5,
+        'max_requests': 0,       # بازیافت worker یعنی راه‌اندازی دوباره کل gateway
+        'preload_app': False,    # gateway باید در worker ساخته شود، نه پیش از fork
+        'accesslog': None,
+        'worker_exit': lambda server, worker: on_exit()
+    }
+
+    class GatewayApplication(gunicorn_base.BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load()
+
+    logger.info(f"Starting gunicorn on {host}:{port} (1 gthread worker, {threads} threads)")
+    GatewayApplication().run()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """HTTP/1.1 keep-alive و لاگ درخواست‌ها فقط در سطح DEBUG"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, code='-', size='-'):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{self.address_string()} {self.requestline} {code} {size}")
+
+
+class GatewayWSGIServer(ThreadedWSGIServer):
+    """سرور توسعه Werkzeug با backlog قابل تنظیم"""
+
+    def __init__(self, host: str, port: int, app, backlog: int = 128):
+        self.request_queue_size = backlog
+        super().__init__(host, port, app, handler=QuietRequestHandler)
+
+
+def make_server(app, host: str = '0.0.0.0', port: int = 5000, backlog: int = 128) -> GatewayWSGIServer:
+    """ساخت و bind سرور توسعه (اجرا با serve_forever، توقف با shutdown)"""
+    server = GatewayWSGIServer(host, port, app, backlog)
+    logger.info(f"Development web server (Werkzeug) listening on {host}:{server.server_address[1]}")
+    return server
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+تست AlarmEngine (hysteresis، حداقل مدت، cooldown) و AlertDispatcher
+===================================================================
+
+    python -m pytest tools/testing/alarms_test.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from alarms import AlarmEngine, AlertDispatcher  # noqa: E402
+
+HIGH = {'name': 'temperature_high', 'metric': 'temperature', 'op': '>', 'threshold': 35, 'clear': 34,
+        'cooldown': 0}
+
+
+def fire(engine, values, start=0.0, step=1.0, device_id='ESP32-00001'):
+    """ارزیابی یک سری مقدار و برگرداندن زمان alert ها"""
+    fired = []
+    for i, value in enumerate(values):
+        now = start + i * step
+        fired.extend(a['timestamp'] for a in engine.evaluate([(device_id, {'temperature': value})], now))
+    return fired
+
+
+def test_hysteresis_fires_once_until_cleared():
+    engine = AlarmEngine([HIGH])
+    # بین threshold و clear پاک نمی‌شود؛ فقط زیر 34 دوباره مسلح می‌شود
+    assert fire(engine, [36, 37, 34.5, 36, 35.5, 34, 36]) == [0.0, 6.0]
+
+
+def test_min_duration_requires_continuous_breach():
+    engine = AlarmEngine([dict(HIGH, min_duration=3)])
+    assert fire(engine, [36, 36, 30, 36, 36, 36, 36]) == [6.0]
+
+
+def test_cooldown_suppresses_refire():
+    engine = AlarmEngine([dict(HIGH, cooldown=10)])
+    # پاک شدن در ثانیه ۱، شرط دوباره در ۲ تا ۹ اما cooldown تا ۱۰
+    assert fire(engine, [36, 30] + [36] * 10) == [0.0, 10.0]
+
+
+def test_devices_are_independent():
+    engine = AlarmEngine([HIGH])
+    alerts = engine.evaluate([('a', {'temperature': 36}), ('b', {'temperature': 36}),
+                              ('a', {'temperature': 36})], now=0.0)
+    assert sorted(a['device_id'] for a in alerts) == ['a', 'b']
+
+
+def test_non_numeric_value_is_ignored():
+    engine = AlarmEngine([HIGH])
+    assert fire(engine, ['hot', None, 36]) == [2.0]
+
+
+def test_dispatcher_emits_when_store_fails():
+    emitted, buzzer = [], []
+
+    def store(alerts):
+        raise RuntimeError('database is locked')
+
+    dispatcher = AlertDispatcher(store, emitted.append, buzzer.append)
+    dispatcher._dispatch([{'device_id': 'ESP32-00001', 'message': 'Temperature alert', 'level': 'warning'}])
+
+    assert len(emitted) == 1
+    assert buzzer == [True]
+    assert dispatcher.stats()['store_failures'] == 1
+    assert dispatcher.dispatched == 1
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark تشخیص ناهنجاری جریانی
+===============================
+
+N دستگاه مجازی هر --interval ثانیه (زمان شبیه‌سازی شده) یک خوانش می‌فرستند و خوانش‌ها در دسته‌های
+هم‌اندازه batch_size مرحله analytics به anomaly.AnomalyDetector داده می‌شوند. در بین دستگاه‌ها:
+- --spikes درصد یک جهش لحظه‌ای دما دارند (+8°C، در محدوده مجاز قوانین ثابت)
+- --drifts درصد (فریزر) از یک سوم شبیه‌سازی با --drift-rate درجه در ساعت گرم می‌شوند
+
+گزارش: به‌روزرسانی در ثانیه (دسته‌ای برداری، فراخوانی تکی، حلقه Python هر پیام)،
+کشف جهش‌ها و drift ها، تأخیر کشف drift و هشدارهای اشتباه روی دستگاه‌های عادی.
+
+    python tools/testing/anomaly_benchmark.py --devices 10000 --rounds 360 --batch 500
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from anomaly import DEFAULT_MIN_STD, AnomalyDetector  # noqa: E402
+
+METRICS = ('temperature', 'humidity', 'pressure', 'battery')
+
+
+class ScalarDetector:
+    """همان EWMA، z-score و نرخ تغییر با dict و حلقه Python برای هر پیام (مبنای مقایسه)"""
+
+    def __init__(self, alpha=0.05, z_threshold=5.0, warmup=30, tau_fast=120.0, tau_slow=900.0):
+        self.alpha, self.z_threshold, self.warmup = alpha, z_threshold, warmup
+        self.tau_fast, self.tau_slow = tau_fast, tau_slow
+        self.state = {}
+
+    def evaluate(self, device_id, data, now):
+        alerts = 0
+        for metric in METRICS:
+            x = data.get(metric)
+            if x is None:
+                continue
+            key = (device_id, metric)
+            s = self.state.get(key)
+            if s is None:
+                self.state[key] = [x, 0.0, x, x, now, 1]
+                continue
+            level, var, fast, slow, last, count = s
+            std = max(math.sqrt(var), DEFAULT_MIN_STD[metric])
+            residual = x - level
+            if count >= self.warmup:
+                if abs(residual / std) > self.z_threshold:
+                    alerts += 1
+                residual = max(-self.z_threshold * std, min(self.z_threshold * std, residual))
+            clean = level + residual
+            dt = max(now - last, 0.0)
+            fast += -math.expm1(-dt / self.tau_fast) * (clean - fast)
+            slow += -math.expm1(-dt / self.tau_slow) * (clean - slow)
+            s[:] = [level + self.alpha * residual, (1 - self.alpha) * (var + self.alpha * residual ** 2),
+                    fast, slow, now, count + 1]
+        return alerts
+
+
+class Fleet:
+    def __init__(self, devices, spikes, drifts, drift_rate, rounds, seed=7):
+        rng = np.random.default_rng(seed)
+        self.ids = [f'ESP32-{i:05d}' for i in range(devices)]
+        self.base = np.column_stack([rng.uniform(2, 28, devices), rng.uniform(35, 60, devices),
+                                     rng.uniform(995, 1025, devices), rng.uniform(50, 100, devices)])
+        self.noise = np.array([0.1, 0.8, 0.3, 0.2])
+        self.rng = rng
+        order = rng.permutation(devices)
+        n_spikes, n_drifts = int(devices * spikes / 100), int(devices * drifts / 100)
+        self.spiking = {int(i): int(rng.integers(rounds // 3, rounds)) for i in order[:n_spikes]}
+        self.drifting = set(int(i) for i in order[n_spikes:n_spikes + n_drifts])
+        self.drift_start = rounds // 3
+        self.drift_rate = drift_rate
+
+    def round(self, r, interval):
+        values = self.base + self.rng.normal(0, 1, self.base.shape) * self.noise
+        values[:, 3] -= r * interval / 3600.0   # تخلیه آرام باتری (1% در ساعت)
+        if r >= self.drift_start:
+            rows = np.fromiter(self.drifting, dtype=np.int64)
+            values[rows, 0] += (r - self.drift_start) * interval / 3600.0 * self.drift_rate
+        for row, at in self.spiking.items():
+            if at == r:
+                values[row, 0] += 8.0
+        return [dict(zip(METRICS, map(float, v))) for v in values.round(2)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming anomaly detection benchmark')
+    parser.add_argument('--devices', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=360, help='readings per device')
+    parser.add_argument('--interval', type=float, default=5.0, help='simulated seconds between readings')
+    parser.add_argument('--batch', type=int, default=500, help='analytics stage batch size')
+    parser.add_argument('--spikes', type=float, default=1.0, help='%% devices with one temperature spike')
+    parser.add_argument('--drifts', type=float, default=1.0, help='%% devices slowly warming')
+    parser.add_argument('--drift-rate', type=float, default=6.0, help='°C per hour')
+    parser.add_argument('--scalar-rounds', type=int, default=3, help='rounds timed for the per-message loops')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    fleet = Fleet(args.devices, args.spikes, args.drifts, args.drift_rate, args.rounds)
+    detector = AnomalyDetector(METRICS)
+    alerts = []
+    update_seconds = 0.0
+    start = 1_700_000_000.0
+    order = list(range(args.devices))
+    for r in range(args.rounds):
+        data = fleet.round(r, args.interval)
+        random.Random(r).shuffle(order)
+        now = start + r * args.interval
+        readings = [(fleet.ids[i], data[i]) for i in order]
+        started = time.perf_counter()
+        for i in range(0, len(readings), args.batch):
+            alerts.extend(detector.evaluate(readings[i:i + args.batch], now=now))
+        update_seconds += time.perf_counter() - started
+    updates = args.devices * args.rounds
+
+    # فراخوانی تکی (مسیر هم‌زمان بدون pipeline) و حلقه Python هر پیام روی چند دور
+    single = AnomalyDetector(METRICS)
+    scalar = ScalarDetector()
+    single_seconds = scalar_seconds = 0.0
+    for r in range(args.scalar_rounds):
+        data = fleet.round(r, args.interval)
+        now = start + r * args.interval
+        started = time.perf_counter()
+        for i, device_id in enumerate(fleet.ids):
+            single.evaluate([(device_id, data[i])], now=now)
+        single_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        for i, device_id in enumerate(fleet.ids):
+            scalar.evaluate(device_id, data[i], now)
+        scalar_seconds += time.perf_counter() - started
+    scalar_updates = args.devices * args.scalar_rounds
+
+    index = {device_id: i for i, device_id in enumerate(fleet.ids)}
+    spike_alerts = {index[a['device_id']] for a in alerts if a['rule'] == 'anomaly_temperature'}
+    drift_alerts = {}
+    for a in alerts:
+        if a['rule'] == 'trend_temperature':
+            drift_alerts.setdefault(index[a['device_id']], a['timestamp'])
+    abnormal = set(fleet.spiking) | fleet.drifting
+    false_devices = {index[a['device_id']] for a in alerts} - abnormal
+    drift_start = start + fleet.drift_start * args.interval
+    delays = sorted(drift_alerts[d] - drift_start for d in drift_alerts if d in fleet.drifting)
+
+    results = {
+        'devices': args.devices,
+        'updates': updates,
+        'updates_per_s': updates / update_seconds,
+        'metric_updates_per_s': updates * len(METRICS) / update_seconds,
+        'single_call_updates_per_s': scalar_updates / single_seconds,
+        'python_loop_updates_per_s': scalar_updates / scalar_seconds,
+        'spikes_detected': len(spike_alerts & set(fleet.spiking)),
+        'spikes': len(fleet.spiking),
+        'drifts_detected': len(set(drift_alerts) & fleet.drifting),
+        'drifts': len(fleet.drifting),
+        'drift_delay_p50_min': delays[len(delays) // 2] / 60 if delays else None,
+        'false_alert_devices': len(false_devices),
+        'alerts': len(alerts),
+        'detector': detector.stats()
+    }
+
+    print(f"\n📊 Anomaly Detection Benchmark Results ({args.devices:,} devices x {args.rounds} readings, "
+          f"batch {args.batch}):")
+    print(f"Vectorized batches: {results['updates_per_s']:,.0f} readings/s "
+          f"({results['metric_updates_per_s']:,.0f} metric updates/s), state {detector.stats()['state_bytes'] / 1e6:.1f} MB")
+    print(f"Per-message: {results['single_call_updates_per_s']:,.0f} readings/s one evaluate() per reading, "
+          f"{results['python_loop_updates_per_s']:,.0f} readings/s Python loop")
+    print(f"Spikes (+8°C) detected {results['spikes_detected']}/{results['spikes']}, "
+          f"drifts ({args.drift_rate:g}°C/h) detected {results['drifts_detected']}/{results['drifts']} "
+          f"after p50 {results['drift_delay_p50_min'] or 0:.1f} min, "
+          f"false alerts on {results['false_alert_devices']} normal devices")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Load test REST API gateway
+==========================
+
+IoTGateway با N دستگاه مجازی (ingest پیوسته با FleetSimulator) روی وب سرور واقعی
+(webserver.make_server، پورت محلی) اجرا می‌شود و چند client با اتصال keep-alive درخواست می‌فرستند.
+برای هر سناریو req/s، latency p50/p99 و حجم پاسخ گزارش می‌شود:
+- legacy: پیاده‌سازی قبلی /api/devices (to_dict همه دستگاه‌ها زیر data_lock در هر درخواست)
+- full: /api/devices از snapshot و cache پاسخ
+- conditional: /api/devices با If-None-Match (الگوی poll داشبورد)
+- paged: ?limit=100&fields=... با پیمایش cursor
+- device: /api/device/<id>/data با If-None-Match
+
+    python tools/testing/api_load_test.py --devices 5000 --rate 0.1 --clients 8 --duration 5
+"""
+
+import argparse
+import http.client
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+from fleet_simulator import FakeBroker, FakeRedis, FleetSimulator, install_fake_gpio
+
+install_fake_gpio()
+import gateway_main  # noqa: E402
+from webserver import make_server  # noqa: E402
+
+PAGE_FIELDS = 'id,last_seen,type,temperature,humidity,battery'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else None
+
+
+def add_legacy_route(gateway):
+    """route قبلی برای مقایسه (قبل از اولین درخواست ثبت می‌شود)"""
+    from flask import jsonify
+
+    @gateway.app.route('/bench/legacy/devices')
+    def legacy_devices():
+        with gateway.data_lock:
+            return jsonify([d.to_dict() for d in gateway.devices.values()])
+
+
+class Client(threading.Thread):
+    """یک client با اتصال keep-alive که تا پایان سناریو درخواست می‌فرستد"""
+
+    def __init__(self, port, scenario, devices, deadline, seed):
+        super().__init__(daemon=True)
+        self.port = port
+        self.scenario = scenario
+        self.devices = devices
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.statuses = {}
+        self.bytes = 0
+        self.etags = {}
+        self.cursor = None
+
+    def next_request(self):
+        headers = {}
+        if self.scenario == 'legacy':
+            path = '/bench/legacy/devices'
+        elif self.scenario in ('full', 'conditional'):
+            path = '/api/devices'
+        elif self.scenario == 'paged':
+            query = {'limit': 100, 'fields': PAGE_FIELDS}
+            if self.cursor:
+                query['cursor'] = self.cursor
+            path = f'/api/devices?{urlencode(query)}'
+        else:
+            path = f'/api/device/{self.rng.choice(self.devices)}/data'
+        if self.scenario in ('conditional', 'device') and path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        return path, headers
+
+    def run(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        while time.monotonic() < self.deadline:
+            path, headers = self.next_request()
+            started = time.perf_counter()
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+            self.bytes += len(body)
+            if response.getheader('ETag'):
+                self.etags[path] = response.getheader('ETag')
+            if self.scenario == 'paged' and response.status == 200:
+                self.cursor = json.loads(body)['next_cursor']
+        connection.close()
+
+
+def run_scenario(port, scenario, devices, clients, duration):
+    deadline = time.monotonic() + duration
+    threads = [Client(port, scenario, devices, deadline, seed=i) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [l for t in threads for l in t.latencies]
+    statuses = {}
+    for thread in threads:
+        for status, count in thread.statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return {
+        'requests': len(latencies),
+        'requests_per_s': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'kb_per_request': sum(t.bytes for t in threads) / max(1, len(latencies)) / 1e3,
+        'statuses': statuses
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='REST API load test')
+    parser.add_argument('--devices', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=0.1, help='ingest messages/s per device during the test')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--scenarios', default='legacy,full,conditional,paged,device')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='api_load_'))
+    config = gateway_main.CONFIG
+    config['logging']['file'] = None
+    config['logging']['level'] = 'ERROR'
+    config['database']['path'] = str(workdir / 'local.db')
+    config['alarms']['rules_file'] = None
+    config['ai']['model_path'] = str(workdir / 'missing_model.tflite')
+    gateway_main.setup_logging()
+
+    broker = FakeBroker()
+    gateway = gateway_main.IoTGateway(mqtt_client_factory=broker.client_factory,
+                                      redis_client_factory=FakeRedis)
+    gateway.startup.wait()
+    add_legacy_route(gateway)
+    server = make_server(gateway.app, '127.0.0.1', 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    # یک پیام برای هر دستگاه، سپس ingest پیوسته در پس‌زمینه
+    fleet = FleetSimulator(broker, devices=args.devices, rate=args.rate, shape='full')
+    for device_id in fleet.devices:
+        broker.publish(fleet.topic(device_id), fleet.payload(device_id))
+    while len(gateway.devices) < args.devices:
+        time.sleep(0.05)
+    total = len(args.scenarios.split(',')) * args.duration + 5
+    threading.Thread(target=fleet.run, args=(total,), daemon=True).start()
+
+    results = {}
+    for scenario in args.scenarios.split(','):
+        results[scenario] = run_scenario(port, scenario, fleet.devices, args.clients, args.duration)
+    results['api'] = gateway.snapshots.stats()
+    results['cache'] = gateway.api_cache.stats()
+    results['ingest_messages'] = fleet.sent
+
+    fleet.stop()
+    server.shutdown()
+    gateway.shutdown()
+
+    print(f"\n📊 API Load Test Results ({args.devices} devices, ingest {args.devices * args.rate:.0f} msgs/s, "
+          f"{args.clients} keep-alive clients, {args.duration:.0f} s per scenario):")
+    print(f"{'scenario':<12} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'KB/req':>9}  statuses")
+    for scenario in args.scenarios.split(','):
+        r = results[scenario]
+        print(f"{scenario:<12} {r['requests_per_s']:>9.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+              f"{r['kb_per_request']:>9.1f}  {r['statuses']}")
+    print(f"Snapshot rebuilds {results['api']['rebuilds']}, devices re-serialized {results['api']['serialized_devices']}, "
+          f"response cache hit ratio {results['cache']['hit_ratio']}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
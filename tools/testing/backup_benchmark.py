@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Benchmark پشتیبان‌گیری online
+=============================
+
+یک writer با نرخ ثابت دسته‌های sensor_data را در partition های روزانه commit می‌کند
+و در همان زمان دیتابیس با روش‌های مختلف پشتیبان گرفته می‌شود:
+- cp: کپی فایل اصلی (روش قبلی؛ فایل WAL کپی نمی‌شود)
+- unheld: online backup گام به گام بدون snapshot ثابت (هر commit آن را از ابتدا شروع می‌کند)
+- held: backup.BackupManager (گام به گام روی snapshot ثابت WAL + gzip + SHA-256)
+برای هر روش: مدت، تعداد restart، p99/حداکثر latency commit writer و سازگاری نسخه پشتیبان.
+سپس پشتیبان افزایشی پس از چند ثانیه داده جدید و خروجی ستونی npz روزهای کامل.
+
+    python tools/testing/backup_benchmark.py --days 3 --devices 100 --rate 2000
+"""
+
+import argparse
+import gzip
+import json
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from threading import Event, Thread
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from backup import BackupManager, verify  # noqa: E402
+from ingest import SENSOR_COLUMNS, configure_connection, sensor_row  # noqa: E402
+from storage import DAY_SECONDS, SENSOR_SCHEMA, PartitionedTable  # noqa: E402
+
+
+def reading(rng, device, ts):
+    return sensor_row(f"ESP32-{device:04d}", {
+        'timestamp': ts,
+        'temperature': round(rng.uniform(18, 30), 2),
+        'humidity': round(rng.uniform(30, 70), 2),
+        'pressure': round(rng.uniform(990, 1030), 2),
+        'light_level': rng.randint(0, 1000),
+        'motion': rng.random() < 0.05,
+        'battery': rng.randint(20, 100)
+    })
+
+
+def populate(db, table, args, now):
+    """چند روز تاریخچه با فاصله --interval برای هر دستگاه"""
+    rng = random.Random(3)
+    table.retention_days = args.days + 1
+    batch = []
+    for ts in range(int(now - args.days * DAY_SECONDS), int(now), args.interval):
+        batch.extend(reading(rng, d, ts) for d in range(args.devices))
+        if len(batch) >= 5000:
+            with db:
+                table.insert_many(db, SENSOR_COLUMNS, batch)
+            batch = []
+    if batch:
+        with db:
+            table.insert_many(db, SENSOR_COLUMNS, batch)
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+class Writer(Thread):
+    """commit دسته‌ای با نرخ ثابت؛ latency هر commit با زمان شروع آن ثبت می‌شود"""
+
+    def __init__(self, path, table, rate, commits_per_second=20, devices=100):
+        super().__init__(daemon=True)
+        self.path = path
+        self.table = table
+        self.batch = max(1, rate // commits_per_second)
+        self.period = 1.0 / commits_per_second
+        self.devices = devices
+        self.stop_event = Event()
+        self.commits = []   # (شروع، مدت)
+
+    def run(self):
+        db = sqlite3.connect(self.path, timeout=60)
+        configure_connection(db)
+        rng = random.Random(5)
+        next_at = time.monotonic()
+        while not self.stop_event.is_set():
+            ts = int(time.time())
+            rows = [reading(rng, rng.randrange(self.devices), ts) for _ in range(self.batch)]
+            started = time.monotonic()
+            with db:
+                self.table.insert_many(db, SENSOR_COLUMNS, rows)
+            self.commits.append((started, time.monotonic() - started))
+            next_at += self.period
+            self.stop_event.wait(max(0.0, next_at - time.monotonic()))
+        db.close()
+
+    def latency(self, start, end):
+        values = sorted(d for t, d in self.commits if start <= t <= end)
+        if not values:
+            return {'commits': 0}
+        return {'commits': len(values),
+                'p50_ms': statistics.median(values) * 1000,
+                'p99_ms': values[min(len(values) - 1, int(len(values) * 0.99))] * 1000,
+                'max_ms': values[-1] * 1000}
+
+
+def consistent(path):
+    """integrity_check نسخه پشتیبان و تعداد ردیف‌ها"""
+    try:
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        ok = db.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+        rows = db.execute('SELECT count(*) FROM sensor_data').fetchone()[0]
+        db.close()
+        return ok, rows
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+
+
+def run_cp(source, work):
+    target = work / 'cp.db'
+    subprocess.run(['cp', str(source), str(target)], check=True)
+    return {'file': target, 'restarts': 0, 'finished': True}
+
+
+def run_unheld(source, work, pages, sleep, limit):
+    """online backup بدون تراکنش خواندن؛ پس از limit ثانیه رها می‌شود"""
+    target = work / 'unheld.db'
+    state = {'steps': 0, 'restarts': 0, 'remaining': None}
+    deadline = time.monotonic() + limit
+
+    def progress(status, remaining, total):
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+        state['remaining'] = remaining
+        state['steps'] += 1
+        if time.monotonic() > deadline:
+            raise TimeoutError
+
+    src = sqlite3.connect(str(source))
+    dst = sqlite3.connect(str(target))
+    finished = True
+    try:
+        src.backup(dst, pages=pages, sleep=sleep, progress=progress)
+    except TimeoutError:
+        finished = False
+    finally:
+        dst.close()
+        src.close()
+    return {'file': target, 'restarts': state['restarts'], 'steps': state['steps'], 'finished': finished}
+
+
+def run_held(manager, work):
+    manifest = manager.backup()
+    target = work / 'held.db'
+    with gzip.open(manager.backup_path / manifest['file'], 'rb') as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return {'file': target, 'restarts': 0, 'steps': manifest['steps'], 'finished': True,
+            'copy_seconds': manifest['copy_seconds'], 'compressed_mb': manifest['bytes'] / 1e6,
+            'verified': verify(str(manager.backup_path / (manifest['file'] + '.json')))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Online backup benchmark')
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--devices', type=int, default=100)
+    parser.add_argument('--interval', type=int, default=60, help='seconds between historical readings')
+    parser.add_argument('--rate', type=int, default=2000, help='rows/s written during backups')
+    parser.add_argument('--pages', type=int, default=256, help='pages per backup step')
+    parser.add_argument('--sleep', type=float, default=0.005, help='seconds between backup steps')
+    parser.add_argument('--unheld-limit', type=float, default=20.0, help='give up unheld backup after seconds')
+    parser.add_argument('--incremental-seconds', type=float, default=5.0, help='writes before incremental backup')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix='backup_bench_'))
+    source = work / 'local.db'
+    now = time.time()
+    db = sqlite3.connect(str(source))
+    configure_connection(db)
+    table = PartitionedTable('sensor_data', SENSOR_SCHEMA)
+    with db:
+        table.setup(db)
+    populate(db, table, args, now)
+    db_mb = source.stat().st_size / 1e6
+    historical = db.execute('SELECT count(*) FROM sensor_data').fetchone()[0]
+
+    manager = BackupManager(str(source), str(work / 'backups'), str(work / 'exports'), tables=[table],
+                            step_pages=args.pages, step_sleep=args.sleep)
+
+    writer = Writer(str(source), table, args.rate, devices=args.devices)
+    writer.start()
+    time.sleep(2.0)
+    idle = writer.latency(time.monotonic() - 2.0, time.monotonic())
+
+    results = {'db_mb': db_mb, 'historical_rows': historical, 'idle_writer': idle, 'methods': {}}
+    for name, run in (('cp', lambda: run_cp(source, work)),
+                      ('unheld', lambda: run_unheld(source, work, args.pages, args.sleep, args.unheld_limit)),
+                      ('held', lambda: run_held(manager, work))):
+        time.sleep(1.0)
+        started = time.monotonic()
+        result = run()
+        elapsed = time.monotonic() - started
+        result['seconds'] = elapsed
+        result['writer'] = writer.latency(started, started + elapsed)
+        if result['finished']:
+            result['integrity_ok'], result['rows'] = consistent(result.pop('file'))
+        else:
+            result.pop('file')
+        results['methods'][name] = result
+
+    # پشتیبان افزایشی پس از چند ثانیه داده جدید
+    time.sleep(args.incremental_seconds)
+    started = time.monotonic()
+    incremental = manager.backup_incremental()
+    results['incremental'] = {'seconds': time.monotonic() - started, 'rows': incremental['rows'],
+                              'compressed_kb': incremental['bytes'] / 1e3,
+                              'writer': writer.latency(started, time.monotonic())}
+    writer.stop_event.set()
+    writer.join()
+
+    started = time.monotonic()
+    export = manager.export_columnar()
+    export_bytes = sum(f['bytes'] for p in export['partitions'] for f in p['files'])
+    export_rows = sum(p['rows'] for p in export['partitions'])
+    results['export'] = {'seconds': time.monotonic() - started, 'format': export['format'],
+                         'partitions': len(export['partitions']), 'rows': export_rows,
+                         'mb': export_bytes / 1e6}
+
+    print(f"\n📊 Backup Benchmark Results ({db_mb:.1f} MB, {historical:,} rows, writer {args.rate} rows/s):")
+    print(f"Writer commit idle: p50 {idle['p50_ms']:.2f} ms, p99 {idle['p99_ms']:.2f} ms")
+    print(f"{'method':<8} {'seconds':>8} {'restarts':>9} {'finished':>9} {'p99 ms':>8} {'max ms':>8} {'integrity':>10} {'rows':>9}")
+    for name, r in results['methods'].items():
+        w = r['writer']
+        print(f"{name:<8} {r['seconds']:>8.2f} {r['restarts']:>9} {str(r['finished']):>9} "
+              f"{w.get('p99_ms', 0):>8.2f} {w.get('max_ms', 0):>8.2f} {str(r.get('integrity_ok', '-')):>10} {r.get('rows', '-'):>9}")
+    held = results['methods']['held']
+    print(f"Held backup: snapshot copy {held['copy_seconds']:.2f} s in {held['steps']} steps, "
+          f"{held['compressed_mb']:.1f} MB gzip ({db_mb / held['compressed_mb']:.1f}x), "
+          f"checksum verified: {held['verified']}")
+    inc = results['incremental']
+    print(f"Incremental: {sum(inc['rows'].values()):,} rows, {inc['compressed_kb']:.0f} KB in {inc['seconds']:.2f} s")
+    exp = results['export']
+    print(f"Columnar export ({exp['format']}): {exp['partitions']} days, {exp['rows']:,} rows, "
+          f"{exp['mb']:.1f} MB in {exp['seconds']:.2f} s")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
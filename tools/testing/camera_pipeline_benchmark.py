@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark pipeline چندپردازه‌ای دوربین‌ها
+=========================================
+
+اجرای CameraPipeline با چند منبع ویدیو (فایل یا RTSP) برای مدت مشخص:
+- frame های capture شده در ثانیه برای هر دوربین
+- تعداد استنتاج، detection های تحویل شده به gateway و frame های بازنویسی شده (torn)
+- CPU مصرفی هر پردازه
+
+بدون --source، کلیپ مصنوعی motion_gate_benchmark برای همه دوربین‌ها استفاده می‌شود
+و مدل جعلی (sleep ثابت) در پردازه‌های استنتاج اجرا می‌شود:
+    python tools/testing/camera_pipeline_benchmark.py --cameras 4 --workers 2 --seconds 20
+    python tools/testing/camera_pipeline_benchmark.py --source rtsp://cam1/stream --model detect.tflite
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from motion_gate_benchmark import synthetic_clip
+
+from camera_pipeline import CameraPipeline  # noqa: E402  (مسیر توسط inference_benchmark)
+
+
+def fake_detector(config):
+    """تابع تشخیص جعلی در پردازه استنتاج (config['factory'] = 'camera_pipeline_benchmark:fake_detector')"""
+    from inference import AIProcessor
+    from inference_benchmark import FakeInterpreter
+    invoke_ms = config.get('fake_invoke_ms', 30.0)
+    processor = AIProcessor('fake', confidence_threshold=config.get('confidence_threshold', 0.7),
+                            interpreter_factory=lambda _, n: FakeInterpreter(invoke_ms=invoke_ms))
+    return processor.detect_objects
+
+
+def process_cpu_seconds(pid):
+    """CPU مصرفی (user + system) یک پردازه از /proc"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process camera pipeline benchmark')
+    parser.add_argument('--source', action='append', help='video file / RTSP URL / device (repeat)')
+    parser.add_argument('--cameras', type=int, default=4, help='cameras when using the synthetic clip')
+    parser.add_argument('--model', help='TFLite model (default: fake interpreter)')
+    parser.add_argument('--fake-invoke-ms', type=float, default=30.0)
+    parser.add_argument('--workers', type=int, default=2, help='inference processes')
+    parser.add_argument('--resolution', default='640x360')
+    parser.add_argument('--max-fps', type=float, default=15.0)
+    parser.add_argument('--no-motion', action='store_true', help='run the model on every frame')
+    parser.add_argument('--seconds', type=float, default=15.0)
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.resolution.split('x'))
+    sources = args.source
+    if not sources:
+        path = Path(tempfile.mkdtemp(prefix='camera_clip_')) / 'synthetic.avi'
+        synthetic_clip(path, size=(width, height))
+        sources = [str(path)] * args.cameras
+    cameras = {f'cam{i + 1}': source for i, source in enumerate(sources)}
+
+    if args.model:
+        detector = {'model_path': args.model}
+    else:
+        detector = {'factory': 'camera_pipeline_benchmark:fake_detector',
+                    'fake_invoke_ms': args.fake_invoke_ms}
+    detector['motion'] = {'enabled': not args.no_motion}
+
+    received = {camera_id: 0 for camera_id in cameras}
+    latencies = []
+
+    def on_detections(camera_id, seq, timestamp, detections):
+        received[camera_id] += 1
+        latencies.append(time.time() - timestamp)
+
+    pipeline = CameraPipeline(cameras, on_detections, detector, width=width, height=height,
+                              inference_workers=args.workers, max_fps=args.max_fps)
+    print(f"{len(cameras)} camera(s) at {args.resolution}, {pipeline.inference_workers} inference "
+          f"worker(s) on cores {pipeline.cpu_cores}, {args.seconds:.0f}s")
+
+    pipeline.start()
+    time.sleep(args.seconds)
+    cpu = {p.name: process_cpu_seconds(p.pid) for p in pipeline._processes}
+    captured = {camera_id: ring.latest() for camera_id, ring in pipeline._rings.items()}
+    pipeline.stop()
+    stats = pipeline.stats()
+
+    latencies.sort()
+    results = {
+        'captured_fps': {c: n / args.seconds for c, n in captured.items()},
+        'delivered': stats['delivered'],
+        'received': received,
+        'torn_frames': stats['torn_frames'],
+        'latency_p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+        'latency_p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+                          if latencies else None,
+        'process_cpu_seconds': cpu,
+        'cameras': stats['cameras']
+    }
+
+    print(f"\n📊 Camera Pipeline Results:")
+    print(f"{'camera':<8} {'capture fps':>12} {'inferences':>11} {'skip':>7} {'delivered':>10}")
+    for camera_id in cameras:
+        camera = stats['cameras'].get(camera_id, {})
+        print(f"{camera_id:<8} {results['captured_fps'][camera_id]:>12.1f} "
+              f"{camera.get('inferences', 0):>11} {camera.get('skip_fraction', 0):>7.1%} "
+              f"{received[camera_id]:>10}")
+    print(f"\nTorn frames: {results['torn_frames']}")
+    if latencies:
+        print(f"Capture → gateway latency p50 {results['latency_p50_ms']:.1f} ms, "
+              f"p99 {results['latency_p99_ms']:.1f} ms")
+    for name, seconds in cpu.items():
+        if seconds is not None:
+            print(f"{name:<16} CPU {seconds:.2f}s ({seconds / args.seconds:.0%})")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
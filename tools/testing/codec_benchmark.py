@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark decode و مسیریابی payload های MQTT در gateway
+=======================================================
+
+هزینه decode + route + ساخت data_json برای هر پیام با هر codec موجود (JSON، CBOR، MessagePack)
+در مقایسه با مسیر قبلی (تست substring + split + json.loads + json.dumps کل payload).
+data_json مسیر جدید همان ingest.extra_json است که در ذخیره‌سازی اجرا می‌شود (فقط فیلدهای بدون ستون).
+
+اجرا:
+    python tools/testing/codec_benchmark.py --messages 200000 --devices 500
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from codec import CODECS, TopicRouter, decode_reading, select_codec  # noqa: E402
+from ingest import extra_json  # noqa: E402
+
+
+class CodecBenchmark:
+    def __init__(self, num_messages=200000, num_devices=500):
+        self.num_messages = num_messages
+        self.num_devices = num_devices
+
+        self.router = TopicRouter()
+        self.router.add('devices/+/data', 'sensor_data')
+        self.router.add('devices/+/data/+', 'sensor_data')
+        self.router.add('gateway/commands', 'gateway_command')
+
+    def make_payload(self, i):
+        return {
+            'timestamp': 1700000000 + i,
+            'temperature': round(random.uniform(18, 30), 2),
+            'humidity': round(random.uniform(30, 70), 2),
+            'pressure': round(random.uniform(990, 1030), 2),
+            'light_level': random.randint(0, 1000),
+            'motion': random.random() < 0.05,
+            'battery': random.randint(20, 100),
+            'rssi': -random.randint(40, 90)
+        }
+
+    def make_messages(self, codec_name, suffix):
+        codec = CODECS[codec_name]
+        messages = []
+        for i in range(self.num_messages):
+            device_id = f"ESP32-{i % self.num_devices:04d}"
+            topic = f"devices/{device_id}/data" + (f"/{codec_name}" if suffix else '')
+            messages.append((topic, codec.encode(self.make_payload(i))))
+        return messages
+
+    def run_legacy(self, messages):
+        """مسیر قبلی on_mqtt_message + save_sensor_data"""
+        start = time.perf_counter()
+        for topic, payload in messages:
+            data = json.loads(payload.decode())
+            if 'devices/' in topic and '/data' in topic:
+                device_id = topic.split('/')[1]
+                json.dumps(data)
+        return time.perf_counter() - start
+
+    def run_codec(self, messages):
+        """مسیر جدید: router کامپایل شده + انتخاب codec + decode-once + data_json فیلدهای اضافه"""
+        start = time.perf_counter()
+        for topic, payload in messages:
+            name, params = self.router.match(topic)
+            codec = select_codec(payload, None, params[1] if len(params) > 1 else None)
+            reading = decode_reading(params[0], codec, payload, 0.0)
+            extra_json(reading.data)
+        return time.perf_counter() - start
+
+    def report(self, label, elapsed, size):
+        per_msg = elapsed / self.num_messages * 1e6
+        rate = self.num_messages / elapsed
+        print(f"{label:<28} {per_msg:7.2f} µs/msg  {rate:>10,.0f} msg/s  {size:>4} B/msg")
+
+    def run_test(self):
+        print(f"Decoding {self.num_messages} messages from {self.num_devices} devices...")
+        print(f"Available codecs: {', '.join(CODECS)}\n")
+        print(f"📊 Decode + Route Benchmark Results:")
+
+        messages = self.make_messages('json', suffix=False)
+        size = sum(len(p) for _, p in messages) // len(messages)
+        self.report('legacy json', self.run_legacy(messages), size)
+
+        for codec_name in CODECS:
+            for suffix in (False, True):
+                messages = self.make_messages(codec_name, suffix)
+                size = sum(len(p) for _, p in messages) // len(messages)
+                label = f"{codec_name} ({'topic suffix' if suffix else 'sniffed'})"
+                self.report(label, self.run_codec(messages), size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Payload codec benchmark')
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--devices', type=int, default=500)
+    args = parser.parse_args()
+
+    CodecBenchmark(args.messages, args.devices).run_test()
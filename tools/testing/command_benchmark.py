@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark ارسال گروهی دستور
+===========================
+
+IoTGateway با broker درون‌پردازه‌ای (fleet_simulator) اجرا می‌شود و N دستگاه مجازی
+به devices/<id>/commands گوش می‌دهند و با تأخیر تصادفی روی devices/<id>/ack پاسخ می‌دهند:
+- --lossy درصد دستگاه‌ها اولین پیام را گم می‌کنند (نیاز به retry)
+- --dead درصد دستگاه‌ها هرگز پاسخ نمی‌دهند (باید timeout گزارش شوند)
+
+مقایسه:
+- روش قبلی: یک POST /api/device/<id>/command برای هر دستگاه (بدون retry)
+- POST /api/commands با لیست دستگاه‌ها و انتظار برای نتیجه تجمیعی
+
+    python tools/testing/command_benchmark.py --devices 2000 --rate 500 --lossy 5 --dead 1
+"""
+
+import argparse
+import heapq
+import json
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from fleet_simulator import FakeBroker, FakeRedis, install_fake_gpio
+
+install_fake_gpio()
+import gateway_main  # noqa: E402
+
+
+class DeviceFleet:
+    """دستگاه‌های مجازی که دستور را با تأخیر تصادفی تایید می‌کنند"""
+
+    def __init__(self, broker, devices, lossy, dead, latency, seed=3):
+        self.client = broker.client_factory()
+        self.client.on_message = self.on_message
+        self.client.connect('fleet')
+        self.client.subscribe('devices/+/commands')
+        rng = random.Random(seed)
+        self.rng = rng
+        self.latency = latency
+        self.dead = set(rng.sample(devices, int(len(devices) * dead / 100)))
+        alive = [d for d in devices if d not in self.dead]
+        self.lossy = set(rng.sample(alive, int(len(devices) * lossy / 100)))
+        self.seen = set()
+        self.applied = set()
+        self.received = []   # زمان دریافت هر دستور
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def on_message(self, client, userdata, message):
+        device_id = message.topic.split('/')[1]
+        payload = json.loads(message.payload)
+        self.received.append(time.monotonic())
+        if device_id in self.dead:
+            return
+        with self._lock:
+            first = device_id not in self.seen
+            self.seen.add(device_id)
+            if first and device_id in self.lossy:
+                return
+            self.applied.add(device_id)
+            if 'correlation_id' in payload:
+                due = time.monotonic() + self.rng.uniform(*self.latency)
+                heapq.heappush(self._pending, (due, device_id, payload['correlation_id']))
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                now = time.monotonic()
+                due = []
+                while self._pending and self._pending[0][0] <= now:
+                    due.append(heapq.heappop(self._pending))
+                wait = self._pending[0][0] - now if self._pending else 0.5
+            for _, device_id, correlation_id in due:
+                self.client.publish(f'devices/{device_id}/ack',
+                                    json.dumps({'correlation_id': correlation_id, 'status': 'ok'}), qos=1)
+            self._wake.wait(max(0.0, wait))
+            self._wake.clear()
+
+    def reset(self):
+        with self._lock:
+            self.seen.clear()
+            self.applied.clear()
+            self.received.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def peak_rate(times, window=1.0):
+    times = sorted(times)
+    best, start = 0, 0
+    for end, t in enumerate(times):
+        while times[start] < t - window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best / window
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk command dispatch benchmark')
+    parser.add_argument('--devices', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=500.0, help='dispatcher publish rate limit (msgs/s)')
+    parser.add_argument('--lossy', type=float, default=5.0, help='%% devices losing the first command')
+    parser.add_argument('--dead', type=float, default=1.0, help='%% devices never answering')
+    parser.add_argument('--timeout', type=float, default=2.0, help='ack timeout per attempt')
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='command_bench_'))
+    config = gateway_main.CONFIG
+    config['logging']['file'] = None
+    config['logging']['level'] = 'ERROR'
+    config['database']['path'] = str(workdir / 'local.db')
+    config['alarms']['rules_file'] = None
+    config['ai']['model_path'] = str(workdir / 'missing_model.tflite')
+    config['commands'].update(rate_limit=args.rate, burst=int(args.rate // 10) or 1,
+                              timeout=args.timeout, retries=args.retries)
+    gateway_main.setup_logging()
+
+    broker = FakeBroker()
+    gateway = gateway_main.IoTGateway(mqtt_client_factory=broker.client_factory,
+                                      redis_client_factory=FakeRedis)
+    gateway.startup.wait()
+    client = gateway.app.test_client()
+
+    devices = [f'ESP32-{i:04d}' for i in range(args.devices)]
+    fleet = DeviceFleet(broker, devices, args.lossy, args.dead, latency=(0.005, 0.2))
+    command = {'command': 'set_interval', 'interval': 30}
+
+    # روش قبلی: یک درخواست HTTP برای هر دستگاه؛ بدون retry (مثل publish بدون تایید)
+    gateway.commands.retries = 0
+    started = time.perf_counter()
+    for device_id in devices:
+        client.post(f'/api/device/{device_id}/command', json=command)
+    legacy_seconds = time.perf_counter() - started
+    while gateway.commands.stats()['inflight']:
+        time.sleep(0.1)
+    legacy_applied = len(fleet.applied)
+    gateway.commands.retries = args.retries
+    fleet.reset()
+
+    started = time.perf_counter()
+    response = client.post('/api/commands', json={
+        'command': command, 'devices': devices, 'wait': 60,
+        'timeout': args.timeout, 'retries': args.retries})
+    bulk_seconds = time.perf_counter() - started
+    summary = response.get_json()
+
+    results_by_device = summary['results']
+    latencies = sorted(r['latency'] for r in results_by_device.values() if 'latency' in r)
+    timeouts = {d for d, r in results_by_device.items() if r['status'] == 'timeout'}
+    retried_ok = sum(1 for r in results_by_device.values() if r['status'] == 'ok' and r['attempts'] > 1)
+
+    results = {
+        'devices': args.devices,
+        'legacy_http_calls': args.devices,
+        'legacy_seconds': legacy_seconds,
+        'legacy_applied': legacy_applied,
+        'legacy_missed': args.devices - legacy_applied,
+        'bulk_http_calls': 1,
+        'bulk_status': response.status_code,
+        'bulk_seconds': bulk_seconds,
+        'counts': summary['counts'],
+        'applied': len(fleet.applied),
+        'retried_ok': retried_ok,
+        'timeouts_are_dead_devices': timeouts == fleet.dead,
+        'ack_latency_p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+        'ack_latency_p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+        'peak_publish_rate': peak_rate(fleet.received),
+        'rate_limit': args.rate,
+        'dispatcher': gateway.commands.stats()
+    }
+
+    fleet.stop()
+    gateway.shutdown()
+
+    print(f"\n📊 Command Dispatch Benchmark Results ({args.devices} devices, "
+          f"{args.lossy:.0f}% lossy, {args.dead:.0f}% dead):")
+    print(f"Per-device POST: {args.devices} HTTP calls in {legacy_seconds:.2f} s, "
+          f"{legacy_applied} applied, {args.devices - legacy_applied} missed without retry")
+    print(f"Bulk POST: 1 HTTP call, {bulk_seconds:.2f} s to final results {summary['counts']} "
+          f"({len(fleet.applied)} applied, {retried_ok} after retry)")
+    print(f"Timeouts match dead devices: {results['timeouts_are_dead_devices']}, "
+          f"ack latency p50 {results['ack_latency_p50_ms']:.0f} ms, p99 {results['ack_latency_p99_ms']:.0f} ms")
+    print(f"Peak publish rate {results['peak_publish_rate']:.0f}/s (limit {args.rate:.0f}/s)")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+تست شمارنده‌های O(1) در DeviceIndex در برابر شمارش کامل
+=======================================================
+
+    python -m pytest tools/testing/device_state_test.py
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from device_state import DeviceIndex, DeviceState  # noqa: E402
+
+TYPES = ('ESP32', 'ESP8266', 'camera')
+
+
+def recount(devices, online):
+    """آمار مورد انتظار با پیمایش همه دستگاه‌ها"""
+    types = {}
+    for device in devices.values():
+        entry = types.setdefault(device.device_type, {'total': 0, 'online': 0})
+        entry['total'] += 1
+        entry['online'] += device.id in online
+    return {
+        'total_devices': len(devices),
+        'online_devices': len(online),
+        'offline_devices': len(devices) - len(online),
+        'total_sensors': sum(len(d.sensors) for d in devices.values()),
+        'device_types': types,
+        'ring_bytes': sum(d.ring.nbytes for d in devices.values())
+    }
+
+
+def index_stats(index):
+    stats = index.stats()
+    stats['ring_bytes'] = stats.pop('memory')['ring_bytes']
+    return stats
+
+
+def message(devices, index, online, device_id, device_type, sensors):
+    device = devices.get(device_id)
+    if device is None:
+        device = devices[device_id] = DeviceState(device_id, 0.0, 4)
+    device.update(dict({s: 1 for s in sensors}, type=device_type), 0.0)
+    came_online = index.touch(device)
+    assert came_online == (device_id not in online)
+    online.add(device_id)
+
+
+def test_add_offline_remove():
+    index, devices, online = DeviceIndex(), {}, set()
+    message(devices, index, online, 'a', 'ESP32', ['temperature', 'humidity'])
+    message(devices, index, online, 'b', 'camera', ['motion'])
+    assert index_stats(index) == recount(devices, online)
+
+    assert index.set_offline('a')
+    assert not index.set_offline('a')
+    online.discard('a')
+    assert index_stats(index) == recount(devices, online)
+
+    index.remove('a')
+    index.remove('a')
+    del devices['a']
+    assert index_stats(index) == recount(devices, online)
+
+
+def test_retype_moves_online_counts():
+    index, devices, online = DeviceIndex(), {}, set()
+    message(devices, index, online, 'a', 'unknown', ['temperature'])
+    message(devices, index, online, 'a', 'ESP32', ['temperature', 'pressure'])
+    assert index_stats(index) == recount(devices, online)
+    assert index.online_type_counts['unknown'] == 0
+
+
+def test_random_churn_with_rebalance():
+    rng = random.Random(7)
+    index, devices, online = DeviceIndex(), {}, set()
+
+    for step in range(5000):
+        device_id = f'ESP32-{rng.randrange(200):05d}'
+        action = rng.random()
+        if action < 0.7:
+            sensors = rng.sample(['temperature', 'humidity', 'pressure', 'light_level', 'motion'],
+                                 rng.randint(0, 5))
+            message(devices, index, online, device_id, rng.choice(TYPES), sensors)
+        elif action < 0.9:
+            assert index.set_offline(device_id) == (device_id in online)
+            online.discard(device_id)
+        else:
+            # rebalance شارد: دستگاه به worker دیگر می‌رود و ممکن است بعداً برگردد
+            index.remove(device_id)
+            devices.pop(device_id, None)
+            online.discard(device_id)
+
+        if step % 250 == 0:
+            assert index_stats(index) == recount(devices, online)
+
+    assert index_stats(index) == recount(devices, online)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+شبیه‌ساز ناوگان ESP32 و fake های درون‌پردازه‌ای gateway
+=======================================================
+
+برای اجرای IoTGateway بدون سخت‌افزار:
+- FakeGPIO به جای RPi.GPIO
+- FakeBroker / FakeMQTTClient به جای paho و broker واقعی (با shared subscription و پیام retained)
+- FakeRedis با زیرمجموعه دستورات مورد استفاده RedisMirror
+- FleetSimulator: N دستگاه مجازی با نرخ و شکل payload قابل تنظیم
+
+استفاده در benchmark ها:
+    from fleet_simulator import install_fake_gpio, FakeBroker, FleetSimulator
+"""
+
+import random
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from codec import CODECS, TopicRouter  # noqa: E402
+
+
+def install_fake_gpio():
+    """ثبت ماژول RPi.GPIO جعلی در sys.modules (قبل از import gateway_main)"""
+    gpio = types.ModuleType('RPi.GPIO')
+    gpio.BCM = 'BCM'
+    gpio.OUT = 'OUT'
+    gpio.IN = 'IN'
+    gpio.HIGH = 1
+    gpio.LOW = 0
+    gpio.PUD_UP = 'PUD_UP'
+    gpio.state = {}
+
+    gpio.setmode = lambda mode: None
+    gpio.setup = lambda pin, mode, pull_up_down=None: gpio.state.setdefault(pin, gpio.HIGH)
+    gpio.output = lambda pin, value: gpio.state.__setitem__(pin, value)
+    gpio.input = lambda pin: gpio.state.get(pin, gpio.HIGH)
+    gpio.cleanup = lambda: gpio.state.clear()
+
+    package = types.ModuleType('RPi')
+    package.GPIO = gpio
+    sys.modules['RPi'] = package
+    sys.modules['RPi.GPIO'] = gpio
+    return gpio
+
+
+class FakeMessage:
+    __slots__ = ('topic', 'payload', 'qos', 'retain', 'properties')
+
+    def __init__(self, topic, payload, qos=0, retain=False, properties=None):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.properties = properties
+
+
+class FakeBroker:
+    """broker درون‌پردازه‌ای: تحویل هم‌زمان پیام در thread ناشر (مثل thread شبکه paho)"""
+
+    def __init__(self, connect_delay=0.0):
+        self._clients = []
+        self._lock = threading.Lock()
+        self.published = 0
+        self.connect_delay = connect_delay   # شبیه‌سازی تأخیر اتصال شبکه
+        self.retained = {}
+        # $share/<group>/<filter>: هر پیام به یکی از اعضای گروه (round-robin مثل Mosquitto)
+        self._shared = {}
+
+    def client_factory(self):
+        """سازگار با mqtt_client_factory در IoTGateway"""
+        return FakeMQTTClient(self)
+
+    def attach(self, client):
+        with self._lock:
+            self._clients.append(client)
+
+    def detach(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+            for members in self._shared.values():
+                if client in members['clients']:
+                    members['clients'].remove(client)
+
+    def share(self, group, topic_filter, client):
+        with self._lock:
+            members = self._shared.setdefault((group, topic_filter), {
+                'router': TopicRouter(), 'clients': [], 'next': 0})
+            members['router'].add(topic_filter, topic_filter)
+            if client not in members['clients']:
+                members['clients'].append(client)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published += 1
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if retain:
+            if payload:
+                self.retained[topic] = FakeMessage(topic, payload, qos, True)
+            else:
+                self.retained.pop(topic, None)
+        message = FakeMessage(topic, payload, qos, False)
+        for client in list(self._clients):
+            if client.matches(topic):
+                client.deliver(message)
+        for members in list(self._shared.values()):
+            with self._lock:
+                clients = members['clients']
+                if not clients or members['router'].match(topic) is None:
+                    continue
+                client = clients[members['next'] % len(clients)]
+                members['next'] += 1
+            client.deliver(message)
+
+
+class FakeMessageInfo:
+    """نتیجه publish مثل paho.mqtt.client.MQTTMessageInfo (تحویل هم‌زمان است)"""
+
+    rc = 0
+
+    def __init__(self, mid):
+        self.mid = mid
+
+    def is_published(self):
+        return True
+
+    def wait_for_publish(self, timeout=None):
+        pass
+
+
+class FakeMQTTClient:
+    """زیرمجموعه API کلاس paho.mqtt.client.Client"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.router = TopicRouter()
+        self.on_connect = None
+        self.on_message = None
+        self.on_disconnect = None
+        self.connected = False
+        self.published = []
+
+    def connect(self, host, port=1883, keepalive=60):
+        time.sleep(self.broker.connect_delay)
+        self.broker.attach(self)
+        self.connected = True
+
+    def loop_start(self):
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.broker.detach(self)
+        self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect(self, None, 0)
+
+    def subscribe(self, topic, qos=0):
+        if topic.startswith('$share/'):
+            _, group, topic_filter = topic.split('/', 2)
+            self.broker.share(group, topic_filter, self)
+            return 0, 1
+        self.router.add(topic, topic)
+        for message in list(self.broker.retained.values()):
+            if self.matches(message.topic):
+                self.deliver(message)
+        return 0, 1
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published.append(topic)
+        self.broker.publish(topic, payload, qos, retain)
+        return FakeMessageInfo(len(self.published))
+
+    def matches(self, topic):
+        return self.router.match(topic) is not None
+
+    def deliver(self, message):
+        if self.on_message:
+            self.on_message(self, None, message)
+
+
+class FakeRedis:
+    """Redis درون‌پردازه‌ای برای RedisMirror"""
+
+    def __init__(self, ping_delay=0.0):
+        self.hashes = {}
+        self.expiry = {}
+        self.commands = 0
+        self.ping_delay = ping_delay
+        self._lock = threading.Lock()
+
+    def ping(self):
+        time.sleep(self.ping_delay)
+        return True
+
+    def hset(self, key, mapping=None, **kwargs):
+        with self._lock:
+            self.commands += 1
+            self.hashes.setdefault(key, {}).update(mapping or {})
+        return len(mapping or {})
+
+    def expire(self, key, ttl):
+        with self._lock:
+            self.commands += 1
+            self.expiry[key] = ttl
+        return True
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def flushdb(self):
+        with self._lock:
+            self.hashes.clear()
+            self.expiry.clear()
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+
+class FakeRedisPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def hset(self, key, mapping=None):
+        if not mapping:
+            # مثل redis-py: خطا هنگام اضافه کردن دستور به pipeline، نه در execute
+            from redis import DataError
+            raise DataError("'hset' with no key value pairs")
+        self.calls.append((self.redis.hset, (key, mapping)))
+        return self
+
+    def expire(self, key, ttl):
+        self.calls.append((self.redis.expire, (key, ttl)))
+        return self
+
+    def execute(self, raise_on_error=True):
+        results = [fn(*args) for fn, args in self.calls]
+        self.calls = []
+        return results
+
+
+PAYLOAD_SHAPES = ('minimal', 'standard', 'full')
+
+
+class FleetSimulator:
+    """N دستگاه ESP32 مجازی که با نرخ مشخص روی broker منتشر می‌کنند"""
+
+    def __init__(self, broker, devices=100, rate=1.0, shape='standard', codec='json',
+                 topic_suffix=False, device_prefix='ESP32'):
+        if shape not in PAYLOAD_SHAPES:
+            raise ValueError(f"Unknown payload shape {shape!r}")
+        self.broker = broker
+        self.devices = [f"{device_prefix}-{i:05d}" for i in range(devices)]
+        self.rate = rate
+        self.shape = shape
+        self.codec = CODECS[codec]
+        self.topic_suffix = topic_suffix
+        self.sent = 0
+        self._seq = 0
+        self._stop_event = threading.Event()
+
+    def topic(self, device_id):
+        suffix = f"/{self.codec.name}" if self.topic_suffix else ''
+        return f"devices/{device_id}/data{suffix}"
+
+    def payload(self, device_id):
+        """ساخت payload با شکل انتخاب شده؛ sent_at برای اندازه‌گیری latency"""
+        self._seq += 1
+        data = {
+            'timestamp': int(time.time()),
+            'temperature': round(random.uniform(18, 30), 1),
+            'humidity': round(random.uniform(30, 70), 1),
+            'sent_at': time.perf_counter()
+        }
+        if self.shape in ('standard', 'full'):
+            data.update({
+                'pressure': round(random.uniform(990, 1030), 1),
+                'light_level': random.randint(0, 1000),
+                'motion': random.random() < 0.02,
+                'battery': random.randint(20, 100)
+            })
+        if self.shape == 'full':
+            data.update({
+                'rssi': -random.randint(40, 90),
+                'firmware': '1.4.2',
+                'uptime': self._seq,
+                'sensors': ['temperature', 'humidity', 'pressure', 'light_level', 'motion'],
+                'diagnostics': {'heap_free': random.randint(100000, 200000), 'resets': 0}
+            })
+        return self.codec.encode(data)
+
+    def run(self, duration):
+        """انتشار با نرخ کل devices × rate به مدت duration ثانیه"""
+        interval = 1.0 / (len(self.devices) * self.rate)
+        start = time.perf_counter()
+        next_send = start
+        index = 0
+
+        while not self._stop_event.is_set():
+            now = time.perf_counter()
+            if now - start >= duration:
+                break
+            if now < next_send:
+                time.sleep(min(next_send - now, 0.01))
+                continue
+
+            # جبران عقب‌افتادگی با ارسال پشت سر هم
+            while next_send <= now:
+                device_id = self.devices[index]
+                self.broker.publish(self.topic(device_id), self.payload(device_id))
+                self.sent += 1
+                index = (index + 1) % len(self.devices)
+                next_send += interval
+
+        return time.perf_counter() - start
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark سرتاسری gateway با ناوگان مصنوعی
+==========================================
+
+IoTGateway با GPIO، broker و Redis درون‌پردازه‌ای و مسیرهای موقت اجرا می‌شود،
+N دستگاه مجازی پیام منتشر می‌کنند و این موارد گزارش می‌شود:
+- msgs/s پردازش شده و ردیف‌های نوشته شده در SQLite
+- latency از انتشار تا emit در Socket.IO (p50/p99)
+- مصرف CPU و RSS
+
+نتیجه به صورت JSON ذخیره می‌شود تا نسخه‌ها با هم مقایسه شوند:
+    python tools/testing/gateway_benchmark.py --devices 500 --rate 2 --duration 20 \\
+        --output reports/gateway_bench.json --compare reports/gateway_bench_prev.json
+"""
+
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fleet_simulator import (PAYLOAD_SHAPES, FakeBroker, FakeRedis,
+                             FleetSimulator, install_fake_gpio)
+
+install_fake_gpio()
+import gateway_main  # noqa: E402
+
+
+def rss_megabytes():
+    """RSS فعلی پردازه از /proc (یا بیشینه RSS در سیستم‌های دیگر)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LatencyProbe:
+    """client جعلی Socket.IO که latency انتشار تا emit را از فیلد sent_at اندازه می‌گیرد"""
+
+    def __init__(self):
+        self.latencies = []
+        self.frames = 0
+
+    def emit(self, event, payload, sid):
+        now = time.perf_counter()
+        self.frames += 1
+        for fields in payload.values():
+            sent_at = fields.get('sent_at')
+            if sent_at is not None:
+                self.latencies.append(now - sent_at)
+
+
+class GatewayBenchmark:
+    def __init__(self, args):
+        self.args = args
+        self.workdir = Path(tempfile.mkdtemp(prefix='gateway_bench_'))
+
+    def configure(self):
+        """مسیرهای موقت و تنظیمات مخصوص benchmark"""
+        config = gateway_main.CONFIG
+        config['logging']['file'] = None
+        config['logging']['level'] = 'ERROR'
+        config['database']['path'] = str(self.workdir / 'local.db')
+        config['alarms']['rules_file'] = None
+        config['ai']['model_path'] = str(self.workdir / 'missing_model.tflite')
+        config['fanout']['tick'] = self.args.fanout_tick
+        config['fanout']['max_rate'] = 1000.0
+        config['pipeline']['enabled'] = not self.args.no_pipeline
+        config['pipeline']['overflow'] = self.args.overflow
+        gateway_main.setup_logging()
+
+    def run(self):
+        self.configure()
+        broker = FakeBroker()
+        redis = FakeRedis()
+        probe = LatencyProbe()
+
+        gateway = gateway_main.IoTGateway(mqtt_client_factory=broker.client_factory,
+                                          redis_client_factory=lambda: redis)
+        gateway.startup.wait()
+        gateway.fanout.emit = probe.emit
+        gateway.fanout.add_client('benchmark')
+        gateway.fanout.subscribe('benchmark', ['*'], max_rate=1000.0)
+
+        fleet = FleetSimulator(broker, devices=self.args.devices, rate=self.args.rate,
+                               shape=self.args.shape, codec=self.args.codec,
+                               topic_suffix=self.args.codec != 'json')
+
+        print(f"Running {self.args.devices} devices x {self.args.rate} Hz "
+              f"({self.args.shape}, {self.args.codec}) for {self.args.duration}s...")
+
+        rss_start = rss_megabytes()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        publish_seconds = fleet.run(self.args.duration)
+        gateway.shutdown()   # تخلیه کامل pipeline، Redis، alert ها و writer
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        ingest = gateway.ingest.stats()
+        latencies = probe.latencies
+
+        return {
+            'sent': fleet.sent,
+            'offered_rate': fleet.sent / publish_seconds,
+            'processed_rate': ingest['written_rows'] / wall,
+            'written_rows': ingest['written_rows'],
+            'dropped': fleet.sent - ingest['written_rows'],
+            'drain_seconds': wall - publish_seconds,
+            'latency_p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+            'latency_p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+            'latency_mean_ms': statistics.mean(latencies) * 1000 if latencies else None,
+            'latency_samples': len(latencies),
+            'cpu_seconds': cpu,
+            'cpu_cores_used': cpu / wall,
+            'rss_start_mb': rss_start,
+            'rss_end_mb': rss_megabytes(),
+            'redis_commands': redis.commands,
+            'socketio_frames': probe.frames
+        }
+
+    def metadata(self):
+        try:
+            revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                      capture_output=True, text=True).stdout.strip()
+        except OSError:
+            revision = None
+        return {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': revision,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'parameters': {k: v for k, v in vars(self.args).items()
+                           if k not in ('output', 'compare')}
+        }
+
+
+def print_results(results, baseline=None):
+    print(f"\n📊 Gateway Benchmark Results:")
+    for key, value in results.items():
+        line = f"{key:<18} {value:>12.2f}" if isinstance(value, float) else f"{key:<18} {value!s:>12}"
+        if baseline and isinstance(value, (int, float)) and baseline.get(key):
+            change = (value - baseline[key]) / baseline[key] * 100
+            line += f"   ({change:+.1f}% vs baseline)"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='End-to-end gateway benchmark')
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=1.0, help='messages/s per device')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--shape', choices=PAYLOAD_SHAPES, default='standard')
+    parser.add_argument('--codec', default='json')
+    parser.add_argument('--overflow', default='block', choices=['drop_newest', 'drop_oldest', 'block'])
+    parser.add_argument('--fanout-tick', type=float, default=0.01)
+    parser.add_argument('--no-pipeline', action='store_true', help='synchronous ingest path')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    args = parser.parse_args()
+
+    benchmark = GatewayBenchmark(args)
+    results = benchmark.run()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'meta': benchmark.metadata(), 'results': results}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
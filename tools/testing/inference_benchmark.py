@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark استنتاج AIProcessor
+=============================
+
+مقایسه پیاده‌سازی قبلی (تخصیص حافظه در هر frame، یک interpreter، حلقه پایتونی روی score ها)
+با AIProcessor جدید (tensor درجا، pool از interpreter ها، فیلتر برداری):
+- frames/s کل و latency هر frame (p50/p99)
+- چند دوربین هم‌زمان در thread های جداگانه
+
+با مدل واقعی:
+    python tools/testing/inference_benchmark.py --model detect.tflite --cameras 4 --pool-size 2
+بدون مدل، interpreter جعلی با زمان invoke ثابت فقط هزینه پیش/پس‌پردازش را می‌سنجد:
+    python tools/testing/inference_benchmark.py --fake-invoke-ms 20 --quantized
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from inference import AIProcessor, load_interpreter  # noqa: E402
+
+
+class FakeInterpreter:
+    """زیرمجموعه API کلاس tflite Interpreter با خروجی SSD (boxes, classes, scores, count)"""
+
+    def __init__(self, input_size=300, quantized=False, detections=10, invoke_ms=20.0, num_threads=1):
+        dtype = np.uint8 if quantized else np.float32
+        self._tensors = {
+            0: np.zeros((1, input_size, input_size, 3), dtype),
+            1: np.zeros((1, detections, 4), np.float32),
+            2: np.zeros((1, detections), np.float32),
+            3: np.zeros((1, detections), np.float32),
+            4: np.zeros((1,), np.float32)
+        }
+        self._input = {'index': 0, 'shape': np.array(self._tensors[0].shape), 'dtype': dtype,
+                       'quantization': (1 / 255, 0) if quantized else (0.0, 0)}
+        self._outputs = [{'index': i, 'shape': np.array(self._tensors[i].shape), 'dtype': np.float32,
+                          'quantization': (0.0, 0)} for i in (1, 2, 3, 4)]
+        self.invoke_seconds = invoke_ms / 1000
+        self._rng = np.random.default_rng(0)
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [self._input]
+
+    def get_output_details(self):
+        return self._outputs
+
+    def tensor(self, index):
+        return lambda: self._tensors[index]
+
+    def set_tensor(self, index, value):
+        np.copyto(self._tensors[index], value)
+
+    def get_tensor(self, index):
+        return self._tensors[index].copy()
+
+    def invoke(self):
+        # sleep مثل invoke واقعی GIL را آزاد می‌کند
+        time.sleep(self.invoke_seconds)
+        self._tensors[1][:] = self._rng.random(self._tensors[1].shape)
+        self._tensors[2][:] = self._rng.integers(0, 90, self._tensors[2].shape)
+        self._tensors[3][:] = self._rng.random(self._tensors[3].shape)
+
+
+class LegacyAIProcessor:
+    """پیاده‌سازی قبلی gateway_main.AIProcessor برای مقایسه"""
+
+    def __init__(self, interpreter, threshold=0.7):
+        import cv2
+        self.cv2 = cv2
+        self.interpreter = interpreter
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.threshold = threshold
+        self._lock = threading.Lock()   # یک interpreter برای همه دوربین‌ها
+
+    def detect_objects(self, frame):
+        input_data = self.preprocess_frame(frame)
+        with self._lock:
+            self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
+            self.interpreter.invoke()
+            boxes = self.interpreter.get_tensor(self.output_details[0]['index'])
+            classes = self.interpreter.get_tensor(self.output_details[1]['index'])
+            scores = self.interpreter.get_tensor(self.output_details[2]['index'])
+
+        detections = []
+        for i in range(len(scores[0])):
+            if scores[0][i] > self.threshold:
+                detections.append({
+                    'class': int(classes[0][i]),
+                    'confidence': float(scores[0][i]),
+                    'bbox': boxes[0][i].tolist()
+                })
+        return detections
+
+    def preprocess_frame(self, frame):
+        input_shape = self.input_details[0]['shape']
+        resized = self.cv2.resize(frame, (input_shape[2], input_shape[1]))
+        normalized = resized.astype(np.float32) / 255.0
+        input_data = np.expand_dims(normalized, axis=0)
+        # مدل quantized در نسخه قبلی پشتیبانی نمی‌شد؛ برای مقایسه منصفانه تبدیل می‌شود
+        return input_data.astype(self.input_details[0]['dtype']) if \
+            self.input_details[0]['dtype'] != np.float32 else input_data
+
+
+def load_frames(args):
+    """frame های آزمون از فایل ویدیو یا تصادفی"""
+    if args.video:
+        import cv2
+        capture = cv2.VideoCapture(args.video)
+        frames = []
+        while len(frames) < args.frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+        if frames:
+            return frames
+    width, height = (int(v) for v in args.resolution.split('x'))
+    rng = np.random.default_rng(1)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(16)]
+
+
+def run_cameras(processor, frames, cameras, frames_per_camera):
+    """اجرای هم‌زمان چند دوربین؛ latency هر frame و زمان کل"""
+    latencies = [[] for _ in range(cameras)]
+
+    def camera(i):
+        for n in range(frames_per_camera):
+            frame = frames[(i + n) % len(frames)]
+            started = time.perf_counter()
+            processor.detect_objects(frame)
+            latencies[i].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=camera, args=(i,)) for i in range(cameras)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    flat = sorted(v for per_camera in latencies for v in per_camera)
+    return {
+        'fps': len(flat) / elapsed,
+        'latency_p50_ms': flat[len(flat) // 2] * 1000,
+        'latency_p99_ms': flat[min(len(flat) - 1, int(len(flat) * 0.99))] * 1000,
+        'latency_mean_ms': statistics.mean(flat) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AIProcessor inference benchmark')
+    parser.add_argument('--model', help='TFLite model (default: fake interpreter)')
+    parser.add_argument('--video', help='video file for test frames')
+    parser.add_argument('--resolution', default='1280x720')
+    parser.add_argument('--frames', type=int, default=200, help='frames per camera')
+    parser.add_argument('--cameras', type=int, default=2)
+    parser.add_argument('--num-threads', type=int, default=2)
+    parser.add_argument('--pool-size', type=int, default=2)
+    parser.add_argument('--fake-invoke-ms', type=float, default=20.0)
+    parser.add_argument('--quantized', action='store_true', help='fake interpreter with uint8 input')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    if args.model:
+        factory = load_interpreter
+        source = args.model
+    else:
+        def factory(_, num_threads):
+            return FakeInterpreter(quantized=args.quantized, invoke_ms=args.fake_invoke_ms)
+        source = 'fake'
+
+    frames = load_frames(args)
+    print(f"Model: {source}, {args.cameras} cameras x {args.frames} frames "
+          f"({frames[0].shape[1]}x{frames[0].shape[0]})")
+
+    results = {}
+    legacy = LegacyAIProcessor(factory(source, args.num_threads))
+    results['legacy'] = run_cameras(legacy, frames, args.cameras, args.frames)
+
+    current = AIProcessor(source, num_threads=args.num_threads, pool_size=args.pool_size,
+                          interpreter_factory=factory)
+    results['current'] = run_cameras(current, frames, args.cameras, args.frames)
+
+    print(f"\n📊 Inference Benchmark Results:")
+    print(f"{'Implementation':<12} {'fps':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['fps']:>9.1f} {r['latency_p50_ms']:>9.2f} {r['latency_p99_ms']:>9.2f}")
+    print(f"\nSpeedup: {results['current']['fps'] / results['legacy']['fps']:.2f}x")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark ذخیره‌سازی داده‌های سنسور در gateway
+==============================================
+
+مقایسه نرخ rows/s بین مسیر فعلی (INSERT + commit برای هر پیام)
+و writer دسته‌ای write-behind در hardware/raspberry_pi/ingest.py
+
+اجرا:
+    python tools/testing/ingest_benchmark.py --rows 20000 --devices 300
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from ingest import (INSERT_SENSOR_SQL, SensorIngestWriter,  # noqa: E402
+                    configure_connection, sensor_row)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        device_id TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        temperature REAL,
+        humidity REAL,
+        pressure REAL,
+        light_level REAL,
+        motion BOOLEAN,
+        data_json TEXT
+    )
+'''
+
+
+class IngestBenchmark:
+    def __init__(self, num_rows=20000, num_devices=300, batch_size=500):
+        self.num_rows = num_rows
+        self.num_devices = num_devices
+        self.batch_size = batch_size
+        self.workdir = Path(tempfile.mkdtemp(prefix='ingest_bench_'))
+
+    def make_payloads(self):
+        payloads = []
+        now = int(time.time())
+        for i in range(self.num_rows):
+            device_id = f"ESP32-{i % self.num_devices:04d}"
+            payloads.append((device_id, {
+                'timestamp': now + i // self.num_devices,
+                'temperature': round(random.uniform(18, 30), 2),
+                'humidity': round(random.uniform(30, 70), 2),
+                'pressure': round(random.uniform(990, 1030), 2),
+                'light_level': random.randint(0, 1000),
+                'motion': random.random() < 0.05,
+                'battery': random.randint(20, 100)
+            }))
+        return payloads
+
+    def create_db(self, name, wal):
+        path = self.workdir / name
+        db = sqlite3.connect(str(path))
+        if wal:
+            configure_connection(db)
+        db.execute(SCHEMA)
+        db.commit()
+        return path, db
+
+    def run_per_row(self, payloads):
+        """مسیر فعلی gateway: یک INSERT و یک commit برای هر پیام"""
+        path, db = self.create_db('per_row.db', wal=False)
+        start = time.perf_counter()
+        for device_id, data in payloads:
+            db.execute(INSERT_SENSOR_SQL, sensor_row(device_id, data))
+            db.commit()
+        elapsed = time.perf_counter() - start
+        db.close()
+        return elapsed, {}
+
+    def run_write_behind(self, payloads):
+        """writer دسته‌ای: submit از thread فراخواننده و commit گروهی"""
+        path, db = self.create_db('write_behind.db', wal=True)
+        db.close()
+
+        writer = SensorIngestWriter(str(path), queue_size=len(payloads) + 1,
+                                    batch_size=self.batch_size, flush_interval=0.5)
+        writer.start()
+
+        start = time.perf_counter()
+        submit_start = start
+        for device_id, data in payloads:
+            writer.submit(sensor_row(device_id, data))
+        submit_elapsed = time.perf_counter() - submit_start
+        writer.stop()
+        elapsed = time.perf_counter() - start
+
+        stats = writer.stats()
+        stats['submit_seconds'] = submit_elapsed
+        return elapsed, stats
+
+    def run_test(self):
+        print(f"Preparing {self.num_rows} rows from {self.num_devices} devices in {self.workdir}...")
+        payloads = self.make_payloads()
+
+        per_row_time, _ = self.run_per_row(payloads)
+        batched_time, stats = self.run_write_behind(payloads)
+
+        per_row_rate = self.num_rows / per_row_time
+        batched_rate = self.num_rows / batched_time
+        submit_rate = self.num_rows / stats['submit_seconds']
+
+        print(f"\n📊 Ingest Benchmark Results:")
+        print(f"Per-row commit:      {per_row_rate:,.0f} rows/s ({per_row_time:.2f}s)")
+        print(f"Write-behind:        {batched_rate:,.0f} rows/s ({batched_time:.2f}s)")
+        print(f"Submit (MQTT side):  {submit_rate:,.0f} rows/s")
+        print(f"Speedup:             {batched_rate / per_row_rate:.1f}x")
+        print(f"Batches:             {stats['batches']} (dropped {stats['dropped_rows']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='SQLite ingest benchmark')
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--devices', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    IngestBenchmark(args.rows, args.devices, args.batch_size).run_test()
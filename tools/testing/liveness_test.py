@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+تست TimerWheel و گذارهای online/offline با ساعت دستی
+====================================================
+
+    python -m pytest tools/testing/liveness_test.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from device_state import DeviceIndex, DeviceState  # noqa: E402
+from liveness import TimerWheel  # noqa: E402
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Gateway:
+    """همان سیم‌کشی gateway_main: arm در هر پیام، اعلان فقط روی گذار DeviceIndex"""
+
+    def __init__(self, timeout=5.0, tick=0.25, slots=64):
+        self.clock = Clock()
+        self.timeout = timeout
+        self.index = DeviceIndex()
+        self.devices = {}
+        self.alerts = []
+        self.wheel = TimerWheel(self.on_expire, tick=tick, slots=slots, clock=self.clock)
+
+    def message(self, device_id):
+        device = self.devices.get(device_id)
+        if device is None:
+            device = self.devices[device_id] = DeviceState(device_id, self.clock.now, 4)
+        device.update({'temperature': 20}, self.clock.now)
+        self.wheel.arm(device_id, self.timeout)
+        if self.index.touch(device) and device.first_seen != self.clock.now:
+            self.alerts.append(('online', device_id))
+
+    def on_expire(self, device_id):
+        if self.index.set_offline(device_id):
+            self.alerts.append(('offline', device_id))
+
+    def run_until(self, t, step=0.1):
+        while self.clock.now < t:
+            self.clock.now = round(self.clock.now + step, 6)
+            for key in self.wheel.advance():
+                self.on_expire(key)
+
+
+def test_rearm_expires_once_after_last_message():
+    gw = Gateway()
+    for _ in range(40):
+        last = gw.clock.now
+        gw.message('ESP32-00001')
+        gw.run_until(last + 1.0)
+
+    gw.run_until(last + 4.5)
+    assert gw.alerts == []
+    gw.run_until(last + 30)
+    assert gw.alerts == [('offline', 'ESP32-00001')]
+    assert gw.wheel.expired == 1
+
+
+def test_one_alert_per_transition():
+    gw = Gateway()
+    for _ in range(3):
+        gw.message('ESP32-00001')
+        gw.message('ESP32-00001')
+        gw.run_until(gw.clock.now + 10)
+
+    assert gw.alerts == [('offline', 'ESP32-00001'), ('online', 'ESP32-00001'),
+                         ('offline', 'ESP32-00001'), ('online', 'ESP32-00001'),
+                         ('offline', 'ESP32-00001')]
+    assert gw.index.stats()['online_devices'] == 0
+
+
+def test_timeout_longer_than_wheel_round():
+    # ۶۴ slot × ۰.۲۵ ثانیه = ۱۶ ثانیه؛ مهلت ۴۰ ثانیه چند دور wheel را طی می‌کند
+    gw = Gateway(timeout=40.0)
+    gw.message('ESP32-00001')
+    start = gw.clock.now
+
+    gw.run_until(start + 39.5)
+    assert gw.alerts == []
+    gw.run_until(start + 41)
+    assert gw.alerts == [('offline', 'ESP32-00001')]
+
+
+def test_cancel_prevents_expiry():
+    gw = Gateway()
+    gw.message('ESP32-00001')
+    gw.message('ESP32-00002')
+    gw.wheel.cancel('ESP32-00001')
+
+    gw.run_until(gw.clock.now + 10)
+    assert gw.alerts == [('offline', 'ESP32-00002')]
+    assert gw.wheel.stats()['tracked'] == 0
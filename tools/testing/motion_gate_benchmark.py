@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark فیلتر حرکت (motion gate)
+==================================
+
+اجرای GatedDetector روی کلیپ‌های ویدیویی (هر فایل = یک دوربین) و مقایسه با اجرای مدل روی همه frame ها:
+- کسر frame های بدون استنتاج و CPU صرفه‌جویی شده
+- پوشش رویدادهای حرکت: آیا در هر بازه حرکت مدل حداقل یک بار اجرا شده است
+
+بدون کلیپ، یک کلیپ مصنوعی (پس‌زمینه ثابت با نویز و یک جسم متحرک در چند بازه) ساخته می‌شود:
+    python tools/testing/motion_gate_benchmark.py --method diff --min-rate 0.2
+    python tools/testing/motion_gate_benchmark.py --clip cam1.mp4 --clip cam2.mp4 --model detect.tflite
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from inference_benchmark import FakeInterpreter
+
+from inference import AIProcessor, load_interpreter  # noqa: E402  (مسیر توسط inference_benchmark)
+from motion import GatedDetector  # noqa: E402
+
+# بازه‌های حرکت در کلیپ مصنوعی (ثانیه)
+SYNTHETIC_MOTION = [(10.0, 14.0), (25.0, 27.0), (41.0, 41.5)]
+
+
+def synthetic_clip(path, seconds=50, fps=15, size=(640, 360)):
+    """نوشتن کلیپ مصنوعی در فایل (برای آزمودن مسیر خواندن فایل)"""
+    width, height = size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    rng = np.random.default_rng(3)
+    background = rng.integers(40, 200, (height // 8, width // 8, 3), dtype=np.uint8)
+    background = cv2.resize(background, size, interpolation=cv2.INTER_LINEAR)
+
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        frame = background.copy()
+        noise = rng.normal(0, 3, frame.shape)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        for start, end in SYNTHETIC_MOTION:
+            if start <= t < end:
+                x = int((t - start) / (end - start) * (width - 80))
+                cv2.rectangle(frame, (x, height // 3), (x + 60, height // 3 + 120), (20, 220, 20), -1)
+        writer.write(frame)
+    writer.release()
+    return SYNTHETIC_MOTION
+
+
+def read_clip(path):
+    capture = cv2.VideoCapture(str(path))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 15
+    frames = []
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames, fps
+
+
+def run(detector, clips):
+    """پخش کلیپ‌ها با زمان شبیه‌سازی شده؛ زمان اجرای هر دوربین با مُهر زمانی frame"""
+    inference_times = {}
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for camera_id, (frames, fps) in clips.items():
+        times = inference_times[camera_id] = []
+        for i, frame in enumerate(frames):
+            if detector.process(camera_id, frame, now=i / fps) is not None:
+                times.append(i / fps)
+    return {
+        'wall_seconds': time.perf_counter() - wall_started,
+        'cpu_seconds': time.process_time() - cpu_started,
+        'inferences': sum(len(t) for t in inference_times.values()),
+        'inference_times': inference_times
+    }
+
+
+def motion_coverage(inference_times, segments, reaction=1.0):
+    """کسر بازه‌های حرکت که ظرف reaction ثانیه از شروع، استنتاج داشته‌اند"""
+    hits = sum(1 for start, end in segments
+               if any(start <= t <= min(end, start + reaction) for t in inference_times))
+    return hits / len(segments) if segments else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motion-gated inference benchmark')
+    parser.add_argument('--clip', action='append', help='video file (repeat for more cameras)')
+    parser.add_argument('--model', help='TFLite model (default: fake interpreter)')
+    parser.add_argument('--fake-invoke-ms', type=float, default=30.0)
+    parser.add_argument('--method', default='diff', choices=['diff', 'mog2'])
+    parser.add_argument('--frame-skip', type=int, default=0)
+    parser.add_argument('--max-rate', type=float, default=5.0)
+    parser.add_argument('--min-rate', type=float, default=0.2)
+    parser.add_argument('--min-area', type=float, default=0.005)
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    segments = None
+    paths = args.clip
+    if not paths:
+        path = Path(tempfile.mkdtemp(prefix='motion_clip_')) / 'synthetic.avi'
+        segments = synthetic_clip(path)
+        paths = [str(path)]
+    clips = {Path(p).stem: read_clip(p) for p in paths}
+
+    if args.model:
+        processor = AIProcessor(args.model, interpreter_factory=load_interpreter)
+    else:
+        processor = AIProcessor('fake', interpreter_factory=lambda _, n: FakeInterpreter(
+            invoke_ms=args.fake_invoke_ms))
+
+    frames = sum(len(f) for f, _ in clips.values())
+    print(f"{len(clips)} camera(s), {frames} frames, method={args.method}")
+
+    ungated = run(GatedDetector(processor.detect_objects, {'enabled': False}), clips)
+
+    detector = GatedDetector(processor.detect_objects, {
+        'method': args.method, 'frame_skip': args.frame_skip, 'max_rate': args.max_rate,
+        'min_rate': args.min_rate, 'min_area': args.min_area
+    })
+    gated = run(detector, clips)
+    stats = detector.stats()
+
+    print(f"\n📊 Motion Gate Results:")
+    print(f"{'':<10} {'inferences':>11} {'wall s':>8} {'cpu s':>8}")
+    for name, result in (('ungated', ungated), ('gated', gated)):
+        print(f"{name:<10} {result['inferences']:>11} {result['wall_seconds']:>8.2f} {result['cpu_seconds']:>8.2f}")
+    for camera_id, camera in stats['cameras'].items():
+        print(f"\n{camera_id}: skip fraction {camera['skip_fraction']:.1%}, "
+              f"forced {camera['forced_min_rate']}, gate cost {camera['gate_seconds']:.3f}s, "
+              f"estimated CPU saved {camera.get('cpu_saved_seconds', 0):.2f}s")
+        if segments:
+            coverage = motion_coverage(gated['inference_times'][camera_id], segments)
+            print(f"motion segments covered within 1s: {coverage:.0%}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        for result in (ungated, gated):
+            result.pop('inference_times')
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'ungated': ungated, 'gated': gated, 'gate': stats}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
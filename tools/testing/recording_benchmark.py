@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark ضبط رویدادمحور
+========================
+
+پخش کلیپ مصنوعی motion_gate_benchmark (یا یک فایل ویدیو) با زمان شبیه‌سازی شده از SegmentRecorder:
+- رویدادها در بازه‌های حرکت کلیپ، در یکی از هر --event-every تکرار آن
+- حجم نوشته شده در برابر ضبط پیوسته با همان تنظیمات
+- هزینه encode هر frame و پوشش pre-roll/post-roll هر رویداد
+- زمان جستجوی index و خواندن یک clip
+- retention با سقف حجم کوچک
+
+    python tools/testing/recording_benchmark.py --minutes 10 --pre-roll 4 --post-roll 6
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from motion_gate_benchmark import SYNTHETIC_MOTION, read_clip, synthetic_clip
+
+from recording import RecordingIndex, SegmentRecorder, SegmentStore  # noqa: E402  (مسیر توسط inference_benchmark)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Event-triggered recording benchmark')
+    parser.add_argument('--clip', help='video file (default: synthetic clip)')
+    parser.add_argument('--minutes', type=float, default=10.0, help='simulated duration (clip loops)')
+    parser.add_argument('--fps', type=float, default=5.0, help='recorded frames per second')
+    parser.add_argument('--quality', type=int, default=70)
+    parser.add_argument('--segment-seconds', type=float, default=2.0)
+    parser.add_argument('--pre-roll', type=float, default=6.0)
+    parser.add_argument('--post-roll', type=float, default=10.0)
+    parser.add_argument('--event-every', type=int, default=4, help='clip loops per loop with events')
+    parser.add_argument('--file-mb', type=float, default=4.0)
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix='recording_bench_'))
+    segments = SYNTHETIC_MOTION
+    path = args.clip
+    if not path:
+        path = work / 'synthetic.avi'
+        synthetic_clip(path)
+    frames, clip_fps = read_clip(path)
+    clip_seconds = len(frames) / clip_fps
+
+    store = SegmentStore(str(work / 'recordings' / 'cam1'), int(args.file_mb * 1024 * 1024))
+    recorder = SegmentRecorder(store, fps=args.fps, quality=args.quality,
+                               segment_seconds=args.segment_seconds, pre_roll=args.pre_roll)
+
+    # ضبط پیوسته با همان تنظیمات برای مقایسه حجم
+    continuous = SegmentStore(str(work / 'continuous' / 'cam1'), int(args.file_mb * 1024 * 1024))
+    continuous_recorder = SegmentRecorder(continuous, fps=args.fps, quality=args.quality,
+                                          segment_seconds=args.segment_seconds, pre_roll=args.pre_roll)
+
+    base = 1_700_000_000.0
+    total = int(args.minutes * 60 * clip_fps)
+    record_until = 0.0
+    events = []
+    encode_started = time.process_time()
+    for i in range(total):
+        ts = base + i / clip_fps
+        loop, offset = divmod(i / clip_fps, clip_seconds)
+        if loop % args.event_every == 0 and any(start <= offset < end for start, end in segments):
+            if ts > record_until:
+                events.append(ts)
+            record_until = ts + args.post_roll
+        recorder.add(frames[i % len(frames)], ts, record_until)
+    encode_cpu = time.process_time() - encode_started
+    recorder.close()
+
+    for i in range(total):
+        continuous_recorder.add(frames[i % len(frames)], base + i / clip_fps, float('inf'))
+    continuous_recorder.close()
+
+    index = RecordingIndex(str(work / 'recordings'))
+    started = time.perf_counter()
+    clips = index.clips('cam1')
+    lookup_ms = (time.perf_counter() - started) * 1000
+
+    # پوشش: هر رویداد باید از (شروع - pre_roll) تا (شروع + post_roll) ضبط شده باشد (با دقت یک segment)
+    slack = args.segment_seconds
+    covered = sum(1 for e in events if any(c['start'] <= e - args.pre_roll + slack and
+                                           c['end'] >= e + args.post_roll - slack for c in clips))
+
+    event = events[len(events) // 2]
+    started = time.perf_counter()
+    clip_frames = list(index.frames('cam1', event - args.pre_roll, event + args.post_roll))
+    read_ms = (time.perf_counter() - started) * 1000
+
+    used = sum(p.stat().st_size for p in (work / 'recordings' / 'cam1').glob('*.seg'))
+    retention = index.enforce_retention(quota_bytes=used // 2, max_age=float('inf'), now=base)
+
+    results = {
+        'simulated_seconds': total / clip_fps,
+        'events': len(events),
+        'events_covered': covered,
+        'clips': len(clips),
+        'recorded_seconds': sum(c['end'] - c['start'] for c in clips),
+        'event_bytes': store.bytes_written,
+        'continuous_bytes': continuous.bytes_written,
+        'encoded_frames': recorder.encoded,
+        'encode_ms_per_frame': encode_cpu / max(1, recorder.encoded) * 1000,
+        'index_lookup_ms': lookup_ms,
+        'clip_frames': len(clip_frames),
+        'clip_read_ms': read_ms,
+        'retention': retention
+    }
+
+    print(f"\n📊 Recording Benchmark Results ({results['simulated_seconds'] / 60:.0f} simulated minutes):")
+    print(f"Events: {len(events)}, covered by pre/post-roll: {covered}, clips: {len(clips)}")
+    print(f"Written: {store.bytes_written / 1e6:.1f} MB event-triggered vs "
+          f"{continuous.bytes_written / 1e6:.1f} MB continuous "
+          f"({continuous.bytes_written / max(1, store.bytes_written):.1f}x less)")
+    print(f"Encode: {results['encode_ms_per_frame']:.2f} ms CPU per recorded frame")
+    print(f"Index lookup {lookup_ms:.2f} ms, clip read {len(clip_frames)} frames in {read_ms:.2f} ms")
+    print(f"Retention at half quota: {retention}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+تست RedisMirror با FakeRedis
+============================
+
+    python -m pytest tools/testing/redis_mirror_test.py
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+import redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fleet_simulator import FakeRedis  # noqa: E402
+
+from redis_mirror import RedisMirror  # noqa: E402
+
+
+def make_mirror():
+    fake = FakeRedis()
+    mirror = RedisMirror(client_factory=lambda: fake)
+    mirror.client = fake
+    assert mirror._connect()
+    return mirror, fake
+
+
+def test_real_client_rejects_empty_hset():
+    """رفتاری که FakeRedisPipeline تقلید می‌کند (بدون نیاز به سرور)"""
+    pipe = redis.Redis().pipeline(transaction=False)
+    with pytest.raises(redis.DataError):
+        pipe.hset('device:x:latest', mapping={})
+
+
+@pytest.mark.parametrize('payload', [{}, {'temperature': None, 'humidity': None}])
+def test_flush_empty_payload(payload):
+    mirror, fake = make_mirror()
+    mirror.update('ESP32-00001', {'temperature': 21.5})
+    mirror.flush()
+
+    mirror.update('ESP32-00001', payload)
+    mirror.update('ESP32-00002', {'humidity': 40})
+    assert mirror.flush() == 2
+
+    assert mirror.available
+    assert mirror.errors == 0
+    assert mirror.stats()['pending_devices'] == 0
+    assert fake.hashes['device:ESP32-00001:latest'] == {'temperature': 21.5}
+    assert fake.hashes['device:ESP32-00002:latest'] == {'humidity': 40}
+    assert 'device:ESP32-00001:latest' in fake.expiry
+
+
+def test_command_error_is_not_an_outage():
+    mirror, fake = make_mirror()
+
+    def broken_pipeline(transaction=True):
+        raise redis.ResponseError('WRONGTYPE Operation against a key holding the wrong kind of value')
+
+    fake.pipeline = broken_pipeline
+    mirror.update('ESP32-00001', {'temperature': 21.5})
+    assert mirror.flush() == 0
+    assert mirror.available
+    assert mirror.errors == 1
+    assert mirror.stats()['pending_devices'] == 0
+
+
+def test_connection_error_requeues():
+    mirror, fake = make_mirror()
+
+    def down(transaction=True):
+        raise redis.ConnectionError('Connection refused')
+
+    fake.pipeline = down
+    mirror.update('ESP32-00001', {'temperature': 21.5})
+    assert mirror.flush() == 0
+    assert not mirror.available
+    assert mirror.stats()['pending_devices'] == 1
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Benchmark ingest چند worker با shared subscription
+=================================================
+
+N نمونه IoTGateway در حالت sharding، هر کدام در پردازه جداگانه (دیتابیس خودش)، به یک broker مشترک
+(fleet_simulator.FakeBroker با $share round-robin و پیام retained در پردازه اصلی) وصل می‌شوند.
+اتصال MQTT هر worker یک BridgeClient است که publish/subscribe را با صف multiprocessing به broker
+می‌فرستد و پیام‌ها را از آن دریافت می‌کند (مثل اتصال TCP به یک broker واقعی).
+
+مراحل و گزارش:
+- baseline: همان تعداد پیام با یک worker (--no-baseline برای رد کردن)
+- N worker: زمان تا نوشتن همه ردیف‌ها و speedup نسبت به baseline، CPU هر پردازه، ردیف‌های هر worker،
+  کسر پیام‌های فوروارد شده به مالک و یکتایی مالکیت دستگاه‌ها
+- /api/devices، /api/statistics و selector دستورات از دید یک worker در برابر اندازه ناوگان
+- crash یک worker (SIGKILL، بدون انتشار وضعیت خالی): حذف آن از ring پس از peer_timeout، جابه‌جایی فقط
+  دستگاه‌های همان worker و پردازش کامل پیام‌های بعدی توسط worker های باقی‌مانده
+
+speedup فقط با هسته‌های آزاد به اندازه worker ها معنی دارد (تعداد هسته در خروجی چاپ می‌شود).
+
+    python tools/testing/shard_benchmark.py --workers 3 --devices 600 --messages 6000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from fleet_simulator import (FakeBroker, FakeMessage, FakeMessageInfo, FakeMQTTClient, FakeRedis,
+                             FleetSimulator, install_fake_gpio)
+
+
+class RemoteClient(FakeMQTTClient):
+    """نماینده اتصال یک worker در broker پردازه اصلی؛ تحویل پیام = ارسال به صف worker"""
+
+    def __init__(self, broker, inbox):
+        super().__init__(broker)
+        self.inbox = inbox
+
+    def deliver(self, message):
+        self.inbox.put((message.topic, message.payload, message.retain))
+
+
+class BridgeClient:
+    """زیرمجموعه API کلاس paho.mqtt.client.Client در پردازه worker، متصل به broker با صف‌ها"""
+
+    def __init__(self, worker_id, inbox, outbox):
+        self.worker_id = worker_id
+        self.inbox = inbox
+        self.outbox = outbox
+        self.on_connect = None
+        self.on_message = None
+        self.on_disconnect = None
+        self.published = 0
+        self._reader = None
+
+    def connect(self, host, port=1883, keepalive=60):
+        self.outbox.put(('connect', self.worker_id))
+
+    def loop_start(self):
+        self._reader = threading.Thread(target=self._read, name='bridge-reader', daemon=True)
+        self._reader.start()
+        if self.on_connect:
+            self.on_connect(self, None, {}, 0)
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        self.outbox.put(('disconnect', self.worker_id))
+        if self.on_disconnect:
+            self.on_disconnect(self, None, 0)
+
+    def subscribe(self, topic, qos=0):
+        self.outbox.put(('subscribe', self.worker_id, topic, qos))
+        return 0, 1
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.published += 1
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.outbox.put(('publish', self.worker_id, topic, payload, qos, retain))
+        return FakeMessageInfo(self.published)
+
+    def _read(self):
+        while True:
+            topic, payload, retain = self.inbox.get()
+            if self.on_message:
+                self.on_message(self, None, FakeMessage(topic, payload, 0, retain))
+
+
+def worker_main(worker_id, workers, workdir, state_interval, inbox, outbox, control, results):
+    """پردازه یک worker: gateway کامل و پاسخ به درخواست‌های کنترلی"""
+    install_fake_gpio()
+    import gateway_main
+
+    config = gateway_main.CONFIG
+    config['logging']['file'] = None
+    config['logging']['level'] = 'ERROR'
+    config['alarms']['rules_file'] = None
+    config['ai']['model_path'] = str(workdir / 'missing_model.tflite')
+    config['database']['path'] = str(workdir / worker_id / 'local.db')
+    config['backup']['backup_path'] = str(workdir / worker_id / 'backups')
+    config['sharding'].update(enabled=True, worker_id=worker_id, workers=workers, state_interval=state_interval,
+                              peer_timeout=state_interval * 3)
+    (workdir / worker_id).mkdir(parents=True, exist_ok=True)
+    gateway_main.setup_logging()
+
+    gateway = gateway_main.IoTGateway(mqtt_client_factory=lambda: BridgeClient(worker_id, inbox, outbox),
+                                      redis_client_factory=FakeRedis)
+    gateway.startup.wait()
+    results.put((worker_id, 'ready', None))
+
+    while True:
+        command = control.get()
+        if command == 'stats':
+            cpu = os.times()
+            results.put((worker_id, command, {
+                'written_rows': gateway.ingest.stats()['written_rows'],
+                'devices': sorted(gateway.devices),
+                'forwarded': gateway.shards.forwarded,
+                'ring': gateway.shards.ring.nodes,
+                'cpu_seconds': cpu.user + cpu.system
+            }))
+        elif command == 'views':
+            client = gateway.app.test_client()
+            results.put((worker_id, command, {
+                'devices': len(client.get('/api/devices').get_json()),
+                'stats': client.get('/api/statistics').get_json(),
+                'selected': len(gateway.select_devices({'online': True}))
+            }))
+        elif command == 'shutdown':
+            gateway.shutdown()
+            results.put((worker_id, command, None))
+            return
+
+
+class Cluster:
+    """broker مشترک در پردازه اصلی و worker ها در پردازه‌های جدا"""
+
+    def __init__(self, worker_ids, workdir, state_interval):
+        self.broker = FakeBroker()
+        self.context = multiprocessing.get_context('spawn')
+        self.outbox = self.context.Queue()
+        self.results = self.context.Queue()
+        self.inboxes = {w: self.context.Queue() for w in worker_ids}
+        self.controls = {w: self.context.Queue() for w in worker_ids}
+        self.remotes = {}
+        self.processes = {
+            w: self.context.Process(target=worker_main, name=w, daemon=True,
+                                    args=(w, list(worker_ids), workdir, state_interval, self.inboxes[w],
+                                          self.outbox, self.controls[w], self.results))
+            for w in worker_ids
+        }
+        self._router = threading.Thread(target=self._route, daemon=True)
+        self._router.start()
+        for process in self.processes.values():
+            process.start()
+        self.collect('ready', worker_ids, timeout=120)
+
+    def _route(self):
+        """اجرای publish/subscribe worker ها روی broker مشترک"""
+        while True:
+            message = self.outbox.get()
+            kind, worker_id = message[0], message[1]
+            if kind == 'connect':
+                self.remotes[worker_id] = RemoteClient(self.broker, self.inboxes[worker_id])
+                self.broker.attach(self.remotes[worker_id])
+            elif kind == 'subscribe' and worker_id in self.remotes:
+                self.remotes[worker_id].subscribe(message[2], message[3])
+            elif kind == 'publish' and worker_id in self.remotes:
+                self.broker.publish(*message[2:])
+            elif kind == 'disconnect':
+                self.drop(worker_id)
+
+    def drop(self, worker_id):
+        remote = self.remotes.pop(worker_id, None)
+        if remote:
+            self.broker.detach(remote)
+
+    def collect(self, command, worker_ids, timeout=30):
+        replies = {}
+        deadline = time.monotonic() + timeout
+        while len(replies) < len(worker_ids):
+            worker_id, kind, payload = self.results.get(timeout=max(0.1, deadline - time.monotonic()))
+            if kind == command:
+                replies[worker_id] = payload
+        return replies
+
+    def ask(self, command, worker_ids=None):
+        worker_ids = list(worker_ids or self.processes)
+        for worker_id in worker_ids:
+            self.controls[worker_id].put(command)
+        return self.collect(command, worker_ids)
+
+    def kill(self, worker_id):
+        """crash بدون shutdown: اتصال broker قطع می‌شود ولی وضعیت retained آخر باقی می‌ماند"""
+        self.processes.pop(worker_id).kill()
+        self.drop(worker_id)
+
+    def wait_written(self, expected, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stats = self.ask('stats')
+            if sum(s['written_rows'] for s in stats.values()) >= expected:
+                return stats
+            time.sleep(0.2)
+        return self.ask('stats')
+
+    def shutdown(self):
+        self.ask('shutdown')
+        for process in self.processes.values():
+            process.join(10)
+
+
+def blast(fleet, broker, messages):
+    """انتشار پشت سر هم، به ترتیب دستگاه‌ها"""
+    for i in range(messages):
+        device_id = fleet.devices[i % len(fleet.devices)]
+        broker.publish(fleet.topic(device_id), fleet.payload(device_id))
+        fleet.sent += 1
+
+
+def timed_run(worker_ids, workdir, args):
+    """زمان از اولین پیام تا نوشتن همه ردیف‌ها"""
+    cluster = Cluster(worker_ids, workdir, args.state_interval)
+    before = cluster.ask('stats')
+    fleet = FleetSimulator(cluster.broker, devices=args.devices)
+    started = time.perf_counter()
+    blast(fleet, cluster.broker, args.messages)
+    stats = cluster.wait_written(args.messages)
+    elapsed = time.perf_counter() - started
+    cpu = {w: stats[w]['cpu_seconds'] - before[w]['cpu_seconds'] for w in stats}
+    return cluster, fleet, stats, elapsed, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded ingest benchmark (one process per worker)')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--devices', type=int, default=600)
+    parser.add_argument('--messages', type=int, default=6000, help='messages published as fast as possible')
+    parser.add_argument('--state-interval', type=float, default=0.5)
+    parser.add_argument('--no-baseline', action='store_true', help='skip the single-worker run')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='shard_bench_'))
+    results = {'workers': args.workers, 'messages': args.messages, 'cpu_count': os.cpu_count()}
+
+    if not args.no_baseline:
+        cluster, _, stats, elapsed, cpu = timed_run(['single'], workdir / 'baseline', args)
+        cluster.shutdown()
+        results['baseline_rate'] = sum(s['written_rows'] for s in stats.values()) / elapsed
+        results['baseline_cpu_seconds'] = cpu['single']
+
+    worker_ids = [f'shard-{i}' for i in range(args.workers)]
+    cluster, fleet, stats, elapsed, cpu = timed_run(worker_ids, workdir / 'sharded', args)
+    written = {w: s['written_rows'] for w, s in stats.items()}
+    owners = {w: set(s['devices']) for w, s in stats.items()}
+    all_owned = [d for devices in owners.values() for d in devices]
+    time.sleep(args.state_interval * 2.5)
+    views = cluster.ask('views', [worker_ids[0]])[worker_ids[0]]
+
+    results.update({
+        'written_rows': sum(written.values()),
+        'elapsed_seconds': elapsed,
+        'processed_rate': sum(written.values()) / elapsed,
+        'speedup': sum(written.values()) / elapsed / results['baseline_rate'] if 'baseline_rate' in results else None,
+        'rows_per_worker': written,
+        'cpu_seconds_per_worker': cpu,
+        'devices_per_worker': {w: len(d) for w, d in owners.items()},
+        'forwarded_fraction': sum(s['forwarded'] for s in stats.values()) / max(1, fleet.sent),
+        'ownership_unique': len(all_owned) == len(set(all_owned)) == args.devices,
+        'merged_api_devices': views['devices'],
+        'merged_total_devices': views['stats'].get('total_devices'),
+        'selector_devices': views['selected']
+    })
+
+    # crash آخرین worker؛ بقیه باید آن را پس از peer_timeout (3 × state_interval) از ring حذف کنند
+    crashed = worker_ids.pop()
+    moved = owners[crashed]
+    cluster.kill(crashed)
+    killed_at = time.monotonic()
+    deadline = killed_at + 30
+    while time.monotonic() < deadline:
+        rings = {w: s['ring'] for w, s in cluster.ask('stats').items()}
+        if all(crashed not in ring for ring in rings.values()):
+            break
+        time.sleep(0.2)
+    detected = time.monotonic() - killed_at
+    rows_before = sum(s['written_rows'] for s in cluster.ask('stats').values())
+    blast(fleet, cluster.broker, args.messages // 2)
+    after_stats = cluster.wait_written(rows_before + args.messages // 2, timeout=60)
+    after = {w: set(s['devices']) for w, s in after_stats.items()}
+    after_owned = [d for devices in after.values() for d in devices]
+    time.sleep(args.state_interval * 2.5)
+    views_after = cluster.ask('views', [worker_ids[0]])[worker_ids[0]]
+
+    results.update({
+        'failover_ring': rings,
+        'failover_detect_seconds': detected,
+        'failover_moved_devices': len(moved),
+        'failover_processed': sum(s['written_rows'] for s in after_stats.values()) - rows_before,
+        'failover_sent': args.messages // 2,
+        'failover_ownership_unique': len(after_owned) == len(set(after_owned)) == args.devices,
+        'failover_only_moved_crashed_devices': all(owners[w] <= after[w] for w in after),
+        'failover_merged_api_devices': views_after['devices']
+    })
+    cluster.shutdown()
+
+    print(f"\n📊 Sharded Ingest Benchmark Results ({args.workers} worker processes, {args.devices} devices, "
+          f"{args.messages:,} messages, {results['cpu_count']} CPU cores):")
+    if 'baseline_rate' in results:
+        print(f"1 worker: {results['baseline_rate']:,.0f} msgs/s, {results['baseline_cpu_seconds']:.2f} CPU s; "
+              f"{args.workers} workers: {results['processed_rate']:,.0f} msgs/s (speedup {results['speedup']:.2f}x), "
+              f"max {max(cpu.values()):.2f} CPU s per worker")
+    print(f"Written {results['written_rows']:,}/{args.messages:,} rows; rows per worker {written}; "
+          f"CPU s per worker { {w: round(c, 2) for w, c in cpu.items()} }")
+    print(f"Devices per worker {results['devices_per_worker']}, ownership unique: {results['ownership_unique']}, "
+          f"{results['forwarded_fraction'] * 100:.0f}% of shared deliveries forwarded to the owner (round-robin broker)")
+    print(f"Merged views: /api/devices {views['devices']}, /api/statistics total_devices "
+          f"{results['merged_total_devices']} (fleet {args.devices}), command selector {views['selected']}")
+    print(f"After {crashed} crashed (no retained goodbye): dropped from the ring after {detected:.1f} s "
+          f"(peer_timeout {args.state_interval * 3:g} s), ring {sorted(rings.values())[0]}, "
+          f"{len(moved)} devices moved, others kept theirs: {results['failover_only_moved_crashed_devices']}, "
+          f"processed {results['failover_processed']:,}/{results['failover_sent']:,} later messages, "
+          f"/api/devices {views_after['devices']}")
+    if results['cpu_count'] < args.workers:
+        print(f"Note: {results['cpu_count']} core(s) for {args.workers} worker processes + broker; "
+              f"speedup needs a free core per worker")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2, default=list)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark زمان راه‌اندازی gateway
+=================================
+
+هر تکرار در یک پردازه تازه اجرا می‌شود (import ها cache نشده باشند) و این موارد را گزارش می‌کند:
+- زمان import ماژول gateway_main
+- زمان ساخت IoTGateway و آماده شدن مسیر ingest
+- زمان تا پردازش اولین پیام سنسور (ack شدن دستگاه‌ها بعد از قطع برق)
+- زمان تا آماده شدن همه اجزا و تفکیک زمان هر مرحله
+
+تأخیر اتصال broker و Redis قابل تنظیم است:
+    python tools/testing/startup_benchmark.py --repeat 5 --connect-delay 0.5 --redis-delay 1.0 \\
+        --output reports/startup.json --compare reports/startup_prev.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def child(args):
+    """یک راه‌اندازی کامل؛ نتیجه به صورت JSON روی stdout"""
+    started = time.perf_counter()
+    from fleet_simulator import FakeBroker, FakeRedis, install_fake_gpio
+    install_fake_gpio()
+
+    import gateway_main
+    imported = time.perf_counter()
+
+    workdir = Path(tempfile.mkdtemp(prefix='gateway_startup_'))
+    config = gateway_main.CONFIG
+    config['logging']['file'] = None
+    config['logging']['level'] = 'ERROR'
+    config['database']['path'] = str(workdir / 'local.db')
+    config['alarms']['rules_file'] = None
+    gateway_main.setup_logging()
+
+    broker = FakeBroker(connect_delay=args.connect_delay)
+    redis = FakeRedis(ping_delay=args.redis_delay)
+
+    # یک دستگاه از لحظه روشن شدن gateway مدام پیام می‌فرستد
+    stop = threading.Event()
+
+    def sensor():
+        while not stop.is_set():
+            broker.publish('devices/ESP32-STARTUP/data',
+                           json.dumps({'temperature': 21.5, 'humidity': 40}))
+            time.sleep(0.002)
+
+    threading.Thread(target=sensor, daemon=True).start()
+
+    init_started = time.perf_counter()
+    gateway = gateway_main.IoTGateway(mqtt_client_factory=broker.client_factory,
+                                      redis_client_factory=lambda: redis)
+    initialized = time.perf_counter()
+
+    while not gateway.devices:
+        time.sleep(0.001)
+    first_sensor = time.perf_counter()
+
+    gateway.startup.wait()
+    all_ready = time.perf_counter()
+    stop.set()
+
+    report = gateway.startup.report()
+    offset = init_started - started   # زمان‌های timeline نسبت به شروع __init__ است
+    result = {
+        'import': imported - started,
+        'init': initialized - init_started,
+        'ingest_ready': offset + report['milestones'].get('ingest_ready', 0),
+        'first_sensor': first_sensor - started,
+        'all_ready': all_ready - started,
+        'phases': {name: phase['duration'] for name, phase in report['phases'].items()}
+    }
+    gateway.shutdown()
+    print(json.dumps(result))
+
+
+def run_once(args):
+    cmd = [sys.executable, __file__, '--child',
+           '--connect-delay', str(args.connect_delay), '--redis-delay', str(args.redis_delay)]
+    started = time.perf_counter()
+    completed = subprocess.run(cmd, capture_output=True, text=True, cwd=Path(__file__).parent)
+    process_seconds = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process'] = process_seconds
+    return result
+
+
+def summarize(runs):
+    """میانه هر اندازه‌گیری روی تکرارها"""
+    keys = ('process', 'import', 'init', 'ingest_ready', 'first_sensor', 'all_ready')
+    summary = {key: statistics.median(run[key] for run in runs) for key in keys}
+    phases = sorted({name for run in runs for name in run['phases']})
+    summary['phases'] = {name: statistics.median(run['phases'].get(name, 0) for run in runs)
+                         for name in phases}
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    print(f"\n📊 Startup Benchmark Results (median, seconds):")
+
+    def line(label, value, base):
+        text = f"{label:<22} {value:>8.3f}"
+        if base:
+            text += f"   ({(value - base) / base * 100:+.1f}% vs baseline)"
+        print(text)
+
+    for key in ('process', 'import', 'init', 'ingest_ready', 'first_sensor', 'all_ready'):
+        line(key, summary[key], baseline.get(key) if baseline else None)
+
+    print("\nPhases:")
+    base_phases = baseline.get('phases', {}) if baseline else {}
+    for name, value in summary['phases'].items():
+        line(f"  {name}", value, base_phases.get(name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Gateway startup benchmark')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--connect-delay', type=float, default=0.5, help='simulated broker connect time')
+    parser.add_argument('--redis-delay', type=float, default=0.5, help='simulated Redis ping time')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to compare against')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        sys.exit(0)
+
+    runs = []
+    for i in range(args.repeat):
+        runs.append(run_once(args))
+        print(f"Run {i + 1}/{args.repeat}: first sensor after {runs[-1]['first_sensor']:.3f}s, "
+              f"all ready after {runs[-1]['all_ready']:.3f}s")
+
+    summary = summarize(runs)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['summary']
+    print_summary(summary, baseline)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'summary': summary, 'runs': runs}, f, indent=2)
+        print(f"\nResults saved to {args.output}")
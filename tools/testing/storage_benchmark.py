@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark ذخیره‌سازی partition شده
+==================================
+
+مقایسه طرح قبلی sensor_data (یک جدول، بدون ایندکس، payload کامل در data_json)
+با partition های روزانه storage.PartitionedTable (ایندکس (device_id, timestamp)، data_json فقط فیلدهای اضافه):
+- حجم فایل دیتابیس
+- latency پرس‌وجوی یک دستگاه در یک بازه زمانی (p50/p99)
+- زمان retention: DELETE ردیف‌های قدیمی در برابر DROP partition
+
+    python tools/testing/storage_benchmark.py --days 14 --devices 100 --interval 60
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from ingest import INSERT_SENSOR_SQL, SENSOR_COLUMNS, configure_connection, sensor_row  # noqa: E402
+from storage import DAY_SECONDS, SENSOR_SCHEMA, PartitionedTable  # noqa: E402
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        device_id TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        temperature REAL,
+        humidity REAL,
+        pressure REAL,
+        light_level REAL,
+        motion BOOLEAN,
+        data_json TEXT
+    )
+'''
+
+
+def readings(days, devices, interval, now):
+    """payload های چند روز اخیر به ترتیب زمان، دسته به دسته"""
+    rng = random.Random(7)
+    start = int(now - days * DAY_SECONDS)
+    batch = []
+    for ts in range(start, int(now), interval):
+        for d in range(devices):
+            batch.append((f"ESP32-{d:04d}", {
+                'timestamp': ts,
+                'temperature': round(rng.uniform(18, 30), 2),
+                'humidity': round(rng.uniform(30, 70), 2),
+                'pressure': round(rng.uniform(990, 1030), 2),
+                'light_level': rng.randint(0, 1000),
+                'motion': rng.random() < 0.05,
+                'battery': rng.randint(20, 100),
+                'rssi': rng.randint(-90, -40)
+            }))
+        if len(batch) >= 5000:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def legacy_row(device_id, data):
+    """ردیف طرح قبلی: payload کامل در data_json"""
+    return sensor_row(device_id, data)[:-1] + (json.dumps(data),)
+
+
+def build(path, partitioned, args, now):
+    db = sqlite3.connect(str(path))
+    configure_connection(db)
+    table = None
+    if partitioned:
+        table = PartitionedTable('sensor_data', SENSOR_SCHEMA, args.retention)
+        with db:
+            table.setup(db)
+    else:
+        db.execute(LEGACY_SCHEMA)
+
+    started = time.perf_counter()
+    rows = 0
+    for batch in readings(args.days, args.devices, args.interval, now):
+        with db:
+            if partitioned:
+                # timestamp ها نسبت به now شبیه‌سازی شده معتبرند
+                table.retention_days = args.days + 1
+                table.insert_many(db, SENSOR_COLUMNS, [sensor_row(d, data) for d, data in batch])
+            else:
+                db.executemany(INSERT_SENSOR_SQL, [legacy_row(d, data) for d, data in batch])
+        rows += len(batch)
+    insert_seconds = time.perf_counter() - started
+    if table:
+        table.retention_days = args.retention
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return db, table, rows, insert_seconds
+
+
+def query_latency(db, args, now, queries=30):
+    """یک ساعت داده یک دستگاه تصادفی"""
+    rng = random.Random(11)
+    latencies = []
+    for _ in range(queries):
+        device = f"ESP32-{rng.randrange(args.devices):04d}"
+        end = int(now - rng.uniform(0, min(args.days, args.retention) * DAY_SECONDS - 3600))
+        started = time.perf_counter()
+        db.execute('SELECT timestamp, temperature FROM sensor_data WHERE device_id = ? '
+                   'AND timestamp >= ? AND timestamp < ?', (device, end - 3600, end)).fetchall()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Partitioned storage benchmark')
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--interval', type=int, default=120, help='seconds between readings per device')
+    parser.add_argument('--retention', type=int, default=7, help='days kept after retention')
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='storage_bench_'))
+    now = time.time()
+    results = {}
+    for name, partitioned in (('legacy', False), ('partitioned', True)):
+        path = workdir / f'{name}.db'
+        db, table, rows, insert_seconds = build(path, partitioned, args, now)
+        result = results[name] = {
+            'rows': rows,
+            'insert_rows_per_s': rows / insert_seconds,
+            'size_mb': path.stat().st_size / 1e6,
+            'query': query_latency(db, args, now)
+        }
+
+        started = time.perf_counter()
+        with db:
+            if table:
+                table.drop_expired(db, now)
+            else:
+                db.execute('DELETE FROM sensor_data WHERE timestamp < ?',
+                           (int(now - args.retention * DAY_SECONDS),))
+        result['retention_seconds'] = time.perf_counter() - started
+        result['rows_after_retention'] = db.execute('SELECT count(*) FROM sensor_data').fetchone()[0]
+        db.close()
+
+    print(f"\n📊 Storage Benchmark Results ({args.days} days, {args.devices} devices, "
+          f"{results['legacy']['rows']:,} rows):")
+    print(f"{'layout':<12} {'size MB':>9} {'rows/s':>10} {'query p50':>10} {'p99 ms':>8} {'retention s':>12}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['size_mb']:>9.1f} {r['insert_rows_per_s']:>10,.0f} "
+              f"{r['query']['p50_ms']:>10.2f} {r['query']['p99_ms']:>8.2f} {r['retention_seconds']:>12.3f}")
+    legacy, current = results['legacy'], results['partitioned']
+    print(f"\nSize {legacy['size_mb'] / current['size_mb']:.2f}x smaller, "
+          f"query {legacy['query']['p50_ms'] / current['query']['p50_ms']:.0f}x faster, "
+          f"retention {legacy['retention_seconds'] / max(current['retention_seconds'], 1e-6):.0f}x faster")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
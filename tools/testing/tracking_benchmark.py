@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark پس‌پردازش detection ها و ردیابی اشیاء
+===============================================
+
+صحنه مصنوعی: اشیائی که در بازه‌های تصادفی از تصویر عبور می‌کنند، هر کدام با چند کادر
+هم‌پوشان (مثل خروجی خام SSD) و گاهی detection کاذب یک frame ای:
+- حجم event ها: یک event برای هر frame دارای detection (رفتار قبلی) در برابر event های ردیاب
+- پایداری شناسه‌ها: تعداد track برای هر شیء واقعی (۱ = بدون تعویض شناسه)
+- زمان NMS برداری در برابر حلقه پایتونی
+
+    python tools/testing/tracking_benchmark.py --seconds 600 --fps 5 --objects 20
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from tracking import ObjectTracker, nms  # noqa: E402
+
+
+def python_nms(boxes, scores, iou_threshold):
+    """NMS با حلقه پایتونی روی جفت کادرها (برای مقایسه)"""
+    def iou(a, b):
+        h = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+        w = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = h * w
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union if union > 0 else 0.0
+
+    order = sorted(range(len(scores)), key=lambda i: -scores[i])
+    keep = []
+    for i in order:
+        if all(iou(boxes[i], boxes[k]) <= iou_threshold for k in keep):
+            keep.append(i)
+    return keep
+
+
+def synthetic_scene(seconds, fps, objects, duplicates, false_rate, seed=5):
+    """frame های detection خام: [(timestamp, boxes, scores, classes, truth_ids)]"""
+    rng = np.random.default_rng(seed)
+    spans = []
+    for obj in range(objects):
+        start = rng.uniform(0, seconds - 20)
+        spans.append((obj, start, start + rng.uniform(5, 20), rng.uniform(0.2, 0.8), int(rng.integers(1, 4))))
+
+    frames = []
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        boxes, scores, classes, truth = [], [], [], []
+        for obj, start, end, y, cls in spans:
+            if not start <= t < end:
+                continue
+            x = (t - start) / (end - start) * 0.85
+            base = np.array([y - 0.1, x, y + 0.1, x + 0.12])
+            for _ in range(duplicates):
+                boxes.append(base + rng.normal(0, 0.005, 4))
+                scores.append(rng.uniform(0.7, 0.99))
+                classes.append(cls)
+                truth.append(obj)
+        if rng.random() < false_rate:
+            y, x = rng.uniform(0, 0.8, 2)
+            boxes.append(np.array([y, x, y + 0.1, x + 0.1]))
+            scores.append(0.75)
+            classes.append(int(rng.integers(1, 4)))
+            truth.append(-1)
+        frames.append((t, np.array(boxes).reshape(-1, 4), np.array(scores), np.array(classes, np.int64), truth))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NMS and object tracking benchmark')
+    parser.add_argument('--seconds', type=float, default=600.0)
+    parser.add_argument('--fps', type=float, default=5.0, help='inference rate')
+    parser.add_argument('--objects', type=int, default=20)
+    parser.add_argument('--duplicates', type=int, default=3, help='overlapping boxes per object')
+    parser.add_argument('--false-rate', type=float, default=0.02, help='single-frame false positives per frame')
+    parser.add_argument('--nms-threshold', type=float, default=0.5)
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    frames = synthetic_scene(args.seconds, args.fps, args.objects, args.duplicates, args.false_rate)
+    tracker = ObjectTracker('bench', zones={'door': (0.4, 0.0, 0.6, 1.0)})
+
+    raw = sum(len(f[2]) for f in frames)
+    per_frame_events = sum(1 for f in frames if len(f[2]))
+    kept = 0
+    nms_seconds = python_seconds = 0.0
+    events = []
+    track_truth = {}
+
+    for t, boxes, scores, classes, truth in frames:
+        started = time.perf_counter()
+        keep = nms(boxes, scores, args.nms_threshold, classes)
+        nms_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        python_nms(boxes.tolist(), scores.tolist(), args.nms_threshold)
+        python_seconds += time.perf_counter() - started
+
+        kept += len(keep)
+        detections = [{'class': int(classes[i]), 'confidence': float(scores[i]), 'bbox': boxes[i].tolist()}
+                      for i in keep]
+        events.extend(tracker.update(detections, now=t))
+
+        # شیء واقعی هر track: نزدیک‌ترین detection در همین frame
+        for track in tracker.tracks:
+            if track.last_seen == t and keep.size:
+                i = keep[int(np.argmin(np.abs(boxes[keep] - track.box).sum(axis=1)))]
+                if truth[i] >= 0:
+                    track_truth.setdefault(truth[i], set()).add(track.id)
+    events.extend(tracker.expire(args.seconds + tracker.max_age + 1))
+
+    counts = {}
+    for event in events:
+        counts[event['event']] = counts.get(event['event'], 0) + 1
+    tracks_per_object = [len(ids) for ids in track_truth.values()]
+    results = {
+        'frames': len(frames),
+        'raw_detections': raw,
+        'after_nms': kept,
+        'per_frame_events': per_frame_events,
+        'tracker_events': len(events),
+        'event_counts': counts,
+        'reduction': per_frame_events / max(1, len(events)),
+        'objects_seen': len(track_truth),
+        'mean_tracks_per_object': float(np.mean(tracks_per_object)) if tracks_per_object else None,
+        'nms_us_per_frame': nms_seconds / len(frames) * 1e6,
+        'python_nms_us_per_frame': python_seconds / len(frames) * 1e6
+    }
+
+    print(f"\n📊 Tracking Benchmark Results ({len(frames)} frames, {args.objects} objects):")
+    print(f"Detections: {raw} raw → {kept} after NMS")
+    print(f"Events: {per_frame_events} per-frame → {len(events)} tracker {counts} "
+          f"({results['reduction']:.0f}x fewer)")
+    print(f"Tracks per real object: {results['mean_tracks_per_object']:.2f} "
+          f"({results['objects_seen']} objects seen)")
+    print(f"NMS: {results['nms_us_per_frame']:.1f} µs/frame vectorized, "
+          f"{results['python_nms_us_per_frame']:.1f} µs/frame python")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
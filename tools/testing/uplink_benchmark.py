@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmark uplink ابری store-and-forward
+======================================
+
+یک سرور HTTP محلی نقش cloud را بازی می‌کند (ack بالاترین seq، حذف frame های تکراری، offset برای ادامه).
+تولید کننده با نرخ ثابت داده سنسور به uplink.CloudUplink می‌دهد و در این بین:
+- WAN برای --outage ثانیه قطع می‌شود (سرور اتصال‌ها را بدون پاسخ می‌بندد)
+- وسط قطعی، gateway restart می‌شود (uplink جدید روی همان spool)
+در پایان بررسی می‌شود که همه رکوردها دقیقاً یک بار و به ترتیب رسیده‌اند و گزارش می‌شود:
+حجم روی سیم در برابر یک POST JSON برای هر پیام، زمان و نرخ replay، رعایت سقف پهنای باند، تعداد اتصال‌ها.
+
+    python tools/testing/uplink_benchmark.py --rate 200 --duration 30 --outage 10 --bandwidth 65536
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'hardware' / 'raspberry_pi'))
+
+from uplink import CloudUplink, HttpTransport, UplinkSpool, decode_frame  # noqa: E402
+
+
+class UplinkServer(ThreadingHTTPServer):
+    """stand-in سرور cloud: frame های seq بزرگ‌تر از آخرین ack را می‌پذیرد"""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, UplinkHandler)
+        self.lock = Lock()
+        self.acked = {}         # gateway -> آخرین seq
+        self.records = []
+        self.frames = []        # (زمان، بایت)
+        self.duplicates = 0
+        self.gaps = 0
+        self.outage = False
+        self.dropped_requests = 0
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/uplink'
+
+
+class UplinkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _outage(self):
+        if self.server.outage:
+            self.server.dropped_requests += 1
+            self.close_connection = True
+            return True
+        return False
+
+    def do_GET(self):
+        if self._outage():
+            return
+        gateway = parse_qs(urlsplit(self.path).query).get('gateway', [''])[0]
+        self._reply({'ack': self.server.acked.get(gateway, 0)})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self._outage():
+            return
+        server = self.server
+        gateway = self.headers['X-Gateway-Id']
+        seq = int(self.headers['X-Uplink-Seq'])
+        with server.lock:
+            last = server.acked.get(gateway, 0)
+            server.frames.append((time.monotonic(), len(body)))
+            if seq <= last:
+                server.duplicates += 1
+            else:
+                if seq != last + 1:
+                    server.gaps += 1
+                server.records.extend(decode_frame(body)['records'])
+                server.acked[gateway] = last = seq
+        self._reply({'ack': last})
+
+
+def max_rate(frames, window=5.0):
+    """بیشترین بایت دریافتی در یک پنجره لغزان"""
+    best, start, total = 0, 0, 0
+    for t, size in frames:
+        total += size
+        while frames[start][0] < t - window:
+            total -= frames[start][1]
+            start += 1
+        best = max(best, total)
+    return best / window
+
+
+def make_uplink(server, spool_dir, args):
+    transport = HttpTransport(server.url, 'bench-gw', pool_size=2, timeout=2.0)
+    spool = UplinkSpool(str(spool_dir), segment_bytes=256 * 1024, fsync=not args.no_fsync)
+    uplink = CloudUplink(transport, spool, 'bench-gw', batch_records=args.batch, batch_interval=args.interval,
+                         max_bytes_per_second=args.bandwidth or None,
+                         backoff_initial=0.2, backoff_max=2.0)
+    uplink.start()
+    return uplink
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store-and-forward uplink benchmark')
+    parser.add_argument('--rate', type=int, default=200, help='readings per second')
+    parser.add_argument('--devices', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of production')
+    parser.add_argument('--outage-start', type=float, default=5.0)
+    parser.add_argument('--outage', type=float, default=10.0, help='outage seconds')
+    parser.add_argument('--batch', type=int, default=500, help='records per frame')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds per frame')
+    parser.add_argument('--bandwidth', type=int, default=32 * 1024, help='bytes/s cap (0 = none)')
+    parser.add_argument('--no-fsync', action='store_true')
+    parser.add_argument('--drain-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='write results JSON here')
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix='uplink_bench_'))
+    server = UplinkServer()
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    uplink = make_uplink(server, work / 'spool', args)
+    rng = random.Random(1)
+    raw_json_bytes = 0
+    produced = 0
+    outage_produced = 0
+    restarted = False
+    peak_spool = 0
+    outage_end = args.outage_start + args.outage
+    started = time.monotonic()
+    while True:
+        elapsed = time.monotonic() - started
+        if elapsed >= args.duration:
+            break
+        server.outage = args.outage_start <= elapsed < outage_end
+        if not restarted and elapsed >= args.outage_start + args.outage / 2:
+            # restart gateway وسط قطعی: frame های spool شده باید پس از آن هم برسند
+            uplink.stop(drain_timeout=0)
+            uplink = make_uplink(server, work / 'spool', args)
+            restarted = True
+
+        target = int(elapsed * args.rate)
+        while produced < target:
+            device = f"ESP32-{rng.randrange(args.devices):04d}"
+            data = {'seq': produced, 'timestamp': time.time(),
+                    'temperature': round(rng.uniform(18, 30), 2), 'humidity': round(rng.uniform(30, 70), 2),
+                    'pressure': round(rng.uniform(990, 1030), 2), 'battery': rng.randint(20, 100)}
+            uplink.submit_reading(device, data)
+            raw_json_bytes += len(json.dumps({'device_id': device, 'data': data}))
+            produced += 1
+            if server.outage:
+                outage_produced += 1
+        peak_spool = max(peak_spool, uplink.spool.size_bytes())
+        time.sleep(0.01)
+    server.outage = False
+    outage_ended = started + outage_end
+
+    # تخلیه backlog
+    uplink._batch_ready.set()
+    deadline = time.monotonic() + args.drain_timeout
+    while len(server.records) < produced and time.monotonic() < deadline:
+        time.sleep(0.05)
+    drained_at = time.monotonic()
+    stats = uplink.stats()
+    uplink.stop()
+    server.shutdown()
+
+    sequence = [r['data']['seq'] for r in server.records]
+    in_order = sequence == sorted(sequence)
+    exactly_once = sorted(sequence) == list(range(produced))
+    replay_frames = [f for f in server.frames if f[0] >= outage_ended]
+    wire_bytes = sum(size for _, size in server.frames)
+
+    results = {
+        'produced': produced,
+        'received': len(server.records),
+        'in_order': in_order,
+        'exactly_once': exactly_once,
+        'server_duplicates': server.duplicates,
+        'server_gaps': server.gaps,
+        'produced_during_outage': outage_produced,
+        'dropped_requests_during_outage': server.dropped_requests,
+        'frames': len(server.frames),
+        'wire_bytes': wire_bytes,
+        'raw_json_bytes': raw_json_bytes,
+        'compression_ratio': raw_json_bytes / max(1, wire_bytes),
+        'connections_opened': stats['connections_opened'],
+        'peak_spool_bytes': peak_spool,
+        'replay_seconds': drained_at - outage_ended,
+        'replay_records_per_s': (len(server.records) - (produced - outage_produced)) / max(1e-6, drained_at - outage_ended),
+        'max_bytes_per_s': max_rate(replay_frames) if replay_frames else 0,
+        'bandwidth_cap': args.bandwidth
+    }
+
+    print(f"\n📊 Uplink Benchmark Results ({args.rate} readings/s for {args.duration:.0f} s, "
+          f"{args.outage:.0f} s outage with restart):")
+    print(f"Delivered {results['received']:,}/{produced:,} records, in order: {in_order}, "
+          f"exactly once: {exactly_once} (server dropped {server.duplicates} duplicate frames)")
+    print(f"Per-reading POST would lose {outage_produced:,} readings during the outage")
+    print(f"Wire: {wire_bytes / 1e3:.0f} KB in {len(server.frames)} frames vs {raw_json_bytes / 1e3:.0f} KB raw JSON "
+          f"in {produced:,} requests ({results['compression_ratio']:.1f}x smaller), "
+          f"{stats['connections_opened']} connections opened")
+    print(f"Replay: backlog drained {results['replay_seconds']:.1f} s after outage, "
+          f"peak spool {peak_spool / 1e3:.0f} KB, max {results['max_bytes_per_s'] / 1e3:.1f} KB/s over 5 s "
+          f"(cap {args.bandwidth / 1e3:.1f} KB/s)")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'parameters': vars(args), 'results': results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()